@@ -1,19 +1,54 @@
+from startup_timing import startup_timer
 import sys
-from PySide6.QtGui import QAction, Qt, QIcon
+from collections.abc import Callable
+from PySide6.QtCore import QThread, QTimer
+from PySide6.QtGui import QAction, QCloseEvent, Qt, QIcon
 from PySide6.QtWidgets import (
     QApplication, QLabel, QMainWindow, QMenuBar, QMenu, QPushButton,
-    QHBoxLayout, QStatusBar, QWidget, QStackedWidget, QFileDialog
+    QHBoxLayout, QStatusBar, QWidget, QStackedWidget, QFileDialog, QProgressDialog
 )
 from steps.step_one import StepOne
-from steps.step_two import StepTwo
-from steps.step_three import StepThree
-from steps.advanced_settings import AdvancedSettingsStep
-from timesheet_creator import create_timesheets
 import math
 from resources import resource_path
 from PySide6.QtWidgets import QMessageBox
 import os
-import platform
+startup_timer.mark("imports")
+
+
+# Stacked widget whose pages can be added as factories. A placeholder holds the
+# page's slot until it is first shown, when the real page is constructed.
+class LazyStackedWidget(QStackedWidget):
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._factories: dict[int, Callable[[], QWidget]] = {}
+
+    def add_lazy_widget(self, factory: Callable[[], QWidget]) -> int:
+        index = self.addWidget(QWidget())
+        self._factories[index] = factory
+        return index
+
+    def setCurrentIndex(self, index: int) -> None:
+        factory = self._factories.pop(index, None)
+        if factory is not None:
+            placeholder = self.widget(index)
+            self.removeWidget(placeholder)
+            self.insertWidget(index, factory())
+            placeholder.deleteLater()
+        super().setCurrentIndex(index)
+
+
+# Step pages other than the first are imported and built on first use
+def _build_step_two(controller) -> QWidget:
+    from steps.step_two import StepTwo
+    return StepTwo(controller=controller)
+
+def _build_step_three(controller) -> QWidget:
+    from steps.step_three import StepThree
+    return StepThree(controller=controller)
+
+def _build_advanced_settings(controller) -> QWidget:
+    from steps.advanced_settings import AdvancedSettingsStep
+    return AdvancedSettingsStep(controller=controller)
 
 
 class MainWindow(QMainWindow):
@@ -38,6 +73,19 @@ class MainWindow(QMainWindow):
         self.source_sheet_name: str = ""
         self.start_date: str = ""
         self.row_range: tuple[int, int] = (2, math.inf)
+        self.incremental: bool = False
+        # None, "location" or "shard"; see create_timesheets
+        self.split_output: str | None = None
+        self.split_size: int | None = None
+        # Keep parsed sources on disk between runs; see roster_store
+        self.cache_sources: bool = False
+
+        # Set while timesheets are being generated in the background
+        self._generation_thread: QThread | None = None
+        self._generation_worker = None
+        self._progress_dialog: QProgressDialog | None = None
+        self._generation_action: str = ""
+        self._pdf_error: str = ""
 
         self.root = QWidget()
         self.root_layout = QHBoxLayout(self.root)
@@ -64,11 +112,11 @@ class MainWindow(QMainWindow):
         layout = QHBoxLayout(content_widget)
         layout.setContentsMargins(10, 10, 10, 10)
 
-        self.step_controller = QStackedWidget()
+        self.step_controller = LazyStackedWidget()
 
-        for Step in (StepOne, StepTwo, StepThree, AdvancedSettingsStep):
-            step_instance = Step(controller=self)
-            self.step_controller.addWidget(step_instance)
+        self.step_controller.addWidget(StepOne(controller=self))
+        for build_step in (_build_step_two, _build_step_three, _build_advanced_settings):
+            self.step_controller.add_lazy_widget(lambda build_step=build_step: build_step(self))
 
         layout.addWidget(self.step_controller, alignment=Qt.AlignTop)
         self.step_controller.setCurrentIndex(0)
@@ -117,96 +165,139 @@ class MainWindow(QMainWindow):
             )
             if user_save_path.strip() == "":
                 return
+            self._start_generation(user_save_path)
+
+    # Generation runs on a worker thread so the window stays responsive; the
+    # progress dialog's Cancel stops it between employees without saving
+    def _start_generation(self, user_save_path: str) -> None:
+        # Deferred so the generator's dependencies stay out of startup
+        from generation_worker import GenerationWorker
+        from roster_store import DEFAULT_MAX_BYTES, roster_store
+
+        roster_store.max_bytes = DEFAULT_MAX_BYTES if self.cache_sources else 0
+        self._pdf_error = ""
+        self._generation_worker = GenerationWorker(
+            pdf_file_path=os.path.splitext(user_save_path)[0] + ".pdf",
+            source_file_path = self.source_path,
+            source_sheet_name = self.source_sheet_name,
+            template_file_path = resource_path("assets", "timesheet_template.xlsx"),
+            output_file_path=user_save_path,
+            start_date=self.start_date,
+            row_range=self.row_range,
+            incremental=self.incremental,
+            split_output=self.split_output,
+            split_size=self.split_size,
+            # Split workbooks are written concurrently, one process per core
+            workers=(os.cpu_count() or 1) if self.split_output else 1
+        )
+        self._generation_thread = QThread(self)
+        self._generation_worker.moveToThread(self._generation_thread)
+
+        # Not modal, since a modal dialog processes events inside setValue() and
+        # the worker's result could then arrive mid-update; the window's
+        # content is disabled instead until generation ends
+        self._progress_dialog = QProgressDialog("Generating timesheets...", "Cancel", 0, 0, self)
+        self._progress_dialog.setWindowTitle("Saving Timesheets")
+        self._progress_dialog.setMinimumDuration(0)
+        self._progress_dialog.setAutoReset(False)
+        # Direct, as the worker thread is busy generating and never idles to
+        # receive a queued call; cancel() only sets a thread-safe flag
+        self._progress_dialog.canceled.connect(self._generation_worker.cancel, Qt.DirectConnection)
+
+        self._generation_thread.started.connect(self._generation_worker.run)
+        # Queued explicitly: the worker emits from its own thread, and the
+        # handlers touch widgets, which only the GUI thread may do
+        self._generation_worker.stage.connect(self._generation_stage, Qt.QueuedConnection)
+        self._generation_worker.progress.connect(self._generation_progress, Qt.QueuedConnection)
+        self._generation_worker.pdf_failed.connect(self._generation_pdf_failed, Qt.QueuedConnection)
+        self._generation_worker.finished.connect(self._generation_finished, Qt.QueuedConnection)
+        self._generation_worker.failed.connect(self._generation_failed, Qt.QueuedConnection)
+        self._generation_worker.cancelled.connect(self._generation_cancelled, Qt.QueuedConnection)
+
+        self.root.setEnabled(False)
+        self.statusBar().setEnabled(False)
+        self._progress_dialog.show()
+        self._generation_thread.start()
 
-            success = create_timesheets(
-                source_file_path = self.source_path,
-                source_sheet_name = self.source_sheet_name,
-                template_file_path = resource_path("assets", "timesheet_template.xlsx"),
-                output_file_path=user_save_path,
-                start_date=self.start_date,
-                row_range=self.row_range
+    def _generation_stage(self, stage: str) -> None:
+        if self._progress_dialog is None or self._progress_dialog.wasCanceled():
+            return
+        self._generation_action = "Rendering PDF" if stage == "pdf" else "Generating timesheets"
+        self._progress_dialog.setMaximum(0)
+        self._progress_dialog.setLabelText(f"{self._generation_action}...")
+
+    def _generation_progress(self, done: int, total: int) -> None:
+        if self._progress_dialog is None or self._progress_dialog.wasCanceled():
+            return
+        self._progress_dialog.setMaximum(total)
+        self._progress_dialog.setValue(done)
+        self._progress_dialog.setLabelText(f"{self._generation_action}... {done} of {total}")
+
+    def _generation_pdf_failed(self, error: str) -> None:
+        self._pdf_error = error
+
+    # Stop the worker thread and close the progress dialog
+    def _end_generation(self) -> None:
+        if self._progress_dialog is not None:
+            self._progress_dialog.close()
+            self._progress_dialog.deleteLater()
+            self._progress_dialog = None
+        if self._generation_thread is not None:
+            self._generation_thread.quit()
+            self._generation_thread.wait()
+            self._generation_thread.deleteLater()
+            self._generation_thread = None
+        if self._generation_worker is not None:
+            self._generation_worker.deleteLater()
+            self._generation_worker = None
+        self.root.setEnabled(True)
+        self.statusBar().setEnabled(True)
+
+    def _generation_finished(self, output_paths: list) -> None:
+        if self._generation_worker is None:
+            return
+        self._end_generation()
+
+        from showinfm import show_in_file_manager
+        show_in_file_manager([os.path.normpath(path) for path in output_paths])
+
+        if self._pdf_error:
+            QMessageBox.warning(
+                self,
+                "PDF Conversion Failed",
+                f"Timesheets were created successfully, but converting to PDF failed.\n\nError details: {self._pdf_error}"
             )
 
-            if success:
-                to_pdf_success = self._excel_to_pdf(
-                    excel_file_path=user_save_path,
-                    output_pdf_path=os.path.splitext(user_save_path)[0] + ".pdf"
-                )
-                if not to_pdf_success:
-                    QMessageBox.warning(
-                        self,
-                        "PDF Conversion Failed",
-                        "Timesheets were created successfully, but converting to PDF failed."
-                    )
-
-                self.close()
-            else:
-                QMessageBox.critical(self, "Error", "An error occurred while creating the timesheets.")
-    
-    # Risky method, that's why there are so many try/excepts. Windows-only.
-    def _excel_to_pdf(self, excel_file_path: str, output_pdf_path: str) -> bool:
-        if not platform.system() == "Windows":
-            QMessageBox.warning(self, "Error converting to PDF", "Unable to convert the timesheets to PDF. Note: This is a windows only feature currently.")
-            return False
-        try:
-            import win32com.client
-        except:
-            print("Could not import win32com")
-            return False
-        try:
-            excel_path = os.path.abspath(excel_file_path)
-            pdf_path = os.path.abspath(output_pdf_path)
-            
-            if not os.path.exists(excel_path):
-                QMessageBox.critical(self, "Error", f"Excel file not found: {excel_path}")
-                return False
-            
-            try:
-                excel = win32com.client.Dispatch("Excel.Application")
-            except Exception as e:
-                QMessageBox.critical(
-                    self, 
-                    "Excel Not Available", 
-                    "Failed to open Microsoft Excel.\n\n"
-                    "Please ensure that:\n"
-                    "• Microsoft Excel is installed on your computer\n"
-                    "• Excel is up to date\n"
-                    "• Excel is properly registered with Windows\n\n"
-                    f"Technical details: {str(e)}"
-                )
-                return False
-            
-            excel.Visible = False
-            excel.DisplayAlerts = False
-            
-            try:
-                wb = excel.Workbooks.Open(excel_path)
-                wb.ExportAsFixedFormat(0, pdf_path)
-                wb.Close(False)
-                excel.Quit()
-                return True
-            except Exception as e:
-                QMessageBox.critical(
-                    self, 
-                    "PDF Conversion Error", 
-                    f"Failed to convert Excel to PDF.\n\n"
-                    f"This may occur if:\n"
-                    f"• The Excel file is corrupted\n"
-                    f"• The output path is invalid\n"
-                    f"• Excel encountered an internal error\n\n"
-                    f"Technical details: {str(e)}"
-                )
-                excel.Quit()
-                return False
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Unexpected Error", f"An unexpected error occurred:\n{str(e)}")
-            try:
-                if 'excel' in locals():
-                    excel.Quit()
-            except:
-                pass
-            return False
+        self.close()
+
+    def _generation_failed(self, error: str) -> None:
+        if self._generation_worker is None:
+            return
+        self._end_generation()
+        message_body = f"An error occurred while saving the timesheets. " \
+                        f"Please ensure the file is not open in another program and try again.\n\nError details: {error}"
+        QMessageBox.critical(
+            self,
+            "Error Saving Timesheets",
+            message_body
+        )
+
+    def _generation_cancelled(self) -> None:
+        if self._generation_worker is None:
+            return
+        self._end_generation()
+        QMessageBox.information(
+            self,
+            "Saving Cancelled",
+            "Generating the timesheets was cancelled. Nothing was saved."
+        )
+
+    # Closing mid-generation cancels it and waits, so no partial file is left
+    def closeEvent(self, event: QCloseEvent) -> None:
+        if self._generation_worker is not None:
+            self._generation_worker.cancel()
+            self._end_generation()
+        super().closeEvent(event)
     
     # Status bar houses previous/next buttons as well as a status label
     def _build_status_bar(self) -> None:
@@ -247,6 +338,11 @@ class MainWindow(QMainWindow):
         self._toggle_buttons_based_on_step()
 
 if __name__ == "__main__":
+    # Split outputs are written by worker processes, which frozen builds
+    # start by re-running this executable
+    import multiprocessing
+    multiprocessing.freeze_support()
+
     import ctypes
     try:
         myappid = 'stbstudios.timesheetwizard.app.1.0'
@@ -255,6 +351,15 @@ if __name__ == "__main__":
         pass
 
     app = QApplication(sys.argv)
+    startup_timer.mark("QApplication")
     w = MainWindow()
+    startup_timer.mark("MainWindow")
     w.show()
+    startup_timer.mark("show")
+
+    def _first_frame() -> None:
+        startup_timer.mark("first event loop pass")
+        startup_timer.report()
+    QTimer.singleShot(0, _first_frame)
+
     sys.exit(app.exec())
\ No newline at end of file
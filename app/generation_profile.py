@@ -0,0 +1,285 @@
+from array import array
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+
+# Timing instrumentation for a generation run, passed to create_timesheets and
+# create_timesheet_pdf as profile=. Every phase (reading the source, rendering,
+# writing, saving, ...) records the duration of each of its calls, so phases
+# entered once per employee double as per-employee histograms. Optionally the
+# whole run is captured with cProfile or tracemalloc as well. The report is
+# JSON, written next to the output as <output>.timing.json, and also lists the
+# size of every workbook written (see TimesheetWriter.stats), so runs with
+# different compression settings can be weighed against each other.
+#
+# The wizard profiles its runs when the TIMESHEET_WIZARD_PROFILE env var is set:
+# "1" for timings only, "cprofile" or "tracemalloc" to capture as well.
+ENV_VAR = "TIMESHEET_WIZARD_PROFILE"
+CAPTURE_MODES = ("cprofile", "tracemalloc")
+REPORT_VERSION = 2
+# Functions or allocation sites listed in a capture's report
+CAPTURE_TOP = 30
+# Upper bounds of the histogram buckets, in milliseconds; the last is open
+HISTOGRAM_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def timing_report_path(output_path: str) -> str:
+    return f"{output_path}.timing.json"
+
+
+# Peak resident set size of this process so far, in bytes
+def peak_rss() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return _peak_working_set()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes everywhere else
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _peak_working_set() -> int | None:
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    except (AttributeError, OSError):
+        return None
+
+
+# Times each call of one phase; reusable, but not re-entrant
+class _Phase:
+    __slots__ = ("durations", "_start")
+
+    def __init__(self) -> None:
+        self.durations = array("d")
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.durations.append(time.perf_counter() - self._start)
+
+
+class _NoPhase:
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+_NO_PHASE = _NoPhase()
+
+
+class GenerationProfile:
+    def __init__(self, capture: str | None = None) -> None:
+        if capture is not None and capture not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture {capture!r}, expected one of {CAPTURE_MODES}")
+        self.capture = capture
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._end: float | None = None
+        # phase name -> timer, in the order phases were first entered
+        self.phases: dict[str, _Phase] = {}
+        # TimesheetWriter.stats() of each workbook written, in order
+        self.outputs: list[dict] = []
+        self._profiler = None
+        self._capture_report: dict | None = None
+        if capture == "cprofile":
+            import cProfile
+            # Only the thread that creates the profile is profiled
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif capture == "tracemalloc":
+            import tracemalloc
+            tracemalloc.start()
+
+    # The profile the wizard's env var asks for, or None
+    @classmethod
+    def from_environment(cls) -> "GenerationProfile | None":
+        value = os.environ.get(ENV_VAR, "").strip().lower()
+        if not value or value == "0":
+            return None
+        return cls(capture=value if value in CAPTURE_MODES else None)
+
+    # Context manager timing one call of the phase
+    def phase(self, name: str) -> _Phase:
+        timer = self.phases.get(name)
+        if timer is None:
+            timer = self.phases[name] = _Phase()
+        return timer
+
+    # Yield from iterable, timing each item it takes to produce under the phase
+    def timed(self, name: str, iterable: Iterable) -> Iterator:
+        timer = self.phase(name)
+        iterator = iter(iterable)
+        while True:
+            with timer:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add_output(self, stats: dict) -> None:
+        self.outputs.append(stats)
+
+    # End the run; the capture, if any, is stopped and summarised
+    def stop(self) -> None:
+        if self._end is not None:
+            return
+        self._end = time.perf_counter()
+        if self.capture == "cprofile":
+            self._profiler.disable()
+            self._capture_report = self._cprofile_report()
+        elif self.capture == "tracemalloc":
+            self._capture_report = self._tracemalloc_report()
+
+    def _cprofile_report(self) -> dict:
+        import pstats
+        stats = pstats.Stats(self._profiler)
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return {
+            "mode": "cprofile",
+            "top_cumulative": [
+                {
+                    "function": f"{os.path.basename(filename)}:{line}({name})",
+                    "calls": calls,
+                    "own_s": round(own, 6),
+                    "cumulative_s": round(cumulative, 6)
+                }
+                for (filename, line, name), (_, calls, own, cumulative, _) in functions[:CAPTURE_TOP]
+            ]
+        }
+
+    def _tracemalloc_report(self) -> dict:
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        return {
+            "mode": "tracemalloc",
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "top_allocations": [
+                {"site": f"{frame.filename}:{frame.lineno}", "bytes": stat.size, "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:CAPTURE_TOP]
+                for frame in stat.traceback[:1]
+            ]
+        }
+
+    # Save the raw cProfile data (for snakeviz, pstats, ...) next to the report
+    def dump_profile(self, path: str) -> None:
+        if self._profiler is not None:
+            self._profiler.dump_stats(path)
+
+    def report(self) -> dict:
+        self.stop()
+        return {
+            "version": REPORT_VERSION,
+            "started": self.started.isoformat(timespec="seconds"),
+            "wall_s": round(self._end - self._start, 6),
+            # Worker processes of a parallel run are not included
+            "peak_rss_bytes": peak_rss(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "phases": {name: _phase_stats(timer.durations) for name, timer in self.phases.items() if timer.durations},
+            "outputs": self.outputs,
+            "capture": self._capture_report
+        }
+
+    # Write the report as JSON; with a cProfile capture the raw stats are
+    # saved alongside as <report>.prof
+    def write_report(self, path: str) -> None:
+        report = self.report()
+        if self._profiler is not None:
+            profile_path = f"{os.path.splitext(path)[0]}.prof"
+            self.dump_profile(profile_path)
+            report["capture"]["profile_path"] = profile_path
+        with open(path, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+            report_file.write("\n")
+
+    def format_summary(self) -> str:
+        report = self.report()
+        lines = [f"{'phase':<20} {'total':>10} {'calls':>8} {'p50':>9} {'p95':>9} {'max':>9}"]
+        for name, stats in report["phases"].items():
+            lines.append(
+                f"{name:<20} {stats['wall_s']:9.3f}s {stats['calls']:>8} "
+                f"{stats['p50_ms']:7.3f}ms {stats['p95_ms']:7.3f}ms {stats['max_ms']:7.3f}ms"
+            )
+        lines.append(f"{'wall':<20} {report['wall_s']:9.3f}s")
+        for output in report["outputs"]:
+            level = output["compression_level"]
+            lines.append(
+                f"{os.path.basename(output['path'])}: {output['file_bytes'] / 1e6:.2f} MB"
+                f" ({output['xml_bytes'] / 1e6:.2f} MB of XML, compression level {'default' if level is None else level})"
+                + (f", {output['string_cells']} strings in {output['shared_strings']} shared" if output["shared_strings"] is not None else "")
+            )
+        return "\n".join(lines)
+
+
+# Phases for code that takes a profile but was given none
+class _NoProfile:
+    def phase(self, name: str) -> _NoPhase:
+        return _NO_PHASE
+
+    def timed(self, name: str, iterable: Iterable) -> Iterable:
+        return iterable
+
+    def add_output(self, stats: dict) -> None:
+        pass
+
+NO_PROFILE = _NoProfile()
+
+
+def _phase_stats(durations: array) -> dict:
+    ordered = sorted(durations)
+    count = len(ordered)
+
+    def percentile(fraction: float) -> float:
+        if not ordered:
+            return 0.0
+        return round(ordered[min(count - 1, math.ceil(fraction * count) - 1)] * 1000, 6)
+
+    histogram = []
+    bucket_start = 0
+    for upper_ms in (*HISTOGRAM_MS, math.inf):
+        bucket_end = bucket_start
+        while bucket_end < count and ordered[bucket_end] * 1000 <= upper_ms:
+            bucket_end += 1
+        histogram.append({"le_ms": upper_ms if upper_ms != math.inf else None, "count": bucket_end - bucket_start})
+        bucket_start = bucket_end
+
+    total = sum(ordered)
+    return {
+        "wall_s": round(total, 6),
+        "calls": count,
+        "mean_ms": round(total / count * 1000, 6) if count else 0.0,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 6) if ordered else 0.0,
+        "histogram_ms": histogram
+    }
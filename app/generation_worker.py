@@ -0,0 +1,105 @@
+import math
+import os
+import threading
+import time
+from PySide6.QtCore import QObject, Signal, Slot
+from generation_profile import GenerationProfile, timing_report_path
+from timesheet_creator import GenerationCancelled, create_timesheets
+
+
+# Runs create_timesheets off the GUI thread, then renders the PDF when a
+# pdf_file_path is given. Move it to a QThread and connect the thread's started
+# signal to run(); exactly one of finished, failed or cancelled is emitted when
+# it is done. When the TIMESHEET_WIZARD_PROFILE env var is set, a successful
+# run also writes a timing report next to the workbook (see generation_profile).
+class GenerationWorker(QObject):
+    # "timesheets" while the workbook is written, then "pdf"
+    stage = Signal(str)
+    # done, total employees in the current stage
+    progress = Signal(int, int)
+    # paths of the files written
+    finished = Signal(list)
+    # error message
+    failed = Signal(str)
+    # error message when the workbook was saved but the PDF was not; finished follows
+    pdf_failed = Signal(str)
+    cancelled = Signal()
+
+    # Progress is emitted at most this often so large rosters don't flood the GUI
+    PROGRESS_INTERVAL = 0.05
+
+    def __init__(self, pdf_file_path: str | None = None, **generation_args) -> None:
+        super().__init__()
+        self._pdf_file_path = pdf_file_path
+        self._generation_args = generation_args
+        self._cancel_requested = threading.Event()
+        self._last_progress = 0.0
+        self._profile: GenerationProfile | None = None
+
+    @Slot()
+    def run(self) -> None:
+        # Created on the worker thread, the only one a cProfile capture sees
+        self._profile = GenerationProfile.from_environment()
+        try:
+            self.stage.emit("timesheets")
+            output_paths = create_timesheets(
+                **self._generation_args,
+                progress=self._report_progress,
+                should_cancel=self._cancel_requested.is_set,
+                profile=self._profile
+            )
+            if self._pdf_file_path:
+                self.stage.emit("pdf")
+                self._last_progress = 0.0
+                try:
+                    output_paths.append(self._create_pdf())
+                except GenerationCancelled:
+                    # Cancelling keeps nothing, not even the finished workbook
+                    for path in output_paths:
+                        if os.path.exists(path):
+                            os.remove(path)
+                    raise
+                except Exception as e:
+                    self.pdf_failed.emit(str(e))
+            if self._profile is not None:
+                report_path = timing_report_path(self._generation_args["output_file_path"])
+                self._profile.write_report(report_path)
+                output_paths.append(report_path)
+        except GenerationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(output_paths)
+        finally:
+            if self._profile is not None:
+                self._profile.stop()
+
+    def _create_pdf(self) -> str:
+        from timesheet_pdf import create_timesheet_pdf
+        args = self._generation_args
+        return create_timesheet_pdf(
+            source_file_path=args["source_file_path"],
+            source_sheet_name=args["source_sheet_name"],
+            template_file_path=args["template_file_path"],
+            output_pdf_path=self._pdf_file_path,
+            start_date=args["start_date"],
+            row_range=args.get("row_range", (2, math.inf)),
+            workers=args.get("workers", 1),
+            progress=self._report_progress,
+            should_cancel=self._cancel_requested.is_set,
+            incremental=args.get("incremental", False),
+            overtime_rules=args.get("overtime_rules"),
+            profile=self._profile
+        )
+
+    # Safe to call from any thread; takes effect before the next employee
+    @Slot()
+    def cancel(self) -> None:
+        self._cancel_requested.set()
+
+    def _report_progress(self, done: int, total: int) -> None:
+        now = time.monotonic()
+        if done >= total or now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress.emit(done, total)
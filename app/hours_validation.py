@@ -0,0 +1,241 @@
+from array import array
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime, time, timedelta
+import math
+import numpy as np
+from openpyxl.utils.datetime import from_excel
+from roster import BLANK_CLOCK, Employee
+
+
+# Checks and recomputes the hours of roster employees. Employees are taken in
+# batches and each batch's clock and hours columns are loaded straight into
+# (employees, days) arrays, so durations, totals and the regular/overtime
+# split are worked out with array operations rather than per cell.
+
+# Rows checked per batch; large enough to amortise the array work, small
+# enough that a big roster never needs all its arrays at once
+BATCH_SIZE = 4096
+# Hours that differ by less than this are taken to match
+TOLERANCE = 0.01
+
+
+# When hours count as overtime. Hours past daily_hours in a day are overtime;
+# of the rest, hours past weekly_hours in each week_days-day week (counted from
+# the start date) are too. Either threshold may be None to turn it off.
+class OvertimeRules:
+    def __init__(self, weekly_hours: float | None = 40.0, daily_hours: float | None = None, week_days: int = 7) -> None:
+        if week_days < 1:
+            raise ValueError("A week must have at least one day")
+        self.weekly_hours = weekly_hours
+        self.daily_hours = daily_hours
+        self.week_days = week_days
+
+
+# One disagreement between the source and the recomputed hours
+class HoursIssue:
+    __slots__ = ("row", "name", "field", "day", "reported", "expected")
+
+    def __init__(self, row: int, name, field: str, day: int | None, reported: float | None, expected: float | None) -> None:
+        # Source sheet row, and the day's offset into the period for daily fields
+        self.row = row
+        self.name = name
+        # "missing punch", "reversed punch", "daily hours", "total hours",
+        # "regular hours" or "overtime hours"
+        self.field = field
+        self.day = day
+        self.reported = reported
+        self.expected = expected
+
+    def __str__(self) -> str:
+        where = f"row {self.row} ({self.name})" + (f", day {self.day + 1}" if self.day is not None else "")
+        if self.field == "missing punch":
+            return f"{where}: clock in or clock out is missing"
+        if self.field == "reversed punch":
+            return f"{where}: clock out is before clock in"
+        reported = "blank" if self.reported is None else f"{self.reported:g}"
+        return f"{where}: {self.field} is {reported}, expected {self.expected:g}"
+
+
+# (employees, days) seconds for a batch's clock columns: datetimes from the
+# epoch, times from midnight and numbers as Excel serial dates; NaN where
+# blank or unreadable. Alongside them, where the value was a time of day with
+# no date. Compact columns only hold datetimes and are read as one buffer.
+def _clock_seconds(columns: list[array | tuple], days: int) -> tuple[np.ndarray, np.ndarray]:
+    if all(type(column) is array for column in columns):
+        seconds = _compact_clock_seconds(b"".join(columns), len(columns), days)
+        return seconds, np.zeros(seconds.shape, dtype=bool)
+    seconds = np.array([
+        _compact_clock_seconds(column, 1, days)[0] if type(column) is array else [_clock_value_seconds(value) for value in column]
+        for column in columns
+    ], dtype=np.float64).reshape(len(columns), days)
+    time_only = np.array([
+        [False] * days if type(column) is array else [_is_time_of_day(value) for value in column]
+        for column in columns
+    ], dtype=bool).reshape(len(columns), days)
+    return seconds, time_only
+
+def _compact_clock_seconds(buffer, employees: int, days: int) -> np.ndarray:
+    micros = np.frombuffer(buffer, dtype=np.int64).reshape(employees, days)
+    seconds = micros / 1e6
+    seconds[micros == BLANK_CLOCK] = np.nan
+    return seconds
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _clock_value_seconds(value) -> float:
+    if isinstance(value, datetime):
+        return (value - _EPOCH).total_seconds()
+    if isinstance(value, date):
+        return (datetime.combine(value, time()) - _EPOCH).total_seconds()
+    if isinstance(value, time):
+        return value.hour * 3600.0 + value.minute * 60.0 + value.second
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value:
+        return _clock_value_seconds(from_excel(value))
+    return math.nan
+
+def _is_time_of_day(value) -> bool:
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value:
+        value = from_excel(value)
+    return isinstance(value, time)
+
+# (employees, days) hours for a batch's hours columns, NaN where blank
+def _daily_hours(columns: list[array | tuple], days: int) -> np.ndarray:
+    if all(type(column) is array for column in columns):
+        return np.frombuffer(b"".join(columns), dtype=np.float64).reshape(len(columns), days)
+    return np.array([
+        column if type(column) is array else [_number(value) for value in column]
+        for column in columns
+    ], dtype=np.float64).reshape(len(columns), days)
+
+# Numbers as floats, NaN where blank or not a number
+def _numbers(values: np.ndarray) -> np.ndarray:
+    try:
+        return np.where(np.equal(values, None), np.nan, values).astype(np.float64)
+    except (TypeError, ValueError):
+        return np.vectorize(_number, otypes=[np.float64])(values)
+
+def _number(value) -> float:
+    # Hours typed as a duration or a time of day
+    if isinstance(value, timedelta):
+        return value.total_seconds() / 3600.0
+    if isinstance(value, time):
+        return value.hour + value.minute / 60.0 + value.second / 3600.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+# The recomputed hours of a batch of employees, alongside what the source
+# reported. Every employee in a batch must cover the same number of days.
+class HoursCheck:
+    def __init__(self, employees: list[Employee], rules: OvertimeRules, first_row: int = 2) -> None:
+        self.employees = employees
+        self.first_row = first_row
+        self.days = employees[0].days if employees else 0
+        count = len(employees)
+
+        clock_in, in_time_only = _clock_seconds([employee.clock_in for employee in employees], self.days)
+        clock_out, out_time_only = _clock_seconds([employee.clock_out for employee in employees], self.days)
+        self.reported_daily = _daily_hours([employee.hours for employee in employees], self.days)
+        totals = np.empty((count, 3), dtype=object)
+        totals[:] = [(employee.total_reg, employee.total_ot, employee.total_hours) for employee in employees]
+        self.reported_regular, self.reported_overtime, self.reported_total = _numbers(totals).T
+
+        has_in, has_out = ~np.isnan(clock_in), ~np.isnan(clock_out)
+        self.missing_punch = has_in ^ has_out
+
+        # Between two times of day, a clock out before the clock in crossed
+        # midnight; between full dates and times it is a bad punch, and the day
+        # keeps the source's hours like a day without punches
+        worked = (clock_out - clock_in) / 3600.0
+        worked = np.where((worked < 0) & in_time_only & out_time_only, worked + 24.0, worked)
+        self.reversed_punch = has_in & has_out & (worked < 0)
+        self.punched = has_in & has_out & ~self.reversed_punch
+        # Days without punches keep whatever hours the source gave them (leave, say)
+        self.daily = np.round(np.where(self.punched, worked, np.nan_to_num(self.reported_daily)), 2)
+
+        regular_daily = self.daily if rules.daily_hours is None else np.minimum(self.daily, rules.daily_hours)
+        if rules.weekly_hours is None:
+            regular = regular_daily.sum(axis=1)
+        else:
+            weeks = -(-self.days // rules.week_days)
+            padded = np.zeros((count, weeks * rules.week_days))
+            padded[:, :self.days] = regular_daily
+            weekly = padded.reshape(count, weeks, rules.week_days).sum(axis=2)
+            regular = np.minimum(weekly, rules.weekly_hours).sum(axis=1)
+
+        self.total = np.round(self.daily.sum(axis=1), 2)
+        self.regular = np.round(regular, 2)
+        self.overtime = np.round(self.total - self.regular, 2)
+
+    # Every disagreement, in row order; only mismatches are visited one by one
+    def issues(self) -> list[HoursIssue]:
+        flagged: list[tuple[int, int | None, str, float | None, float | None]] = []
+
+        daily_mismatch = self.punched & ~(np.abs(self.reported_daily - self.daily) <= TOLERANCE)
+        for employee, day in zip(*np.nonzero(self.missing_punch)):
+            flagged.append((employee, day, "missing punch", None, None))
+        for employee, day in zip(*np.nonzero(self.reversed_punch)):
+            flagged.append((employee, day, "reversed punch", None, None))
+        for employee, day in zip(*np.nonzero(daily_mismatch)):
+            flagged.append((employee, day, "daily hours", self.reported_daily[employee, day], self.daily[employee, day]))
+
+        for field, reported, expected in (
+                ("total hours", self.reported_total, self.total),
+                ("regular hours", self.reported_regular, self.regular),
+                ("overtime hours", self.reported_overtime, self.overtime)):
+            for employee in np.nonzero(~(np.abs(reported - expected) <= TOLERANCE))[0]:
+                flagged.append((employee, None, field, reported[employee], expected[employee]))
+
+        # Each employee's days first, then their totals
+        flagged.sort(key=lambda issue: (issue[0], self.days if issue[1] is None else issue[1]))
+        return [
+            HoursIssue(
+                self.first_row + int(employee), self.employees[employee].name, field,
+                None if day is None else int(day),
+                None if reported is None or np.isnan(reported) else float(reported),
+                None if expected is None else float(expected)
+            )
+            for employee, day, field, reported, expected in flagged
+        ]
+
+    # The employees with their daily, regular, overtime and total hours replaced
+    # by the recomputed ones. Clock columns are shared, not copied, and days the
+    # source left blank without punches stay blank.
+    def recomputed_employees(self) -> list[Employee]:
+        hours = np.where(self.punched | ~np.isnan(self.reported_daily), self.daily, np.nan)
+        totals = zip(self.regular.tolist(), self.overtime.tolist(), self.total.tolist())
+        return [
+            Employee(
+                employee.name, employee.position, employee.location,
+                employee.clock_in, employee.clock_out, array("d", daily.tobytes()),
+                regular, overtime, total
+            )
+            for employee, daily, (regular, overtime, total) in zip(self.employees, hours, totals)
+        ]
+
+
+# Consecutive batches of employees with the same number of days
+def _batches(employees: Iterable[Employee], size: int) -> Iterator[list[Employee]]:
+    batch: list[Employee] = []
+    for employee in employees:
+        if batch and (len(batch) >= size or employee.days != batch[0].days):
+            yield batch
+            batch = []
+        batch.append(employee)
+    if batch:
+        yield batch
+
+# Stream employees back out with their hours recomputed under the rules
+def recompute_hours(employees: Iterable[Employee], rules: OvertimeRules) -> Iterator[Employee]:
+    for batch in _batches(employees, BATCH_SIZE):
+        yield from HoursCheck(batch, rules).recomputed_employees()
+
+# Every hours disagreement among employees read from first_row onwards
+def check_hours(employees: Iterable[Employee], rules: OvertimeRules, first_row: int = 2) -> list[HoursIssue]:
+    issues: list[HoursIssue] = []
+    for batch in _batches(employees, BATCH_SIZE):
+        issues.extend(HoursCheck(batch, rules, first_row).issues())
+        first_row += len(batch)
+    return issues
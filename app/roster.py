@@ -0,0 +1,126 @@
+from array import array
+from datetime import datetime, timedelta
+import math
+
+
+# The parsed roster shared by the reader, the hours check and both renderers.
+# A source row is Name, Position, Location, then Clock In / Clock Out / Total
+# Hours for every day of the period, then Total REG, Total OT and Total Hours.
+# Each employee keeps its three per-day columns as typed arrays instead of a
+# tuple of Python objects, which is several times smaller and can be handed to
+# NumPy without converting cell by cell.
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# A blank clock time in a compact clock column
+BLANK_CLOCK = -(1 << 63)
+
+
+# Clock times as microseconds since 1970 when they are all naive datetimes or
+# blanks, so they convert back exactly; otherwise the values as they were read
+def _clock_column(values: tuple) -> array | tuple:
+    column = array("q")
+    for value in values:
+        if value is None:
+            column.append(BLANK_CLOCK)
+        elif type(value) is datetime and value.tzinfo is None:
+            column.append((value - _EPOCH) // _MICROSECOND)
+        else:
+            return values
+    return column
+
+# Hours as floats (NaN for blanks) when they are all plain numbers or blanks;
+# otherwise the values as they were read
+def _hours_column(values: tuple) -> array | tuple:
+    column = array("d")
+    for value in values:
+        if value is None:
+            column.append(math.nan)
+        elif type(value) is int or type(value) is float:
+            column.append(value)
+        else:
+            return values
+    return column
+
+
+class Employee:
+    __slots__ = ("name", "position", "location", "clock_in", "clock_out", "hours", "total_reg", "total_ot", "total_hours")
+
+    def __init__(
+            self,
+            name,
+            position,
+            location,
+            clock_in: array | tuple,
+            clock_out: array | tuple,
+            hours: array | tuple,
+            total_reg,
+            total_ot,
+            total_hours
+        ) -> None:
+        self.name = name
+        self.position = position
+        self.location = location
+        # One entry per day of the period; see _clock_column and _hours_column
+        self.clock_in = clock_in
+        self.clock_out = clock_out
+        self.hours = hours
+        self.total_reg = total_reg
+        self.total_ot = total_ot
+        self.total_hours = total_hours
+
+    # Parse a source row. The totals are always its last three cells and the
+    # days are the whole Clock In / Clock Out / Total Hours triples before them.
+    @classmethod
+    def from_row(cls, row: tuple) -> "Employee":
+        daily = row[3:-3]
+        days = len(daily) // 3
+        total_reg, total_ot, total_hours = row[-3:]
+        return cls(
+            row[0], row[1], row[2],
+            _clock_column(daily[0:3 * days:3]),
+            _clock_column(daily[1:3 * days:3]),
+            _hours_column(daily[2:3 * days:3]),
+            total_reg, total_ot, total_hours
+        )
+
+    @property
+    def days(self) -> int:
+        return len(self.hours)
+
+    # The cell values of a day, as the source held them
+    def clock_in_at(self, day: int):
+        return _clock_value(self.clock_in, day)
+
+    def clock_out_at(self, day: int):
+        return _clock_value(self.clock_out, day)
+
+    def hours_at(self, day: int):
+        value = self.hours[day]
+        if type(self.hours) is array and value != value:
+            return None
+        return value
+
+    # The source row this employee was parsed from, with numbers as floats
+    def row(self) -> tuple:
+        cells = [self.name, self.position, self.location]
+        for day in range(self.days):
+            cells += [self.clock_in_at(day), self.clock_out_at(day), self.hours_at(day)]
+        return (*cells, self.total_reg, self.total_ot, self.total_hours)
+
+    # Bytes that change whenever anything rendered from this employee would
+    def fingerprint(self) -> bytes:
+        columns = [
+            column.tobytes() if type(column) is array else repr(column).encode("utf-8")
+            for column in (self.clock_in, self.clock_out, self.hours)
+        ]
+        fields = (self.name, self.position, self.location, self.total_reg, self.total_ot, self.total_hours)
+        return b"\0".join([repr(fields).encode("utf-8"), *columns])
+
+def _clock_value(column: array | tuple, day: int):
+    value = column[day]
+    if type(column) is not array:
+        return value
+    if value == BLANK_CLOCK:
+        return None
+    return _EPOCH + timedelta(microseconds=value)
@@ -0,0 +1,217 @@
+from collections import OrderedDict
+from collections.abc import Iterator
+import hashlib
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import threading
+from roster import Employee
+from source_cache import file_signature
+
+
+# Parsed rosters kept on disk between runs, so re-running against an unchanged
+# source skips parsing the workbook altogether. Entries are keyed by a hash of
+# the source file's contents and the sheet name, so a copied or renamed export
+# still hits and any edit misses. Each entry holds the Employee records in
+# pickled chunks followed by a footer of chunk offsets, which lets a read
+# start from any row after loading a single chunk. The least recently read
+# entries are removed once the directory grows past max_bytes.
+#
+# The store is off unless a run asks for it (the CLI's --cache-dir or
+# --cache-size, the wizard's advanced settings, the service's --cache-rosters).
+# Entries hold names, locations and hours unencrypted and are unpickled when
+# read, so the directory is created for its owner only and must never be one
+# that others can write to.
+
+STORE_VERSION = 1
+# Employees pickled together; a read never loads more than one chunk ahead
+CHUNK_SIZE = 1024
+
+# Size the store may grow to once turned on
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_MAGIC = b"TSWROSTER"
+_TRAILER = struct.Struct("<Q")
+
+
+def default_cache_dir() -> str:
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, "TimesheetWizard", "Cache")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/TimesheetWizard")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "timesheet-wizard")
+
+
+# One stored roster, opened for reading
+class StoredRoster:
+    def __init__(self, path: str, footer: dict, footer_offset: int) -> None:
+        self.path = path
+        # Row after the last employee, as for SourceCache.cached_rows
+        self.stop_row: int = footer["stop_row"]
+        self.count: int = footer["count"]
+        self._chunk_size: int = footer["chunk_size"]
+        self._offsets: list[int] = footer["offsets"] + [footer_offset]
+
+    # Employees of sheet rows min_row to max_row (inclusive, None for the end)
+    def iter_employees(self, min_row: int = 2, max_row: int | None = None) -> Iterator[Employee]:
+        start = max(min_row - 2, 0)
+        stop = self.count if max_row is None else min(max_row - 1, self.count)
+        if start >= stop:
+            return
+        with open(self.path, "rb") as file:
+            for chunk in range(start // self._chunk_size, len(self._offsets) - 1):
+                first = chunk * self._chunk_size
+                if first >= stop:
+                    break
+                file.seek(self._offsets[chunk])
+                employees: list[Employee] = pickle.loads(file.read(self._offsets[chunk + 1] - self._offsets[chunk]))
+                yield from employees[max(start - first, 0):stop - first]
+
+
+# Streams employees into a new entry; nothing is visible until commit()
+class RosterStoreWriter:
+    def __init__(self, store: "RosterStore", key: str) -> None:
+        self._store = store
+        self._key = key
+        os.makedirs(store.directory, mode=0o700, exist_ok=True)
+        fd, self._temp_path = tempfile.mkstemp(dir=store.directory, suffix=".partial")
+        self._file = os.fdopen(fd, "wb")
+        self._file.write(_MAGIC)
+        self._chunk: list[Employee] = []
+        self._offsets: list[int] = []
+        self._count = 0
+
+    def append(self, employee: Employee) -> None:
+        self._chunk.append(employee)
+        if len(self._chunk) >= CHUNK_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._chunk:
+            self._offsets.append(self._file.tell())
+            self._file.write(pickle.dumps(self._chunk, protocol=pickle.HIGHEST_PROTOCOL))
+            self._count += len(self._chunk)
+            self._chunk = []
+
+    def commit(self, stop_row: int) -> None:
+        self._flush()
+        footer_offset = self._file.tell()
+        footer = {"version": STORE_VERSION, "stop_row": stop_row, "count": self._count, "chunk_size": CHUNK_SIZE, "offsets": self._offsets}
+        self._file.write(pickle.dumps(footer, protocol=pickle.HIGHEST_PROTOCOL))
+        self._file.write(_TRAILER.pack(footer_offset))
+        self._file.write(_MAGIC)
+        self._file.close()
+        try:
+            os.replace(self._temp_path, self._store.entry_path(self._key))
+        except OSError:
+            # Another run stored the same roster first and it is still open
+            self.abort()
+            return
+        self._store.evict()
+
+    def abort(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self._temp_path)
+        except OSError:
+            pass
+
+
+class RosterStore:
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, max_hashes: int = 256) -> None:
+        self.directory = directory
+        # Total size the entries may take up; 0 turns the store off
+        self.max_bytes = max_bytes
+        # Files whose content hash is remembered; the least recently used go first
+        self.max_hashes = max_hashes
+        # (path, signature) -> content hash, so each file is hashed once per change
+        self._hashes: OrderedDict[tuple[str, tuple[int, int]], str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.roster")
+
+    # Key of the sheet of the source file as it is now
+    def key(self, path: str, sheet_name: str) -> str:
+        path = os.path.abspath(path)
+        signature = file_signature(path)
+        with self._lock:
+            content_hash = self._hashes.get((path, signature))
+            if content_hash is not None:
+                self._hashes.move_to_end((path, signature))
+        if content_hash is None:
+            with open(path, "rb") as file:
+                content_hash = hashlib.file_digest(file, "blake2b").hexdigest()[:32]
+            with self._lock:
+                self._hashes[(path, signature)] = content_hash
+                while len(self._hashes) > self.max_hashes:
+                    self._hashes.popitem(last=False)
+        sheet_hash = hashlib.blake2b(sheet_name.encode("utf-8"), digest_size=8).hexdigest()
+        return f"{content_hash}-{sheet_hash}-v{STORE_VERSION}"
+
+    # The stored roster for this key, or None. Unreadable entries are removed.
+    def open(self, key: str) -> StoredRoster | None:
+        path = self.entry_path(key)
+        try:
+            with open(path, "rb") as file:
+                trailer_offset = file.seek(-(_TRAILER.size + len(_MAGIC)), os.SEEK_END)
+                footer_offset, = _TRAILER.unpack(file.read(_TRAILER.size))
+                if file.read() != _MAGIC:
+                    raise ValueError("Truncated roster cache entry")
+                file.seek(footer_offset)
+                footer = pickle.loads(file.read(trailer_offset - footer_offset))
+            if footer.get("version") != STORE_VERSION:
+                raise ValueError("Roster cache entry from another version")
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._remove(path)
+            return None
+        # Reading an entry makes it the most recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return StoredRoster(path, footer, footer_offset)
+
+    def writer(self, key: str) -> RosterStoreWriter:
+        return RosterStoreWriter(self, key)
+
+    # Drop the least recently used entries until the store fits in max_bytes,
+    # or in limit bytes when given
+    def evict(self, limit: int | None = None) -> None:
+        limit = self.max_bytes if limit is None else limit
+        try:
+            with os.scandir(self.directory) as scan:
+                entries = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path) for entry in scan if entry.name.endswith(".roster")]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            if self._remove(path):
+                total -= size
+
+    def clear(self) -> None:
+        self.evict(0)
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+# Off until a run opts in
+roster_store = RosterStore(default_cache_dir(), max_bytes=0)
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+import os
+import threading
+from roster import Employee
+from source_formats import format_for
+
+
+# Identity of a file on disk; any change to it invalidates its cache entry
+def file_signature(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Everything learned about one source file while its signature was current
+class SourceEntry:
+    def __init__(self, path: str, signature: tuple[int, int]) -> None:
+        self.path = path
+        self.signature = signature
+        self.sheet_names: list[str] | None = None
+        # sheet -> (max_row, max_column) as declared by the sheet, None when unsized
+        self.dimensions: dict[str, tuple[int | None, int | None]] = {}
+        # sheet -> (employees from row 2, first row past the roster)
+        self.rows: dict[str, tuple[list[Employee], int]] = {}
+        # sheet -> last row of the roster, as its format finds it
+        self.roster_ends: dict[str, int] = {}
+
+
+# In-memory cache of source file metadata and parsed rows, shared by the
+# wizard steps and the generator so a source is only opened once per change.
+# Entries are keyed by path and checked against the file's mtime and size on
+# every lookup; the least recently used files are dropped past max_files.
+class SourceCache:
+    def __init__(self, max_files: int = 4, max_rows: int = 20_000) -> None:
+        self.max_files = max_files
+        # Rosters longer than this are streamed every time instead of being kept
+        self.max_rows = max_rows
+        self._entries: OrderedDict[str, SourceEntry] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def entry(self, path: str) -> SourceEntry:
+        key = os.path.abspath(path)
+        signature = file_signature(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.signature != signature:
+                entry = SourceEntry(key, signature)
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_files:
+                self._entries.popitem(last=False)
+            return entry
+
+    def _load_metadata(self, entry: SourceEntry) -> None:
+        entry.dimensions = format_for(entry.path).dimensions(entry.path)
+        entry.sheet_names = list(entry.dimensions)
+
+    def sheet_names(self, path: str) -> list[str]:
+        entry = self.entry(path)
+        with self._lock:
+            if entry.sheet_names is None:
+                self._load_metadata(entry)
+            return list(entry.sheet_names)
+
+    # (max_row, max_column) of the sheet. Sheets that do not declare their
+    # dimensions are measured with one streaming pass, then remembered.
+    def dimensions(self, path: str, sheet_name: str) -> tuple[int | None, int | None]:
+        entry = self.entry(path)
+        with self._lock:
+            if entry.sheet_names is None:
+                self._load_metadata(entry)
+            if sheet_name not in entry.dimensions:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            if None in entry.dimensions[sheet_name]:
+                entry.dimensions[sheet_name] = format_for(entry.path).measure(entry.path, sheet_name)
+            return entry.dimensions[sheet_name]
+
+    # Last row of the roster, where the generator stops reading; 1 when empty
+    def last_employee_row(self, path: str, sheet_name: str) -> int:
+        entry = self.entry(path)
+        with self._lock:
+            if sheet_name in entry.rows:
+                return entry.rows[sheet_name][1] - 1
+            if sheet_name not in entry.roster_ends:
+                entry.roster_ends[sheet_name] = format_for(entry.path).last_employee_row(entry.path, sheet_name)
+            return entry.roster_ends[sheet_name]
+
+    # (employees, stop_row) for a fully read roster, or None when not cached
+    def cached_rows(self, path: str, sheet_name: str) -> tuple[list[Employee], int] | None:
+        entry = self.entry(path)
+        with self._lock:
+            return entry.rows.get(sheet_name)
+
+    def store_rows(self, path: str, signature: tuple[int, int], sheet_name: str, rows: list[Employee], stop_row: int) -> None:
+        entry = self.entry(path)
+        with self._lock:
+            # The file changed while it was being read
+            if entry.signature != signature:
+                return
+            entry.rows[sheet_name] = (rows, stop_row)
+
+    def invalidate(self, path: str | None = None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+
+source_cache = SourceCache()
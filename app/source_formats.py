@@ -0,0 +1,317 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+import csv
+from datetime import datetime
+import itertools
+import os
+import sqlite3
+import openpyxl
+import source_probe
+
+
+# The file formats a source roster can be read from, picked by extension. Each
+# yields the roster's rows in the source sheet layout: Name, Position, Location,
+# Clock In / Clock Out / Total Hours for every day, then Total REG, Total OT and
+# Total Hours. Rows are numbered as in the spreadsheet, so row 1 is the header
+# and employees start on row 2, and each row is padded to the header's width.
+# source_reader turns the rows into Employees and caches them the same way
+# whatever the format, so a new format only has to produce the rows.
+#
+# Formats other than workbooks hold text, which is converted on the way in:
+# clock cells to datetimes (ISO 8601 or mm/dd/yyyy hh:mm), hours and totals to
+# numbers, and empty cells to None, so they render like the workbook's cells.
+
+# Rows fetched from a database cursor at a time
+FETCH_SIZE = 2048
+# Bytes of a CSV file looked at to tell its delimiter
+_SNIFF_BYTES = 64 * 1024
+
+_CLOCK_FORMATS = ("%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %I:%M %p", "%m/%d/%Y")
+
+
+# A format must provide sheet_names, rows and _raw_rows; one missing any of
+# them cannot be instantiated, let alone registered
+class SourceFormat(ABC):
+    extensions: tuple[str, ...] = ()
+
+    # Names of the sheets (or tables) a roster can be read from
+    @abstractmethod
+    def sheet_names(self, path: str) -> list[str]:
+        ...
+
+    # The sheet to read when none is named, or None when there is a choice
+    def default_sheet(self, path: str) -> str | None:
+        names = self.sheet_names(path)
+        return names[0] if len(names) == 1 else None
+
+    # sheet -> (max_row, max_column) for every sheet, None where unsized
+    def dimensions(self, path: str) -> dict[str, tuple[int | None, int | None]]:
+        return {sheet_name: (None, None) for sheet_name in self.sheet_names(path)}
+
+    # (max_row, max_column) of a sheet that declared none, from a full pass
+    def measure(self, path: str, sheet_name: str) -> tuple[int | None, int | None]:
+        max_row, max_column = 0, 0
+        for max_row, row in enumerate(self._raw_rows(path, sheet_name), start=1):
+            max_column = max(max_column, len(row))
+        return (max_row, max_column) if max_row else (None, None)
+
+    # Rows min_row to max_row (inclusive, None for the end), stopping before
+    # the first row without a name
+    @abstractmethod
+    def rows(self, path: str, sheet_name: str, min_row: int = 2, max_row: int | None = None) -> Iterator[tuple]:
+        ...
+
+    # Last row of the roster, the row before the first blank name; 1 when empty
+    def last_employee_row(self, path: str, sheet_name: str) -> int:
+        last_row = 1
+        for row in itertools.islice(self._raw_rows(path, sheet_name), 1, None):
+            if not row or not row[0]: break
+            last_row += 1
+        return last_row
+
+    # Every row from the header on, as stored
+    @abstractmethod
+    def _raw_rows(self, path: str, sheet_name: str) -> Iterator[tuple]:
+        ...
+
+
+# .xlsx/.xlsm workbooks, streamed by openpyxl in read-only mode so rows are
+# parsed straight from the sheet XML as they are consumed
+class WorkbookFormat(SourceFormat):
+    extensions = (".xlsx", ".xlsm")
+
+    def sheet_names(self, path: str) -> list[str]:
+        return list(self.dimensions(path))
+
+    def default_sheet(self, path: str) -> str | None:
+        return None
+
+    def dimensions(self, path: str) -> dict[str, tuple[int | None, int | None]]:
+        src_wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            return {ws.title: (ws.max_row, ws.max_column) for ws in src_wb.worksheets}
+        finally:
+            src_wb.close()
+
+    def measure(self, path: str, sheet_name: str) -> tuple[int | None, int | None]:
+        src_wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            src_ws = src_wb[sheet_name]
+            src_ws.calculate_dimension(force=True)
+            return src_ws.max_row, src_ws.max_column
+        except ValueError:
+            # An empty sheet has nothing to measure
+            return None, None
+        finally:
+            src_wb.close()
+
+    def rows(self, path: str, sheet_name: str, min_row: int = 2, max_row: int | None = None) -> Iterator[tuple]:
+        src_wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            src_ws = src_wb[sheet_name]
+
+            # Read-only rows are only padded when the sheet declares its dimensions,
+            # so fall back on the header width to keep the trailing totals aligned.
+            width: int | None = src_ws.max_column
+            if not width:
+                header = next(src_ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+                width = len(header)
+
+            for row in src_ws.iter_rows(min_row=min_row, max_row=max_row, values_only=True):
+                if not row or not row[0]: break
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+                yield row
+        finally:
+            src_wb.close()
+
+    def last_employee_row(self, path: str, sheet_name: str) -> int:
+        return source_probe.last_employee_row(path, sheet_name)
+
+    def _raw_rows(self, path: str, sheet_name: str) -> Iterator[tuple]:
+        src_wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from src_wb[sheet_name].iter_rows(values_only=True)
+        finally:
+            src_wb.close()
+
+
+# Delimited text exports, streamed through the csv module. A CSV file is a
+# single sheet named after the file; any sheet name given for it is ignored.
+class CsvFormat(SourceFormat):
+    extensions = (".csv", ".tsv", ".txt")
+
+    def sheet_names(self, path: str) -> list[str]:
+        return [os.path.splitext(os.path.basename(path))[0]]
+
+    def rows(self, path: str, sheet_name: str, min_row: int = 2, max_row: int | None = None) -> Iterator[tuple]:
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            reader = csv.reader(file, self._dialect(file, path))
+            header = next(reader, None)
+            if header is None:
+                return
+            skip = max(min_row - 2, 0)
+            stop = None if max_row is None else skip + max(max_row - min_row + 1, 0)
+            yield from _converted_rows(itertools.islice(reader, skip, stop), _converters(len(header)))
+
+    def _raw_rows(self, path: str, sheet_name: str) -> Iterator[tuple]:
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            yield from csv.reader(file, self._dialect(file, path))
+
+    # The dialect of the file, told from its first rows; the file is rewound
+    def _dialect(self, file, path: str):
+        if path.lower().endswith(".tsv"):
+            return csv.excel_tab
+        sample = file.read(_SNIFF_BYTES)
+        file.seek(0)
+        try:
+            return csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            return csv.excel
+
+
+# SQLite exports; each table or view is a sheet holding one employee per
+# record, in the source sheet's column order. Record n is sheet row n + 1.
+class SqliteFormat(SourceFormat):
+    extensions = (".db", ".sqlite", ".sqlite3")
+
+    def sheet_names(self, path: str) -> list[str]:
+        with self._connect(path) as connection:
+            cursor = connection.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+            )
+            return [name for name, in cursor.fetchall()]
+
+    def rows(self, path: str, sheet_name: str, min_row: int = 2, max_row: int | None = None) -> Iterator[tuple]:
+        offset = max(min_row - 2, 0)
+        limit = -1 if max_row is None else max(max_row - min_row + 1, 0)
+        with self._connect(path) as connection:
+            cursor = connection.execute(f"SELECT * FROM {_quote(sheet_name)} LIMIT ? OFFSET ?", (limit, offset))
+            yield from cursor_rows(cursor)
+
+    def last_employee_row(self, path: str, sheet_name: str) -> int:
+        last_row = 1
+        with self._connect(path) as connection:
+            cursor = connection.execute(f"SELECT * FROM {_quote(sheet_name)}")
+            for batch in iter(lambda: cursor.fetchmany(FETCH_SIZE), []):
+                for row in batch:
+                    if not row or not row[0]:
+                        return last_row
+                    last_row += 1
+        return last_row
+
+    def _raw_rows(self, path: str, sheet_name: str) -> Iterator[tuple]:
+        with self._connect(path) as connection:
+            cursor = connection.execute(f"SELECT * FROM {_quote(sheet_name)}")
+            yield tuple(column[0] for column in cursor.description)
+            for batch in iter(lambda: cursor.fetchmany(FETCH_SIZE), []):
+                yield from batch
+
+    # Read-only, so a source that is missing or locked is never created or written
+    def _connect(self, path: str) -> "_Connection":
+        uri = f"file:{os.path.abspath(path).replace(os.sep, '/')}?mode=ro"
+        return _Connection(sqlite3.connect(uri, uri=True))
+
+
+# sqlite3's own context manager only commits; this one closes as well
+class _Connection:
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.connection.close()
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# The rows of any DB-API cursor a query was executed on, fetched in batches,
+# converted and padded like a sheet's rows. The first record is row 2.
+def cursor_rows(cursor, fetch_size: int = FETCH_SIZE) -> Iterator[tuple]:
+    converters = _converters(len(cursor.description))
+    for batch in iter(lambda: cursor.fetchmany(fetch_size), []):
+        yield from _converted_rows(batch, converters)
+
+
+_WORKBOOK = WorkbookFormat()
+FORMATS: list[SourceFormat] = [_WORKBOOK, CsvFormat(), SqliteFormat()]
+
+# Read files with these extensions with the format, ahead of the built-in ones
+def register_format(source_format: SourceFormat) -> None:
+    FORMATS.insert(0, source_format)
+
+# The format of a source file; anything unrecognised is taken for a workbook
+def format_for(path: str) -> SourceFormat:
+    extension = os.path.splitext(str(path))[1].lower()
+    for source_format in FORMATS:
+        if extension in source_format.extensions:
+            return source_format
+    return _WORKBOOK
+
+# Extensions every registered format reads, for file dialogs
+def source_extensions() -> list[str]:
+    return [extension for source_format in FORMATS for extension in source_format.extensions]
+
+
+# Rows with their cells converted, padded or cut to the converters' width,
+# up to the first row without a name
+def _converted_rows(rows, converters: list) -> Iterator[tuple]:
+    width = len(converters)
+    blanks = (None,) * width
+    for row in rows:
+        if not row or not row[0]: break
+        if len(row) < width:
+            row = (*row, *blanks[len(row):])
+        yield tuple([convert(value) for convert, value in zip(converters, row)])
+
+# A converter per column of a row width cells wide, laid out as Employee.from_row reads it
+def _converters(width: int) -> list:
+    converters = []
+    for column in range(width):
+        if column < 3:
+            converters.append(_text)
+        elif column >= width - 3:
+            converters.append(_number)
+        else:
+            converters.append((_clock, _clock, _number)[(column - 3) % 3])
+    return converters
+
+def _text(value):
+    if value == "":
+        return None
+    return value
+
+def _clock(value):
+    if type(value) is not str:
+        return value
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for clock_format in _CLOCK_FORMATS:
+        try:
+            return datetime.strptime(value, clock_format)
+        except ValueError:
+            continue
+    return value
+
+def _number(value):
+    if type(value) is not str:
+        return value
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
@@ -0,0 +1,145 @@
+from collections.abc import Iterator
+import posixpath
+import re
+from xml.etree import ElementTree
+import zipfile
+import openpyxl
+from openpyxl.utils.cell import range_boundaries
+
+
+# Cheap probes of a source sheet that read its XML straight out of the xlsx zip,
+# so nothing has to be parsed into openpyxl cells just to size the roster
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+_CHUNK_SIZE = 1 << 20
+
+_DIMENSION = re.compile(rb'<dimension\b[^>]*?\sref="([^"]+)"')
+# Column A cell of a row, with the attributes after its reference and its content.
+# Starting on a literal lets the scan skip through the other columns quickly.
+_NAME_CELL = re.compile(rb' r="A(\d+)"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_CELL_TYPE = re.compile(rb'\st="(\w+)"')
+_CELL_VALUE = re.compile(rb'<v>([^<]*)</v>|<t\b[^>]*>([^<]*)</t>')
+
+
+# Path of a sheet's XML part inside the archive, resolved through the workbook rels
+def _sheet_part(archive: zipfile.ZipFile, sheet_name: str) -> str:
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(f"{_REL_NS}Relationship")}
+
+    for sheet in workbook.iter(f"{_MAIN_NS}sheet"):
+        if sheet.get("name") == sheet_name:
+            target = targets[sheet.get(_REL_ID)]
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+# Decompressed sheet XML in chunks that each end on a row boundary
+def _row_chunks(archive: zipfile.ZipFile, part: str) -> Iterator[bytes]:
+    with archive.open(part) as sheet_xml:
+        pending = b""
+        while chunk := sheet_xml.read(_CHUNK_SIZE):
+            pending += chunk
+            cut = pending.rfind(b"</row>")
+            if cut == -1:
+                continue
+            cut += len(b"</row>")
+            yield pending[:cut]
+            pending = pending[cut:]
+        if pending:
+            yield pending
+
+# (max_row, max_column) from the sheet's <dimension ref>, or None when it has none
+def sheet_dimension(source_file_path: str, source_sheet_name: str) -> tuple[int, int] | None:
+    with zipfile.ZipFile(source_file_path) as archive:
+        with archive.open(_sheet_part(archive, source_sheet_name)) as sheet_xml:
+            head = b""
+            # The dimension comes before the sheet data, so only the head is read
+            while b"<sheetData" not in head and (chunk := sheet_xml.read(_CHUNK_SIZE // 16)):
+                head += chunk
+
+    match = _DIMENSION.search(head.split(b"<sheetData", 1)[0])
+    if match is None:
+        return None
+    try:
+        _, _, max_col, max_row = range_boundaries(match.group(1).decode())
+    except (TypeError, ValueError):
+        return None
+    if max_row is None or max_col is None:
+        return None
+    return max_row, max_col
+
+# Whether a raw column A cell holds a name the generator would use; mirrors
+# the `not row[0]` check in iter_employees for the cached value
+def _is_name(attrs: bytes, content: bytes | None) -> bool:
+    if not content:
+        return False
+    match = _CELL_VALUE.search(content)
+    if match is None:
+        return False
+    value = match.group(1) if match.group(1) is not None else match.group(2)
+    if not value:
+        return False
+
+    cell_type = _CELL_TYPE.search(attrs)
+    data_type = cell_type.group(1) if cell_type else b"n"
+    if data_type in (b"n", b"b"):
+        try:
+            return float(value) != 0
+        except ValueError:
+            return True
+    # Shared strings are counted as names without looking the index up
+    return True
+
+# Last row of the roster: the row before the first blank name from row 2, the
+# same place the generator stops. Rows past a declared dimension are never read.
+# Returns 1 when the sheet has no employees.
+def last_employee_row(source_file_path: str, source_sheet_name: str) -> int:
+    with zipfile.ZipFile(source_file_path) as archive:
+        part = _sheet_part(archive, source_sheet_name)
+        bound = None
+        next_row = 2
+        saw_cells = False
+
+        for chunk in _row_chunks(archive, part):
+            if bound is None and (match := _DIMENSION.search(chunk.split(b"<sheetData", 1)[0])):
+                try:
+                    bound = range_boundaries(match.group(1).decode())[3]
+                except (TypeError, ValueError):
+                    pass
+            saw_cells = saw_cells or b"<c " in chunk or b"<c>" in chunk
+
+            for cell in _NAME_CELL.finditer(chunk):
+                row = int(cell.group(1))
+                if row < 2:
+                    continue
+                # Attributes may come before the reference too
+                attrs = chunk[chunk.rfind(b"<c", 0, cell.start()):cell.start()] + cell.group(2)
+                # A row without a name cell, or one left blank, ends the roster
+                if row != next_row or not _is_name(attrs, cell.group(3)):
+                    return next_row - 1
+                next_row = row + 1
+                if bound is not None and row >= bound:
+                    return row
+            if b"</sheetData>" in chunk:
+                break
+
+    # Cells without references have to be walked by openpyxl instead
+    if next_row == 2 and saw_cells:
+        return _scan_rows(source_file_path, source_sheet_name)
+    return next_row - 1
+
+def _scan_rows(source_file_path: str, source_sheet_name: str) -> int:
+    src_wb = openpyxl.load_workbook(source_file_path, read_only=True, data_only=True)
+    try:
+        last_row = 1
+        for row in src_wb[source_sheet_name].iter_rows(min_row=2, max_col=1, values_only=True):
+            if not row or not row[0]: break
+            last_row += 1
+        return last_row
+    finally:
+        src_wb.close()
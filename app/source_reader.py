@@ -0,0 +1,96 @@
+from collections.abc import Iterator
+import math
+from roster import Employee
+from roster_store import RosterStore, roster_store
+from source_cache import SourceCache, file_signature, source_cache
+from source_formats import FETCH_SIZE, cursor_rows, format_for
+
+
+# Lazily yield the employees of the source sheet; row range is inclusive.
+# The source is streamed by the reader for its format (see source_formats), so
+# rows are parsed as they are consumed and memory stays flat whatever its size.
+# A roster already read in full is served from the cache while the file is unchanged,
+# and from the on-disk store on later runs against a source with the same contents.
+def iter_employees(
+        source_file_path: str,
+        source_sheet_name: str,
+        row_range: tuple[int, int] = (2, math.inf),
+        cache: SourceCache | None = source_cache,
+        store: RosterStore | None = roster_store
+    ) -> Iterator[Employee]:
+
+    min_row = int(row_range[0])
+    max_row = int(row_range[1]) if row_range[1] != math.inf else None
+
+    if cache is not None and min_row >= 2:
+        cached = cache.cached_rows(source_file_path, source_sheet_name)
+        if cached is not None and min_row <= cached[1]:
+            employees, stop_row = cached
+            end_row = stop_row if max_row is None else min(max_row + 1, stop_row)
+            yield from employees[min_row - 2:end_row - 2]
+            return
+
+    # Only a full pass from the first employee row can be cached
+    full_pass = min_row == 2 and max_row is None
+    collect = cache is not None and cache.max_rows > 0 and full_pass
+    signature = file_signature(source_file_path)
+    collected: list[Employee] | None = [] if collect else None
+    stop_row = min_row
+
+    key = store.key(source_file_path, source_sheet_name) if store is not None and store.enabled and min_row >= 2 else None
+    stored = store.open(key) if key is not None else None
+    if stored is not None:
+        if collect and stored.count <= cache.max_rows:
+            collected = list(stored.iter_employees())
+            cache.store_rows(source_file_path, signature, source_sheet_name, collected, stored.stop_row)
+            end_row = stored.stop_row if max_row is None else min(max_row + 1, stored.stop_row)
+            yield from collected[min_row - 2:end_row - 2]
+        else:
+            yield from stored.iter_employees(min_row, max_row)
+        return
+
+    writer = store.writer(key) if key is not None and full_pass else None
+    rows = format_for(source_file_path).rows(source_file_path, source_sheet_name, min_row, max_row)
+    try:
+        for row in rows:
+            stop_row += 1
+            employee = Employee.from_row(row)
+            if collected is not None:
+                collected.append(employee)
+                if len(collected) > cache.max_rows:
+                    collected = None
+            if writer is not None:
+                writer.append(employee)
+            yield employee
+
+        # Rows read while the file was being rewritten must not be stored
+        if writer is not None and file_signature(source_file_path) == signature:
+            writer.commit(stop_row)
+            writer = None
+    finally:
+        rows.close()
+        if writer is not None:
+            writer.abort()
+
+    if collected is not None:
+        cache.store_rows(source_file_path, signature, source_sheet_name, collected, stop_row)
+
+# The employees of a query already executed on any DB-API cursor, fetched in
+# batches; row range is inclusive and the first record is row 2. Nothing is
+# cached, as there is no file to tell when the results change.
+def iter_cursor_employees(cursor, row_range: tuple[int, int] = (2, math.inf), fetch_size: int = FETCH_SIZE) -> Iterator[Employee]:
+    min_row = int(row_range[0])
+    rows = cursor_rows(cursor, fetch_size)
+    for row_number, row in enumerate(rows, start=2):
+        if row_number > row_range[1]:
+            break
+        if row_number >= min_row:
+            yield Employee.from_row(row)
+
+# Last employee row of the source sheet; 1 when it has no employees
+def source_max_row(source_file_path: str, source_sheet_name: str) -> int:
+    if roster_store.enabled and source_cache.cached_rows(source_file_path, source_sheet_name) is None:
+        stored = roster_store.open(roster_store.key(source_file_path, source_sheet_name))
+        if stored is not None:
+            return stored.stop_row - 1
+    return source_cache.last_employee_row(source_file_path, source_sheet_name)
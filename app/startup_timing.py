@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+
+# Startup-time report, enabled with the TIMESHEET_WIZARD_STARTUP_TIMING env var.
+# "1" prints the per-phase timings to stderr; any other value is a file path the
+# report is appended to (windowed builds have no console to print to).
+ENV_VAR = "TIMESHEET_WIZARD_STARTUP_TIMING"
+
+
+class StartupTimer:
+    def __init__(self) -> None:
+        self.enabled: bool = bool(os.environ.get(ENV_VAR))
+        self._start: float = time.perf_counter()
+        self._last: float = self._start
+        self.phases: list[tuple[str, float]] = []
+
+    # Record the time since the previous mark under the given phase name
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def format_report(self) -> str:
+        lines = [f"{phase:<28} {seconds * 1000:9.1f} ms" for phase, seconds in self.phases]
+        lines.append(f"{'total':<28} {(self._last - self._start) * 1000:9.1f} ms")
+        return "\n".join(["Startup timings:", *lines]) + "\n"
+
+    def report(self) -> None:
+        if not self.enabled:
+            return
+        target = os.environ.get(ENV_VAR, "")
+        if target == "1":
+            if sys.stderr is not None:
+                sys.stderr.write(self.format_report())
+        else:
+            with open(target, "a", encoding="utf-8") as report_file:
+                report_file.write(self.format_report())
+
+
+startup_timer = StartupTimer()
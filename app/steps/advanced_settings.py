@@ -2,12 +2,10 @@ from PySide6.QtCore import Qt, Signal, QEvent
 from PySide6.QtGui import QFont, QShowEvent
 from PySide6.QtWidgets import (
     QVBoxLayout, QHBoxLayout, QLabel, QSpinBox,
-    QPushButton, QCheckBox, QGridLayout
+    QPushButton, QCheckBox, QGridLayout, QComboBox
 )
 from .base_step import BaseStep
 import math
-import openpyxl
-from openpyxl import Workbook
 from resources import resource_path
 import os
 
@@ -65,6 +63,36 @@ class AdvancedSettingsStep(BaseStep):
         settings_layout.addWidget(end_reset_btn, 1, 2)
         settings_layout.addWidget(self.unlimited_checkbox, 1, 3)
 
+        # Incremental regeneration
+        self.incremental_checkbox = QCheckBox("Only rebuild changed employees when saving over earlier timesheets")
+        self.incremental_checkbox.setToolTip("Keeps a .manifest.json file next to the saved timesheets to tell which employees changed.")
+        settings_layout.addWidget(self.incremental_checkbox, 2, 0, 1, 4)
+
+        # Split output
+        split_label = QLabel("Save As:")
+        self.split_combobox = QComboBox()
+        self.split_combobox.addItem("One workbook", None)
+        self.split_combobox.addItem("One workbook per location", "location")
+        self.split_combobox.addItem("One workbook per group of employees", "shard")
+        self.split_combobox.setToolTip("Split workbooks are saved side by side, along with an _index.xlsx listing them.")
+        self.split_combobox.currentIndexChanged.connect(self.toggle_split_size)
+        self.split_size_spinbox = QSpinBox()
+        self.split_size_spinbox.setMinimum(0)
+        self.split_size_spinbox.setMaximum(1000000)
+        self.split_size_spinbox.setValue(500)
+        self.split_size_spinbox.setSuffix(" per workbook")
+        self.split_size_spinbox.setSpecialValueText("No limit")
+
+        settings_layout.addWidget(split_label, 3, 0)
+        settings_layout.addWidget(self.split_combobox, 3, 1)
+        settings_layout.addWidget(self.split_size_spinbox, 3, 2, 1, 2)
+
+        # Parsed-source cache, off unless chosen
+        from roster_store import roster_store
+        self.cache_checkbox = QCheckBox("Keep read exports on this computer to speed up running them again")
+        self.cache_checkbox.setToolTip(f"Names, locations and hours are stored unencrypted in {roster_store.directory}.")
+        settings_layout.addWidget(self.cache_checkbox, 4, 0, 1, 4)
+
         row_1.addLayout(settings_layout)
 
         # Row 2: Inclusive note
@@ -87,11 +115,16 @@ class AdvancedSettingsStep(BaseStep):
         self.layout().addStretch()
 
         self.toggle_end_spinbox()
+        self.toggle_split_size()
 
     def _save_and_continue(self) -> None:
         start_row: int = self.start_spinbox.value()
         end_row: int = self.end_spinbox.value() if not self.unlimited_checkbox.isChecked() else math.inf
         self.controller.row_range = (start_row, end_row)
+        self.controller.incremental = self.incremental_checkbox.isChecked()
+        self.controller.split_output = self.split_combobox.currentData()
+        self.controller.split_size = self.split_size_spinbox.value() or None
+        self.controller.cache_sources = self.cache_checkbox.isChecked()
         self.controller._previous_clicked()
 
     def _init_ui_rows(self) -> None:
@@ -106,6 +139,14 @@ class AdvancedSettingsStep(BaseStep):
     def toggle_end_spinbox(self):
         self.end_spinbox.setEnabled(not self.unlimited_checkbox.isChecked())
     
+    # Incremental runs only ever rebuild a single workbook
+    def toggle_split_size(self):
+        splitting = self.split_combobox.currentData() is not None
+        self.split_size_spinbox.setEnabled(splitting)
+        self.incremental_checkbox.setEnabled(not splitting)
+        if splitting:
+            self.incremental_checkbox.setChecked(False)
+
     def update_end_minimum(self):
         self.end_spinbox.setMinimum(self.start_spinbox.value())
     
@@ -121,12 +162,12 @@ class AdvancedSettingsStep(BaseStep):
             if not source_path or not source_sheet_name:
                 return 1000000000
             
-            src_wb: Workbook = openpyxl.load_workbook(source_path)
-            src_ws = src_wb[source_sheet_name]
-            max_row = src_ws.max_row
-            src_wb.close()
+            # Probed from the sheet XML and shared with the other steps and the
+            # generator; trailing formatted-but-empty rows are not counted
+            from source_cache import source_cache
+            max_row = source_cache.last_employee_row(source_path, source_sheet_name)
             
-            return max_row if max_row and max_row >= 2 else 2
+            return max(max_row, 2)
         except Exception:
             return 1000000000
     
@@ -47,8 +47,15 @@ class BaseStep(QWidget):
         self.notes_widget.setStyleSheet("border: none;")
         self.notes_widget.anchorClicked.connect(self._handle_link_click)
 
-        html_content: str = read_text_resource("steps", "notes", self._init_notes_filename())
-        self.notes_widget.setHtml(html_content)
+        self._notes_loaded = False
+
+    # Notes are read from disk the first time the step is shown
+    def showEvent(self, event) -> None:
+        if self.notes_widget and not self._notes_loaded:
+            html_content: str = read_text_resource("steps", "notes", self._init_notes_filename())
+            self.notes_widget.setHtml(html_content)
+            self._notes_loaded = True
+        super().showEvent(event)
     
     def _next_step(self) -> None:
         pass
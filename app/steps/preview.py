@@ -0,0 +1,227 @@
+from collections import OrderedDict
+from datetime import date, datetime, time
+import threading
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QObject, Qt, Signal, Slot
+
+
+# The Review step's preview. A PreviewLoader on its own thread reads and renders
+# pages of timesheets (see timesheet_preview); EmployeePageModel lists every
+# employee of the roster but only asks for the pages the view actually shows,
+# and TimesheetGridModel shows one employee's sheet cell by cell.
+
+# Rendered pages the list keeps; the loader keeps its own few as well
+CACHED_PAGES = 8
+
+
+class PreviewLoader(QObject):
+    # TimesheetPreview, once the template is loaded and the roster counted
+    opened = Signal(object)
+    # page number, PreviewPage
+    loaded = Signal(int, object)
+    # page number the view had scrolled away from before it was read
+    skipped = Signal(int)
+    # error message
+    failed = Signal(str)
+
+    def __init__(self, **preview_args) -> None:
+        super().__init__()
+        self._preview_args = preview_args
+        self._preview = None
+        self._stopped = threading.Event()
+        # Page the view wants most recently; set from the GUI thread
+        self.latest_page = 0
+
+    @Slot()
+    def open(self) -> None:
+        # Deferred so the generator's dependencies stay out of startup
+        from timesheet_preview import TimesheetPreview
+        try:
+            self._preview = TimesheetPreview(**self._preview_args)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.opened.emit(self._preview)
+
+    # Requests queue up while a page is read, so by the time one is reached the
+    # view may have moved on; pages more than one away from it are dropped, and
+    # a long read towards one stops where it is once the view moves away
+    @Slot(int)
+    def load(self, number: int) -> None:
+        from timesheet_creator import GenerationCancelled
+        if self._preview is None or self._superseded(number):
+            self.skipped.emit(number)
+            return
+        try:
+            page = self._preview.page(number, should_cancel=lambda: self._superseded(number))
+        except GenerationCancelled:
+            self.skipped.emit(number)
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.loaded.emit(number, page)
+
+    def _superseded(self, number: int) -> bool:
+        return self._stopped.is_set() or abs(number - self.latest_page) > 1
+
+    # Safe from any thread; a page being read stops at the next employee
+    def stop(self) -> None:
+        self._stopped.set()
+
+    # Call once the loader's thread has finished
+    def close(self) -> None:
+        if self._preview is not None:
+            self._preview.close()
+            self._preview = None
+
+
+class EmployeePageModel(QAbstractTableModel):
+    COLUMNS = ("Row", "Name", "Position", "Location", "Days", "Regular", "Overtime", "Total")
+
+    # page number the view needs; connect to PreviewLoader.load
+    page_requested = Signal(int)
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._preview = None
+        self._loader: PreviewLoader | None = None
+        self._pages: OrderedDict = OrderedDict()
+        self._pending: set[int] = set()
+
+    @property
+    def preview(self):
+        return self._preview
+
+    def set_preview(self, preview, loader: PreviewLoader | None) -> None:
+        self.beginResetModel()
+        self._preview = preview
+        self._loader = loader
+        self._pages.clear()
+        self._pending.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid() or self._preview is None:
+            return 0
+        return self._preview.count
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.TextAlignmentRole):
+            return None
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignRight | Qt.AlignVCenter) if index.column() in (0, 4, 5, 6, 7) else None
+
+        entry = self.employee(index.row())
+        if entry is None:
+            return "Loading..." if index.column() == 1 else None
+        row, employee, _ = entry
+        values = (row, employee.name, employee.position, employee.location, employee.days,
+                  employee.total_reg, employee.total_ot, employee.total_hours)
+        return display_value(values[index.column()])
+
+    # (source row, Employee, fill) for a row of the list, or None while its
+    # page is still being read, which is then asked for
+    def employee(self, row: int):
+        if self._preview is None:
+            return None
+        number, offset = divmod(row, self._preview.page_size)
+        page = self._pages.get(number)
+        if page is None:
+            self._request(number)
+            return None
+        self._pages.move_to_end(number)
+        if offset >= len(page.employees):
+            return None
+        return page.first_row + offset, page.employees[offset], page.fills[offset]
+
+    def _request(self, number: int) -> None:
+        if self._loader is not None:
+            self._loader.latest_page = number
+        if number not in self._pending:
+            self._pending.add(number)
+            self.page_requested.emit(number)
+
+    @Slot(int, object)
+    def page_loaded(self, number: int, page) -> None:
+        # Pages still on their way from a loader that has since been replaced
+        if self.sender() is not self._loader:
+            return
+        self._pending.discard(number)
+        self._pages[number] = page
+        while len(self._pages) > CACHED_PAGES:
+            self._pages.popitem(last=False)
+        first = number * self._preview.page_size
+        last = min(first + self._preview.page_size, self._preview.count) - 1
+        self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.COLUMNS) - 1))
+
+    @Slot(int)
+    def page_skipped(self, number: int) -> None:
+        if self.sender() is self._loader:
+            self._pending.discard(number)
+
+
+# One rendered sheet, laid out as in Excel with lettered columns
+class TimesheetGridModel(QAbstractTableModel):
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._values: dict[tuple[int, int], object] = {}
+        self._rows = 0
+        self._cols = 0
+
+    def set_values(self, values: dict[tuple[int, int], object]) -> None:
+        self.beginResetModel()
+        self._values = values
+        self._rows = max((row for row, _ in values), default=0)
+        self._cols = max((col for _, col in values), default=0)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._cols
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return _column_letter(section + 1)
+        return str(section + 1)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        value = self._values.get((index.row() + 1, index.column() + 1))
+        if value is None:
+            return None
+        return display_value(value)
+
+
+# A cell value as the preview shows it, close to how Excel would
+def display_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%m/%d/%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%m/%d/%Y")
+    if isinstance(value, time):
+        return value.strftime("%H:%M")
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+def _column_letter(col: int) -> str:
+    letters = ""
+    while col:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
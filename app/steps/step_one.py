@@ -1,7 +1,6 @@
 from .base_step import BaseStep
 from PySide6.QtWidgets import QFileDialog, QHBoxLayout, QLabel, QPushButton, QLineEdit, QComboBox, QMessageBox
 from PySide6.QtWidgets import QSizePolicy
-import openpyxl
 from resources import resource_path
 
 
@@ -72,11 +71,13 @@ class StepOne(BaseStep):
             QMessageBox.information(self, "Download Complete", f"Example timesheet saved to:\n{save_path}")
 
     def _select_source_file(self) -> None:
+        from source_formats import source_extensions
+        patterns = " ".join(f"*{extension}" for extension in source_extensions())
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             "Select Source File",
             "",
-            "Excel Files (*.xlsx *.xlsm)"
+            f"Source Files ({patterns});;Excel Files (*.xlsx *.xlsm);;CSV Files (*.csv *.tsv *.txt);;SQLite Databases (*.db *.sqlite *.sqlite3)"
         )
 
         if file_path:
@@ -89,10 +90,9 @@ class StepOne(BaseStep):
             self.sheet_name_label.show()
             self.sheet_name_combobox.show()
 
-            workbook: openpyxl.Workbook = openpyxl.load_workbook(self.controller.source_path, read_only=True)
-            for sheet_name in workbook.sheetnames:
+            from source_cache import source_cache
+            for sheet_name in source_cache.sheet_names(self.controller.source_path):
                 self.sheet_name_combobox.addItem(sheet_name)
-            workbook.close()
 
     def _init_ui_rows(self) -> None:
         self.ui_rows: list[QHBoxLayout] = [QHBoxLayout(), QHBoxLayout(), QHBoxLayout()]
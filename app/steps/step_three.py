@@ -1,5 +1,8 @@
 from .base_step import BaseStep
-from PySide6.QtWidgets import QHBoxLayout, QLabel, QLineEdit, QPushButton
+from .preview import EmployeePageModel, PreviewLoader, TimesheetGridModel
+from PySide6.QtCore import QCoreApplication, QThread, Qt
+from PySide6.QtWidgets import QAbstractItemView, QHBoxLayout, QHeaderView, QLabel, QLineEdit, QPushButton, QSplitter, QTableView
+from resources import resource_path
 
 
 class StepThree(BaseStep):
@@ -60,6 +63,54 @@ class StepThree(BaseStep):
         advanced_settings_button.clicked.connect(self._show_advanced_settings)
         row_4.addWidget(advanced_settings_button)
 
+        # Row 5: Preview status
+        row_5: QHBoxLayout = self.ui_rows[5]
+        row_5.setContentsMargins(10, 0, 10, 0)
+
+        preview_label = QLabel("Preview: ")
+        row_5.addWidget(preview_label)
+
+        self.preview_status_label = QLabel("")
+        row_5.addWidget(self.preview_status_label, 1)
+
+        # Row 6: Preview of the employees and the selected employee's timesheet.
+        # Only the pages of employees in view are ever read and rendered.
+        row_6: QHBoxLayout = self.ui_rows[6]
+        row_6.setContentsMargins(10, 10, 10, 10)
+
+        self.employee_model = EmployeePageModel(self)
+        self.employee_table = QTableView()
+        self.employee_table.setModel(self.employee_model)
+        self.employee_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.employee_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.employee_table.verticalHeader().hide()
+        # Fixed row heights, so the view never has to measure every row
+        self.employee_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.employee_table.horizontalHeader().setStretchLastSection(True)
+        self.employee_table.selectionModel().currentRowChanged.connect(self._preview_current_employee)
+        self.employee_model.dataChanged.connect(self._preview_current_employee)
+
+        self.grid_model = TimesheetGridModel(self)
+        self.grid_table = QTableView()
+        self.grid_table.setModel(self.grid_model)
+        self.grid_table.horizontalHeader().setDefaultSectionSize(110)
+
+        preview_splitter = QSplitter(Qt.Horizontal)
+        preview_splitter.addWidget(self.employee_table)
+        preview_splitter.addWidget(self.grid_table)
+        preview_splitter.setStretchFactor(0, 3)
+        preview_splitter.setStretchFactor(1, 2)
+        preview_splitter.setMinimumHeight(240)
+        row_6.addWidget(preview_splitter)
+
+        # The settings the preview was built for, and its loader while one runs
+        self._preview_key: tuple | None = None
+        self._preview_loader = None
+        self._preview_thread: QThread | None = None
+        # Stopped loaders whose threads are still finishing a page
+        self._retired_previews: list = []
+        QCoreApplication.instance().aboutToQuit.connect(self._shut_down_previews)
+
         self.layout().addStretch()
 
     def _show_advanced_settings(self) -> None:
@@ -70,10 +121,109 @@ class StepThree(BaseStep):
         self.source_file_display.setText(self.controller.source_path or "")
         self.sheet_name_display.setText(self.controller.source_sheet_name or "")
         self.start_date_display.setText(self.controller.start_date or "")
+        self._start_preview()
         super().showEvent(event)
 
+    # The preview is dropped while another step is shown; its settings may change
+    def hideEvent(self, event) -> None:
+        self._stop_preview()
+        super().hideEvent(event)
+
+    # Preview what the current settings would generate. The template is loaded
+    # and the roster counted on the loader's thread, which then reads pages as
+    # the employee list asks for them.
+    def _start_preview(self) -> None:
+        controller = self.controller
+        key = (controller.source_path, controller.source_sheet_name, controller.start_date, controller.row_range)
+        if key == self._preview_key:
+            return
+        self._stop_preview()
+        self._preview_key = key
+        if not (controller.source_path and controller.source_sheet_name and controller.start_date):
+            self.preview_status_label.setText("Choose a source file, sheet and start date first.")
+            return
+
+        loader = PreviewLoader(
+            source_file_path=controller.source_path,
+            source_sheet_name=controller.source_sheet_name,
+            template_file_path=resource_path("assets", "timesheet_template.xlsx"),
+            start_date=controller.start_date,
+            row_range=controller.row_range
+        )
+        thread = QThread(self)
+        loader.moveToThread(thread)
+        thread.started.connect(loader.open)
+        # Queued explicitly: the loader emits from its own thread, and the
+        # handlers touch widgets, which only the GUI thread may do
+        loader.opened.connect(self._preview_opened, Qt.QueuedConnection)
+        loader.failed.connect(self._preview_failed, Qt.QueuedConnection)
+        loader.loaded.connect(self.employee_model.page_loaded, Qt.QueuedConnection)
+        loader.skipped.connect(self.employee_model.page_skipped, Qt.QueuedConnection)
+        self.employee_model.page_requested.connect(loader.load, Qt.QueuedConnection)
+        thread.finished.connect(self._preview_thread_finished)
+
+        self._preview_loader = loader
+        self._preview_thread = thread
+        self.preview_status_label.setText("Loading...")
+        thread.start()
+
+    # A page being read stops at its next employee and the thread finishes in
+    # the background, so leaving the step never waits on the source
+    def _stop_preview(self) -> None:
+        self._preview_key = None
+        loader, thread = self._preview_loader, self._preview_thread
+        self.employee_model.set_preview(None, None)
+        self.grid_model.set_values({})
+        if loader is None:
+            return
+        self.employee_model.page_requested.disconnect(loader.load)
+        loader.stop()
+        thread.quit()
+        self._retired_previews.append((loader, thread))
+        self._preview_loader = None
+        self._preview_thread = None
+
+    def _preview_thread_finished(self) -> None:
+        for loader, thread in list(self._retired_previews):
+            if thread.isFinished():
+                loader.close()
+                loader.deleteLater()
+                thread.deleteLater()
+                self._retired_previews.remove((loader, thread))
+
+    def _shut_down_previews(self) -> None:
+        self._stop_preview()
+        for loader, thread in self._retired_previews:
+            thread.wait()
+            loader.close()
+        self._retired_previews.clear()
+
+    def _preview_opened(self, preview) -> None:
+        if self.sender() is not self._preview_loader:
+            return
+        self.employee_model.set_preview(preview, self._preview_loader)
+        self.preview_status_label.setText(
+            f"{preview.count:,} employee{'s' if preview.count != 1 else ''}. Select one to see their timesheet."
+            if preview.count else "No employees in the selected rows."
+        )
+
+    def _preview_failed(self, error: str) -> None:
+        if self.sender() is not self._preview_loader:
+            return
+        self.preview_status_label.setText(f"Unavailable: {error}")
+
+    # Show the selected employee's sheet, once their page has been read
+    def _preview_current_employee(self, *_) -> None:
+        current = self.employee_table.currentIndex()
+        entry = self.employee_model.employee(current.row()) if current.isValid() else None
+        if entry is None:
+            self.grid_model.set_values({})
+            return
+        preview = self.employee_model.preview
+        self.grid_model.set_values(preview.sheet_values(entry[2]))
+
     def _init_ui_rows(self) -> None:
-        self.ui_rows: list[QHBoxLayout] = [QHBoxLayout(), QHBoxLayout(), QHBoxLayout(), QHBoxLayout(), QHBoxLayout()]
+        self.ui_rows: list[QHBoxLayout] = [QHBoxLayout() for _ in range(7)]
 
     def _build_notes_widget(self) -> None:
         self.notes_widget = None
@@ -0,0 +1,176 @@
+from collections.abc import Callable
+from datetime import date
+import json
+import os
+import re
+from openpyxl.utils.cell import coordinate_to_tuple
+from roster import Employee
+
+
+# Where each employee's values go in a timesheet template, compiled once per
+# template into integer (row, col) targets. A target is a cell spec: text with
+# {field} placeholders, e.g. "Location: {location}". A spec that is nothing but
+# one placeholder puts the field's own value in the cell (a date, a clock time,
+# a number), otherwise the fields are formatted into the text.
+#
+# The specs come from, in order of preference:
+#   - a <template name>.fields.json next to the template, {"A16": "Location: {location}", ...}
+#   - cells of the template sheet that themselves hold {field} placeholders
+#   - DEFAULT_FIELDS, the layout of the bundled template
+#
+# Day fields are given on the first day's row and repeat one row further down
+# for every further day of the period.
+
+EMPLOYEE_FIELDS = ("name", "position", "location", "total_reg", "total_ot", "total_hours")
+DAY_FIELDS = ("date", "clock_in", "clock_out", "hours")
+
+DEFAULT_FIELDS = {
+    "A1": "{name}\nPosition: {position}",
+    "A16": "Location: {location}",
+    "B2": "{clock_in}",
+    "C2": "{clock_out}",
+    "D2": "{hours}",
+    "A2": "{date}",
+    "D16": "Regular: {total_reg}",
+    "E16": "OverTime: {total_ot}",
+    "F16": "Total Hours: {total_hours}",
+}
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+def mapping_path(template_file_path: str) -> str:
+    return f"{os.path.splitext(str(template_file_path))[0]}.fields.json"
+
+# A spec as (literal, field, literal, field, ..., literal), or just (field,)
+# when the field fills the whole cell
+def _compile_spec(spec: str, coordinate: str) -> tuple[str, ...]:
+    parts = _PLACEHOLDER.split(spec)
+    for field in parts[1::2]:
+        if field not in EMPLOYEE_FIELDS and field not in DAY_FIELDS:
+            raise ValueError(f"Unknown timesheet field {{{field}}} in {coordinate}")
+    if len(parts) == 3 and not parts[0] and not parts[2]:
+        return (parts[1],)
+    return tuple(parts)
+
+
+class FillPlan:
+    # fields maps cell coordinates to specs, in the order they are filled;
+    # all the day cells are filled at the point the first of them appears
+    def __init__(self, fields: dict[str, str]) -> None:
+        # (row, col, employee -> value) filled once per employee, before and after the days
+        self.before: list[tuple[int, int, Callable[[Employee], object]]] = []
+        self.after: list[tuple[int, int, Callable[[Employee], object]]] = []
+        # (first row, col, compiled spec) filled once per day
+        self.days: list[tuple[int, int, tuple[str, ...]]] = []
+
+        for coordinate, spec in fields.items():
+            row, col = coordinate_to_tuple(coordinate)
+            parts = _compile_spec(str(spec), coordinate)
+            if any(field in DAY_FIELDS for field in parts[len(parts) > 1::2]):
+                self.days.append((row, col, parts))
+            else:
+                (self.after if self.days else self.before).append((row, col, _employee_cell(parts)))
+
+    # The cell the date alone goes in on the first day, if there is one
+    @property
+    def date_cell(self) -> tuple[int, int] | None:
+        for row, col, parts in self.days:
+            if parts == ("date",):
+                return row, col
+        return None
+
+    # The plan for a template: its mapping file, else its placeholders, else the default
+    @classmethod
+    def for_template(cls, template_file_path: str, sheet) -> "FillPlan":
+        path = mapping_path(template_file_path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                fields = json.load(file)
+            if not isinstance(fields, dict):
+                raise ValueError(f"{path} must map cell coordinates to field specs")
+            return cls(fields)
+
+        fields = {
+            cell.coordinate: cell.value
+            for row in sheet.iter_rows()
+            for cell in row
+            if isinstance(cell.value, str) and _PLACEHOLDER.search(cell.value)
+        }
+        return cls(fields or DEFAULT_FIELDS)
+
+    # The (row, col) -> value fills for one employee's timesheet
+    def fill(self, employee: Employee, dates) -> dict[tuple[int, int], object]:
+        values: dict[tuple[int, int], object] = {}
+        for row, col, value_of in self.before:
+            values[(row, col)] = value_of(employee)
+
+        if self.days:
+            day_getters = {
+                "date": dates.day,
+                "clock_in": employee.clock_in_at,
+                "clock_out": employee.clock_out_at,
+                "hours": employee.hours_at,
+            }
+            # A field alone in a cell is just its getter, so most day cells
+            # cost a single call
+            day_cells = [
+                (row, col, day_getters[parts[0]] if len(parts) == 1 else _day_cell(parts, employee, day_getters))
+                for row, col, parts in self.days
+            ]
+            for i in range(employee.days):
+                for row, col, value_at in day_cells:
+                    values[(row + i, col)] = value_at(i)
+
+        for row, col, value_of in self.after:
+            values[(row, col)] = value_of(employee)
+        return values
+
+
+# Employee fields are read straight off the Employee attributes of the same name
+def _employee_cell(parts: tuple[str, ...]) -> Callable[[Employee], object]:
+    if len(parts) == 1:
+        field = parts[0]
+        return lambda employee: _value(field, getattr(employee, field))
+
+    def value_of(employee: Employee) -> str:
+        text = list(parts)
+        for idx in range(1, len(parts), 2):
+            text[idx] = _text(parts[idx], getattr(employee, parts[idx]))
+        return "".join(text)
+    return value_of
+
+def _day_cell(parts: tuple[str, ...], employee: Employee, day_getters: dict) -> Callable[[int], str]:
+    def value_at(day: int) -> str:
+        text = list(parts)
+        for idx in range(1, len(parts), 2):
+            field = parts[idx]
+            value = day_getters[field](day) if field in day_getters else getattr(employee, field)
+            text[idx] = _text(field, value)
+        return "".join(text)
+    return value_at
+
+# A field's value for a cell of its own
+def _value(field: str, value):
+    if field in ("total_reg", "total_ot", "total_hours"):
+        return round(float(value), 2)
+    if field in ("name", "position", "location"):
+        return _text(field, value)
+    return value
+
+# A field's value written into text
+def _text(field: str, value) -> str:
+    if field == "position":
+        return f"{value if value else 'N/A'}"
+    if field in ("total_reg", "total_ot", "total_hours"):
+        return f"{round(float(value), 2)}"
+    if field in DAY_FIELDS:
+        if value is None:
+            return ""
+        if isinstance(value, date):
+            return value.strftime("%m/%d/%Y %H:%M" if field in ("clock_in", "clock_out") else "%m/%d/%Y")
+    return f"{value}"
+
+
+# The bundled template's plan
+DEFAULT_PLAN = FillPlan(DEFAULT_FIELDS)
@@ -0,0 +1,221 @@
+# Batch entry point: run many generation jobs (source files, sheets, pay
+# periods) from one manifest in a single process tree.
+#   python -m timesheet_batch jobs.json [--workers 4] [--report report.json]
+#
+# The manifest is JSON, either a list of jobs or {"template": ..., "jobs": [...]}:
+#   {"source": "march.xlsx", "sheet": "EXAMPLE SHEET", "start_date": "03/01/2026",
+#    "start_row": 2, "end_row": null, "output": "march_timesheets.xlsx", "pdf": true}
+# Relative paths are resolved against the manifest's directory; output defaults
+# to <source name>_<yyyy-mm-dd start date>_timesheets.xlsx next to the source,
+# so pay periods of one export don't share a file.
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+import json
+import math
+import os
+import sys
+import time
+from collections.abc import Callable
+from resources import resource_path
+from timesheet_creator import create_timesheets
+from timesheet_writer import TimesheetTemplate
+from worker_common import load_template
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+
+# One entry of a batch manifest
+class BatchJob:
+    def __init__(
+            self,
+            source_file_path: str,
+            source_sheet_name: str,
+            start_date: str,
+            output_file_path: str,
+            row_range: tuple[int, int] = (2, math.inf),
+            pdf: bool = False
+        ) -> None:
+        self.source_file_path = source_file_path
+        self.source_sheet_name = source_sheet_name
+        self.start_date = start_date
+        self.output_file_path = output_file_path
+        self.row_range = row_range
+        self.pdf = pdf
+
+    @classmethod
+    def from_entry(cls, entry: dict, base_dir: str) -> "BatchJob":
+        for key in ("source", "sheet", "start_date"):
+            if not entry.get(key):
+                raise ValueError(f"missing {key!r}")
+        start = datetime.strptime(entry["start_date"], "%m/%d/%Y")
+
+        source = os.path.join(base_dir, entry["source"])
+        output = entry.get("output")
+        if output:
+            output = os.path.join(base_dir, output)
+        else:
+            stem = os.path.splitext(source)[0]
+            output = f"{stem}_{start:%Y-%m-%d}_timesheets.xlsx"
+
+        start_row = int(entry.get("start_row") or 2)
+        end_row = entry.get("end_row")
+        end_row = math.inf if end_row is None else int(end_row)
+        if start_row < 2 or end_row < start_row:
+            raise ValueError(f"invalid row range {start_row}-{end_row}")
+        return cls(source, entry["sheet"], entry["start_date"], output, (start_row, end_row), bool(entry.get("pdf")))
+
+    def describe(self) -> dict:
+        return {
+            "source": self.source_file_path,
+            "sheet": self.source_sheet_name,
+            "start_date": self.start_date,
+            "row_range": [self.row_range[0], None if self.row_range[1] == math.inf else self.row_range[1]],
+            "output": self.output_file_path,
+        }
+
+
+# Read a manifest into its jobs and the template they use; errors name the entry at fault
+def load_batch(manifest_file_path: str) -> tuple[list[BatchJob], str]:
+    with open(manifest_file_path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_file_path))
+    template = manifest.get("template")
+    template = os.path.join(base_dir, template) if template else str(resource_path("assets", "timesheet_template.xlsx"))
+
+    jobs = []
+    claimed: dict[str, int] = {}
+    for idx, entry in enumerate(manifest.get("jobs") or []):
+        try:
+            job = BatchJob.from_entry(entry, base_dir)
+        except (AttributeError, TypeError, ValueError) as e:
+            raise ValueError(f"job {idx + 1}: {e}") from None
+        # Two jobs writing one file at once would corrupt it
+        key = os.path.normcase(os.path.abspath(job.output_file_path))
+        if key in claimed:
+            raise ValueError(f"job {idx + 1}: job {claimed[key]} is also written to {job.output_file_path}")
+        claimed[key] = idx + 1
+        jobs.append(job)
+    if not jobs:
+        raise ValueError("the manifest has no jobs")
+    return jobs, template
+
+
+# Run one job, reporting a failure in its result rather than raising
+def run_job(job: BatchJob, template_file_path: str) -> dict:
+    start = time.perf_counter()
+    result = {**job.describe(), "status": "ok", "error": None, "outputs": []}
+    try:
+        result["outputs"] = create_timesheets(
+            source_file_path=job.source_file_path,
+            source_sheet_name=job.source_sheet_name,
+            template_file_path=template_file_path,
+            output_file_path=job.output_file_path,
+            start_date=job.start_date,
+            row_range=job.row_range,
+            template=load_template(TimesheetTemplate, template_file_path)
+        )
+        if job.pdf:
+            from timesheet_pdf import create_timesheet_pdf
+            result["outputs"].append(create_timesheet_pdf(
+                source_file_path=job.source_file_path,
+                source_sheet_name=job.source_sheet_name,
+                template_file_path=template_file_path,
+                output_pdf_path=os.path.splitext(job.output_file_path)[0] + ".pdf",
+                start_date=job.start_date,
+                row_range=job.row_range
+            ))
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["wall_s"] = time.perf_counter() - start
+    return result
+
+# Run every job, workers at a time on one shared process pool (in this process
+# when workers is 1). progress(done, total) is called as jobs finish.
+# Returns the summary report; failed jobs are recorded there, not raised.
+def run_batch(
+        jobs: list[BatchJob],
+        template_file_path: str,
+        workers: int = 1,
+        progress: Callable[[int, int], None] | None = None
+    ) -> dict:
+
+    template_file_path = str(template_file_path)
+    started = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    results: list[dict | None] = [None] * len(jobs)
+
+    if workers <= 1:
+        for idx, job in enumerate(jobs):
+            results[idx] = run_job(job, template_file_path)
+            if progress is not None:
+                progress(idx + 1, len(jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            futures = {pool.submit(run_job, job, template_file_path): idx for idx, job in enumerate(jobs)}
+            for done, future in enumerate(as_completed(futures), 1):
+                idx = futures[future]
+                try:
+                    results[idx] = future.result()
+                except Exception as e:
+                    # The worker process itself died
+                    results[idx] = {**jobs[idx].describe(), "status": "failed", "error": f"{type(e).__name__}: {e}",
+                                    "outputs": [], "wall_s": None}
+                if progress is not None:
+                    progress(done, len(jobs))
+
+    return {
+        "started": started.isoformat(timespec="seconds"),
+        "wall_s": time.perf_counter() - start,
+        "workers": workers,
+        "template": template_file_path,
+        "succeeded": sum(result["status"] == "ok" for result in results),
+        "failed": sum(result["status"] != "ok" for result in results),
+        "jobs": results,
+    }
+
+def write_report(report: dict, report_file_path: str) -> None:
+    with open(report_file_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+def format_summary(report: dict) -> str:
+    lines = []
+    for result in report["jobs"]:
+        wall = f"{result['wall_s']:8.2f}s" if result["wall_s"] is not None else "       -"
+        detail = result["error"] if result["error"] else ", ".join(result["outputs"])
+        lines.append(f"{result['status']:<6} {wall}  {result['source']} [{result['sheet']}] {result['start_date']}: {detail}")
+    lines.append(f"{report['succeeded']} succeeded, {report['failed']} failed in {report['wall_s']:.2f}s")
+    return "\n".join(lines)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="timesheet_batch",
+        description="Run every timesheet generation job in a batch manifest."
+    )
+    parser.add_argument("manifest", help="JSON batch manifest")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="jobs run at once, each in its own process (default: 1)")
+    parser.add_argument("--template", help="timesheet template workbook (default: the manifest's, else the bundled one)")
+    parser.add_argument("--report", help="JSON summary report (default: <manifest name>_report.json next to the manifest)")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs, template = load_batch(args.manifest)
+    except (OSError, ValueError) as e:
+        parser.error(f"{args.manifest}: {e}")
+
+    report = run_batch(jobs, args.template or template, workers=max(1, args.workers))
+    report_path = args.report or f"{os.path.splitext(args.manifest)[0]}_report.json"
+    write_report(report, report_path)
+
+    print(format_summary(report), file=sys.stderr)
+    print(f"Report written to {report_path}", file=sys.stderr)
+    return EXIT_FAILED if report["failed"] else EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# Headless entry point: generate timesheets without the Qt wizard.
+#   python -m timesheet_cli SOURCE [SOURCE ...] --sheet NAME --start-date MM/DD/YYYY
+import argparse
+from datetime import datetime
+import math
+import os
+import sys
+from generation_profile import CAPTURE_MODES, GenerationProfile, timing_report_path
+from hours_validation import OvertimeRules, check_hours
+from resources import resource_path
+from roster_store import DEFAULT_MAX_BYTES, roster_store
+from source_cache import source_cache
+from source_formats import format_for
+from source_reader import iter_employees
+from timesheet_creator import create_timesheets
+from timesheet_parallel import SPLIT_MODES
+from timesheet_writer import COMPRESSION_LEVELS, compression_level
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+
+def _start_date(value: str) -> str:
+    try:
+        datetime.strptime(value, "%m/%d/%Y")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid start date {value!r}, expected mm/dd/yyyy")
+    return value
+
+def _hours(value: str) -> float:
+    try:
+        hours = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid hours {value!r}")
+    if hours < 0:
+        raise argparse.ArgumentTypeError(f"expected hours of 0 or more, got {value!r}")
+    return hours
+
+def _megabytes(value: str) -> int:
+    try:
+        megabytes = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size {value!r}")
+    if megabytes < 0:
+        raise argparse.ArgumentTypeError(f"expected a size of 0 or more, got {value!r}")
+    return megabytes
+
+def _compression(value: str) -> str:
+    try:
+        compression_level(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return number
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="timesheet_cli",
+        description="Generate timesheets from one or more source workbooks, CSV exports or SQLite databases without the GUI."
+    )
+    parser.add_argument("sources", nargs="+", metavar="SOURCE", help="source .xlsx/.xlsm workbook(s), .csv export(s) or SQLite .db file(s)")
+    parser.add_argument("-s", "--sheet", default=None,
+                        help="name of the sheet (or SQLite table) holding the raw timesheet data; not needed for CSV files or single-table databases")
+    parser.add_argument("-d", "--start-date", required=True, type=_start_date, help="first day of the period, mm/dd/yyyy")
+    parser.add_argument("--start-row", type=_positive_int, default=2, help="first source row to read (default: 2)")
+    parser.add_argument("--end-row", type=_positive_int, default=None, help="last source row to read, inclusive (default: unlimited)")
+    parser.add_argument("-o", "--output", help="output .xlsx path; only valid with a single source")
+    parser.add_argument("--output-dir", help="directory for the generated workbooks (default: next to each source)")
+    parser.add_argument("--template", default=str(resource_path("assets", "timesheet_template.xlsx")), help="timesheet template workbook")
+    parser.add_argument("-w", "--workers", type=_positive_int, default=1, help="worker processes per source (default: 1)")
+    parser.add_argument("--split", choices=SPLIT_MODES, default=None,
+                        help="write one workbook per shard or per location, plus an _index.xlsx listing them")
+    parser.add_argument("--split-size", type=_positive_int, default=None, metavar="N",
+                        help="at most N employees per split workbook (implies --split shard when --split is not given)")
+    parser.add_argument("--pdf", action="store_true", help="also render the timesheets to a PDF next to the output")
+    parser.add_argument("--incremental", action="store_true",
+                        help="keep a manifest next to each output and only rebuild employees changed since the last run")
+    parser.add_argument("--check-hours", action="store_true",
+                        help="report daily hours, totals and overtime that don't match the clock times")
+    parser.add_argument("--recompute-hours", action="store_true",
+                        help="write hours and overtime recomputed from the clock times instead of the source's")
+    parser.add_argument("--weekly-overtime", type=_hours, default=40.0, metavar="HOURS",
+                        help="weekly hours before overtime when checking or recomputing (default: 40, 0 for none)")
+    parser.add_argument("--daily-overtime", type=_hours, default=0.0, metavar="HOURS",
+                        help="daily hours before overtime when checking or recomputing (default: 0 for none)")
+    parser.add_argument("--compression", type=_compression, default=None, metavar="|".join(COMPRESSION_LEVELS) + "|0-9",
+                        help="trade saving time for file size: fast, small or a zlib level (default: zlib's default, 6)")
+    parser.add_argument("--timing-report", action="store_true",
+                        help="time each phase of the run and write a JSON report next to the output (<output>.timing.json)")
+    parser.add_argument("--capture", choices=CAPTURE_MODES, default=None,
+                        help="also profile the run with cProfile or tracemalloc into the timing report (implies --timing-report)")
+    parser.add_argument("--cache-dir",
+                        help=f"keep parsed sources in this private directory between runs, so unchanged exports aren't read again "
+                             f"(off unless this or --cache-size is given; default directory: {roster_store.directory})")
+    parser.add_argument("--cache-size", type=_megabytes, metavar="MB",
+                        help=f"keep parsed sources between runs, up to this size before old entries are dropped "
+                             f"(default when --cache-dir is given: {DEFAULT_MAX_BYTES // (1024 * 1024)})")
+    return parser
+
+# Where a source's timesheets are written. keep_extension names them after the
+# whole file name, so r.xlsx and r.csv in one folder get outputs of their own.
+def output_path_for(source_file_path: str, output: str | None, output_dir: str | None, keep_extension: bool = False) -> str:
+    if output:
+        return output
+    stem = os.path.basename(source_file_path)
+    if not keep_extension:
+        stem = os.path.splitext(stem)[0]
+    directory = output_dir or os.path.dirname(os.path.abspath(source_file_path))
+    return os.path.join(directory, f"{stem}_timesheets.xlsx")
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.output and len(args.sources) > 1:
+        parser.error("--output can only be used with a single source; use --output-dir instead")
+    if args.end_row is not None and args.end_row < args.start_row:
+        parser.error("--end-row must not be before --start-row")
+    if args.split_size and not args.split:
+        args.split = "shard"
+    if args.incremental and (args.workers > 1 or args.split):
+        parser.error("--incremental can't be combined with --workers or --split")
+
+    # Without a PDF or an hours check every source is read exactly once, so
+    # keeping parsed rows would only cost memory
+    if not args.pdf and not args.check_hours:
+        source_cache.max_rows = 0
+
+    # Parsed sources are only kept on disk when asked for
+    if args.cache_dir is not None or args.cache_size is not None:
+        roster_store.directory = args.cache_dir or roster_store.directory
+        roster_store.max_bytes = DEFAULT_MAX_BYTES if args.cache_size is None else args.cache_size * 1024 * 1024
+
+    row_range = (args.start_row, args.end_row if args.end_row is not None else math.inf)
+    overtime_rules = OvertimeRules(weekly_hours=args.weekly_overtime or None, daily_hours=args.daily_overtime or None)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    # Resolve every output first, so no source overwrites another's
+    jobs = [(source, output_path_for(source, args.output, args.output_dir)) for source in args.sources]
+    claimed: dict[str, str] = {}
+    for source, output in jobs:
+        key = os.path.normcase(os.path.abspath(output))
+        if key in claimed:
+            parser.error(f"{claimed[key]} and {source} would both be written to {output}")
+        claimed[key] = source
+
+    exit_code = EXIT_OK
+    for source, output in jobs:
+        profile = GenerationProfile(capture=args.capture) if args.timing_report or args.capture else None
+        try:
+            sheet = args.sheet or format_for(source).default_sheet(source)
+            if sheet is None:
+                raise ValueError("--sheet is required for this source")
+            if args.check_hours:
+                issues = check_hours(iter_employees(source, sheet, row_range), overtime_rules, first_row=args.start_row)
+                for issue in issues:
+                    print(f"{source}: {issue}", file=sys.stderr)
+                print(f"{source}: {len(issues)} hours issue(s)", file=sys.stderr)
+            output_paths = create_timesheets(
+                source_file_path=source,
+                source_sheet_name=sheet,
+                template_file_path=args.template,
+                output_file_path=output,
+                start_date=args.start_date,
+                row_range=row_range,
+                workers=args.workers,
+                split_output=args.split,
+                split_size=args.split_size,
+                incremental=args.incremental,
+                overtime_rules=overtime_rules if args.recompute_hours else None,
+                profile=profile,
+                compression=args.compression
+            )
+            if args.pdf:
+                from timesheet_pdf import create_timesheet_pdf
+                output_paths.append(create_timesheet_pdf(
+                    source_file_path=source,
+                    source_sheet_name=sheet,
+                    template_file_path=args.template,
+                    output_pdf_path=os.path.splitext(output)[0] + ".pdf",
+                    start_date=args.start_date,
+                    row_range=row_range,
+                    workers=args.workers,
+                    incremental=args.incremental,
+                    overtime_rules=overtime_rules if args.recompute_hours else None,
+                    profile=profile
+                ))
+            if profile is not None:
+                report_path = timing_report_path(output)
+                profile.write_report(report_path)
+                print(f"{source}: timings\n{profile.format_summary()}", file=sys.stderr)
+                output_paths.append(report_path)
+        except Exception as e:
+            if profile is not None:
+                profile.stop()
+            print(f"{parser.prog}: error: {source}: {e}", file=sys.stderr)
+            exit_code = EXIT_FAILED
+            continue
+
+        for path in output_paths:
+            print(path)
+
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
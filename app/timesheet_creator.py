@@ -1,17 +1,27 @@
+from collections.abc import Callable
 from decimal import Decimal
-import openpyxl
-from openpyxl import Workbook
-from openpyxl.worksheet.worksheet import Worksheet
 from openpyxl.cell.rich_text import CellRichText
 from openpyxl.worksheet.formula import ArrayFormula, DataTableFormula
-import os
 import re
 from datetime import date, datetime, time, timedelta
-from dateutil.relativedelta import relativedelta
-from showinfm import show_in_file_manager
+import os
+from collections.abc import Iterator
+from zipfile import ZipFile
+from openpyxl.styles.cell_style import StyleArray
+from generation_profile import NO_PROFILE, GenerationProfile
+from hours_validation import OvertimeRules, recompute_hours
 from resources import resource_path
+from roster import Employee
+from source_reader import iter_employees, source_max_row
+from template_plan import DEFAULT_PLAN, FillPlan
+from timesheet_manifest import employee_hash, load_manifest, manifest_header, save_manifest
+from timesheet_writer import TimesheetTemplate, TimesheetWriter, inline_strings, read_shared_strings
 import math
-from PySide6.QtWidgets import QMessageBox
+
+
+# Raised between employees when generation is cancelled; nothing is saved
+class GenerationCancelled(Exception):
+    pass
 
 
 # Clean the sheet name for Excel
@@ -19,78 +29,219 @@ def clean_sheet_name(name: str) -> str:
     cleaned: str = re.sub(r'[^A-Za-z0-9]', '', name)
     return cleaned[:30]
 
+# The timesheet's date column, parsed once from the mm/dd/yyyy start date and
+# reused for every employee. Days are native dates when the template formats
+# its date cells as dates, and mm/dd/yyyy strings otherwise.
+class DateColumn:
+    def __init__(self, start_date: str, native: bool = True) -> None:
+        self.start: date = datetime.strptime(start_date, "%m/%d/%Y").date()
+        self.native = native
+        self._days: list = []
+
+    # Value for the day at this offset from the start date
+    def day(self, offset: int):
+        while len(self._days) <= offset:
+            day: date = self.start + timedelta(days=len(self._days))
+            self._days.append(day if self.native else day.strftime("%m/%d/%Y"))
+        return self._days[offset]
+
+    # template is a TimesheetTemplate or a PdfLayout; dates are native unless
+    # the cell the plan puts them in is not formatted as a date
+    @classmethod
+    def for_template(cls, start_date: str, template) -> "DateColumn":
+        date_cell = template.plan.date_cell
+        return cls(start_date, native=date_cell is None or template.is_date_cell(*date_cell))
+
+# Build the (row, col) -> value fills for one employee's timesheet; plan is the
+# template's (TimesheetTemplate.plan or PdfLayout.plan)
+def render_timesheet(employee: Employee, dates: DateColumn, plan: FillPlan = DEFAULT_PLAN) -> dict[tuple[int, int], object]:
+    return plan.fill(employee, dates)
+
+# The employees in the row range, with their hours recomputed from the clock
+# times when overtime_rules are given instead of copied from the source
+def source_employees(
+        source_file_path: str,
+        source_sheet_name: str,
+        row_range: tuple[int, int] = (2, math.inf),
+        overtime_rules: OvertimeRules | None = None
+    ) -> Iterator[Employee]:
+    employees = iter_employees(source_file_path, source_sheet_name, row_range)
+    if overtime_rules is not None:
+        employees = recompute_hours(employees, overtime_rules)
+    return employees
+
+# Number of employees in the row range, for reporting progress
+def employee_count(source_file_path: str, source_sheet_name: str, row_range: tuple[int, int] = (2, math.inf)) -> int:
+    last_row = source_max_row(source_file_path, source_sheet_name)
+    if row_range[1] != math.inf:
+        last_row = min(last_row, int(row_range[1]))
+    return max(0, last_row - int(row_range[0]) + 1)
+
 # start_date is mm/dd/yyyy format; row range is inclusive
+# workers > 1 spreads generation over that many processes; split_output "shard"
+# or "location" writes one workbook per shard or per location instead of one,
+# plus an index workbook; split_size caps the employees per split workbook
+# progress(done, total) is called as employees are written; when should_cancel()
+# returns True, GenerationCancelled is raised and no output is left behind
+# incremental keeps a manifest next to the output and, on a re-run, only
+# renders employees whose source rows changed; the rest are carried over
+# template is an already parsed template_file_path to reuse across runs
+# overtime_rules recomputes daily hours and the regular/overtime split from the
+# clock times rather than trusting the source's (see hours_validation)
+# profile times the run's phases (see generation_profile) and records the size
+# of each workbook written; the caller stops it and writes its report
+# compression trades saving time for file size: "fast", "small" or a zlib
+# level from 0 to 9 (see timesheet_writer.compression_level)
+# Returns the paths of the workbooks written; errors are raised to the caller
 def create_timesheets(
         source_file_path: str,
         source_sheet_name: str,
         template_file_path: str,
         output_file_path: str,
         start_date: str,
-        row_range: tuple[int, int] = (2, math.inf)
-    ) -> bool:
-
-    # Load src and template workbooks
-    src_wb: Workbook = openpyxl.load_workbook(source_file_path, data_only=True)
-    src_ws = src_wb[source_sheet_name]
-    tmpl_wb: Workbook = openpyxl.load_workbook(template_file_path)
-    base_sheet = tmpl_wb["Template"]
-
-    min_row = int(row_range[0])
-    max_row = int(row_range[1]) if row_range[1] != math.inf else src_ws.max_row
-    for row in src_ws.iter_rows(min_row=min_row, max_row=max_row, values_only=True):
-        name, position, location, *rest = row
-        if not name: break
-
-        # Create the new sheet for current person
-        sheet_name: str = clean_sheet_name(name)
-        if sheet_name in tmpl_wb.sheetnames:
-            tmpl_wb.remove(tmpl_wb[sheet_name])
-        new_sheet: Worksheet = tmpl_wb.copy_worksheet(base_sheet)
-        new_sheet.title = sheet_name
-
-        # Add name, and position to timesheet
-        new_sheet["A1"].value = f"{name}\nPosition: {position if position else 'N/A'}"
-
-        # add location to timesheet
-        new_sheet["A16"].value = f"Location: {location}"
-
-        # Grab and populate the clock in/out and total hours for each day
-        daily_clock_data: list = rest[:-3]
-        for i in range(int(len(daily_clock_data) / 3)):
-            clock_in = daily_clock_data[i*3]
-            clock_out = daily_clock_data[i*3+1]
-            total_hours = daily_clock_data[i*3+2]
-
-            date: date = datetime.strptime(start_date, "%m/%d/%Y").date()
-            date = date + relativedelta(days=+i)
-
-            new_sheet[f"B{i+2}"].value = clock_in
-            new_sheet[f"C{i+2}"].value = clock_out
-            new_sheet[f"D{i+2}"].value = total_hours
-            
-            new_sheet[f"A{i+2}"].value = date.strftime("%m/%d/%Y")
-        
-        # Grab and populate the total, reg, and OT hours
-        total_reg, total_ot, total_hours = rest[-3:]
-
-        new_sheet["D16"].value = f"Regular: {round(float(total_reg), 2)}"
-        new_sheet["E16"].value = f"OverTime: {round(float(total_ot), 2)}"
-        new_sheet["F16"].value = f"Total Hours: {round(float(total_hours), 2)}"
-    
-    tmpl_wb.remove(base_sheet)
+        row_range: tuple[int, int] = (2, math.inf),
+        workers: int = 1,
+        split_output: str | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        should_cancel: Callable[[], bool] | None = None,
+        incremental: bool = False,
+        template: TimesheetTemplate | None = None,
+        overtime_rules: OvertimeRules | None = None,
+        split_size: int | None = None,
+        profile: GenerationProfile | None = None,
+        compression: str | int | None = None
+    ) -> list[str]:
 
-    try:
-        tmpl_wb.save(output_file_path)
-        show_in_file_manager(os.path.normpath(output_file_path))
-        
-        return True
-    except Exception as e:
-        message_body = f"An error occurred while saving the timesheets. " \
-                        f"Please ensure the file is not open in another program and try again.\n\nError details: {e}"
-        QMessageBox.critical(
-            None,
-            "Error Saving Timesheets",
-            message_body
+    profile = profile or NO_PROFILE
+    if incremental:
+        if workers > 1 or split_output:
+            raise ValueError("Incremental regeneration writes a single workbook on one process")
+        return _update_timesheets(
+            source_file_path, source_sheet_name, template_file_path, output_file_path,
+            start_date, row_range, progress, should_cancel, template, overtime_rules, profile, compression
+        )
+
+    if workers > 1 or split_output:
+        from timesheet_parallel import create_timesheets_parallel
+        return create_timesheets_parallel(
+            source_file_path, source_sheet_name, template_file_path, output_file_path,
+            start_date, row_range, workers=workers, split_output=split_output,
+            progress=progress, should_cancel=should_cancel, overtime_rules=overtime_rules,
+            split_size=split_size, profile=profile, compression=compression
         )
 
-        return False
+    with profile.phase("count"):
+        total = employee_count(source_file_path, source_sheet_name, row_range) if progress else 0
+
+    # Parse the template once; employees are streamed in and each one's sheet
+    # is streamed straight out to the output file. An exception, cancellation
+    # included, aborts the writer, which removes the partial file.
+    with profile.phase("template"):
+        template = template or TimesheetTemplate(template_file_path)
+        dates = DateColumn.for_template(start_date, template)
+    render, write = profile.phase("render"), profile.phase("write")
+    writer = TimesheetWriter(output_file_path, template, compression)
+    try:
+        employees = source_employees(source_file_path, source_sheet_name, row_range, overtime_rules)
+        for done, employee in enumerate(profile.timed("read", employees), 1):
+            if should_cancel is not None and should_cancel():
+                raise GenerationCancelled()
+            with render:
+                sheet_xml = template.sheet_xml(render_timesheet(employee, dates, template.plan))
+            with write:
+                writer.add_sheet_xml(clean_sheet_name(employee.name), sheet_xml)
+            if progress is not None:
+                progress(done, max(total, done))
+    except BaseException:
+        writer.abort()
+        raise
+    with profile.phase("save"):
+        writer.close()
+    profile.add_output(writer.stats())
+
+    return [output_file_path]
+
+# Rewrite the output, copying the sheet of every employee whose hash is in
+# the previous run's manifest and rendering only the changed and added ones.
+# Employees no longer in the source simply aren't copied. The new workbook is
+# written beside the old one and swapped in at the end, so cancelling or
+# failing leaves the previous output and manifest as they were.
+def _update_timesheets(
+        source_file_path: str,
+        source_sheet_name: str,
+        template_file_path: str,
+        output_file_path: str,
+        start_date: str,
+        row_range: tuple[int, int],
+        progress: Callable[[int, int], None] | None,
+        should_cancel: Callable[[], bool] | None,
+        template: TimesheetTemplate | None = None,
+        overtime_rules: OvertimeRules | None = None,
+        profile: GenerationProfile = NO_PROFILE,
+        compression: str | int | None = None
+    ) -> list[str]:
+
+    with profile.phase("count"):
+        total = employee_count(source_file_path, source_sheet_name, row_range) if progress else 0
+    with profile.phase("manifest"):
+        header = manifest_header(template_file_path, start_date)
+        manifest = load_manifest(output_file_path, header)
+
+    with profile.phase("template"):
+        template = template or TimesheetTemplate(template_file_path)
+        dates = DateColumn.for_template(start_date, template)
+    previous: ZipFile | None = None
+    previous_sheets: dict[str, str] = {}
+    previous_strings: list[str] = []
+    mapping: dict[int, int] = {}
+    if manifest is not None:
+        previous = ZipFile(output_file_path)
+        previous_sheets = manifest["sheets"]
+        # and its shared strings by index
+        previous_strings = read_shared_strings(previous)
+        # Copied sheets reference the previous run's derived styles by id
+        mapping = template.style_map([(StyleArray(style), number_format) for style, number_format in manifest["derived_styles"]])
+
+    # employee hash -> part holding that employee's sheet in the new output
+    sheets: dict[str, str] = {}
+    partial_path = f"{output_file_path}.partial"
+    hashing, copy, render, write = (profile.phase(name) for name in ("hash", "copy", "render", "write"))
+    try:
+        writer = TimesheetWriter(partial_path, template, compression)
+        try:
+            employees = source_employees(source_file_path, source_sheet_name, row_range, overtime_rules)
+            for done, employee in enumerate(profile.timed("read", employees), 1):
+                if should_cancel is not None and should_cancel():
+                    raise GenerationCancelled()
+                with hashing:
+                    digest = employee_hash(employee)
+                if digest in previous_sheets:
+                    with copy:
+                        sheet_xml = previous.read(previous_sheets[digest]).decode("utf-8")
+                        sheet_xml = template.remap_styles(inline_strings(sheet_xml, previous_strings), mapping)
+                else:
+                    with render:
+                        sheet_xml = template.sheet_xml(render_timesheet(employee, dates, template.plan))
+                with write:
+                    title = writer.add_sheet_xml(clean_sheet_name(employee.name), sheet_xml)
+                sheets[digest] = writer.part_name(title)
+                if progress is not None:
+                    progress(done, max(total, done))
+        except BaseException:
+            writer.abort()
+            raise
+        with profile.phase("save"):
+            writer.close()
+    finally:
+        if previous is not None:
+            previous.close()
+
+    os.replace(partial_path, output_file_path)
+    profile.add_output({**writer.stats(), "path": output_file_path})
+    with profile.phase("manifest"):
+        save_manifest(
+            output_file_path, header,
+            sheets=sheets,
+            derived_styles=[(list(style), number_format) for style, number_format in template.derived_styles()]
+        )
+    return [output_file_path]
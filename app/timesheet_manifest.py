@@ -0,0 +1,55 @@
+import hashlib
+import json
+import os
+from roster import Employee
+from source_cache import file_signature
+from template_plan import mapping_path
+
+
+# Manifests kept next to generated files so a re-run can tell which employees
+# changed. Each employee is hashed whole (name, position, location, every
+# clock cell and the totals), and the manifest maps those hashes to where the
+# employee's sheet or page lives in the output it describes.
+
+MANIFEST_VERSION = 2
+
+
+def manifest_path(output_path: str) -> str:
+    return f"{output_path}.manifest.json"
+
+def employee_hash(employee: Employee) -> str:
+    return hashlib.blake2b(employee.fingerprint(), digest_size=16).hexdigest()
+
+# Everything else that shapes an employee's output; a manifest
+# written under a different header is stale. The template (and its field
+# mapping, if it has one) is hashed by content because frozen builds unpack it
+# to a fresh path on every run.
+def manifest_header(template_file_path: str, start_date: str) -> dict:
+    template = hashlib.blake2b(digest_size=16)
+    for path in (template_file_path, mapping_path(template_file_path)):
+        if path == template_file_path or os.path.exists(path):
+            with open(path, "rb") as file:
+                template.update(file.read())
+    template_hash = template.hexdigest()
+    return {"version": MANIFEST_VERSION, "template": template_hash, "start_date": start_date}
+
+# The manifest for output_path, or None when there is none or it no longer
+# describes that file (different header, or the output was rewritten since)
+def load_manifest(output_path: str, header: dict) -> dict | None:
+    try:
+        with open(manifest_path(output_path), encoding="utf-8") as file:
+            manifest = json.load(file)
+        signature = list(file_signature(output_path))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("header") != header or manifest.get("output") != signature:
+        return None
+    return manifest
+
+# Record the manifest for the output just written; entries are stored as given
+def save_manifest(output_path: str, header: dict, **entries) -> None:
+    manifest = {"header": header, "output": list(file_signature(output_path)), **entries}
+    path = manifest_path(output_path)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(f"{path}.tmp", path)
@@ -0,0 +1,278 @@
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import math
+import os
+import re
+import openpyxl
+from openpyxl.styles import Font
+from generation_profile import NO_PROFILE, GenerationProfile
+from hours_validation import OvertimeRules
+from source_reader import source_max_row
+from roster import Employee
+from timesheet_creator import DateColumn, GenerationCancelled, clean_sheet_name, employee_count, render_timesheet, source_employees
+from timesheet_writer import SheetNames, TimesheetTemplate, TimesheetWriter
+from worker_common import batched, load_template, process_pool
+
+
+# Rows handed to a worker at a time when all shards merge into one workbook
+SHARD_SIZE = 250
+
+SPLIT_MODES = ("shard", "location")
+# File suffix of a split output's index workbook
+INDEX_SUFFIX = "index"
+
+# Worker: render a shard's sheets to XML for the parent process to merge
+def _render_shard(template_file_path: str, employees: list[Employee], start_date: str):
+    template = load_template(TimesheetTemplate, template_file_path)
+    dates = DateColumn.for_template(start_date, template)
+    sheets: list[tuple[str, str]] = []
+    for employee in employees:
+        sheets.append((clean_sheet_name(employee.name), template.sheet_xml(render_timesheet(employee, dates, template.plan))))
+    return sheets, template.derived_styles()
+
+# Worker: write a shard's sheets as a workbook of its own, returning its stats
+def _write_shard(template_file_path: str, employees: list[Employee], start_date: str, output_file_path: str, compression: str | int | None = None) -> dict:
+    template = load_template(TimesheetTemplate, template_file_path)
+    dates = DateColumn.for_template(start_date, template)
+    with TimesheetWriter(output_file_path, template, compression) as writer:
+        for employee in employees:
+            writer.add_sheet(clean_sheet_name(employee.name), render_timesheet(employee, dates, template.plan))
+    return writer.stats()
+
+# One workbook of a split output, as listed in the index: a summary only, so
+# the employees themselves can be freed once their workbook is written
+class IndexEntry:
+    __slots__ = ("path", "label", "employees", "first_name", "last_name")
+
+    def __init__(self, path: str, label: str, employees: int, first_name: str | None, last_name: str | None) -> None:
+        self.path = path
+        self.label = label
+        self.employees = employees
+        self.first_name = first_name
+        self.last_name = last_name
+
+    @classmethod
+    def summarize(cls, path: str, label: str, employees: list[Employee]) -> "IndexEntry":
+        if not employees:
+            return cls(path, label, 0, None, None)
+        return cls(path, label, len(employees), employees[0].name, employees[-1].name)
+
+# "Part 10" after "Part 9"
+def _natural_key(text: str) -> list:
+    return [int(piece) if piece.isdigit() else piece.lower() for piece in re.split(r"(\d+)", text)]
+
+# A workbook listing the workbooks of a split output by group, each linked by
+# a path relative to the index so the folder can be moved as a whole
+def write_index(index_path: str, entries: list[IndexEntry]) -> None:
+    entries = sorted(entries, key=lambda entry: _natural_key(entry.label))
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Index"
+    ws.append(["Workbook", "Group", "Employees", "First Employee", "Last Employee"])
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+    directory = os.path.dirname(os.path.abspath(index_path))
+    for row, entry in enumerate(entries, 2):
+        ws.append([os.path.basename(entry.path), entry.label, entry.employees, entry.first_name, entry.last_name])
+        link = ws.cell(row, 1)
+        link.hyperlink = os.path.relpath(os.path.abspath(entry.path), directory)
+        link.style = "Hyperlink"
+    ws.append([])
+    ws.append(["Total", None, sum(entry.employees for entry in entries)])
+    for col, width in zip("ABCDE", (40, 30, 12, 30, 30)):
+        ws.column_dimensions[col].width = width
+    wb.save(index_path)
+
+# Calls progress(done, total) as employees finish and raises GenerationCancelled
+# once should_cancel() returns True
+class _Progress:
+    def __init__(self, total: int, progress: Callable[[int, int], None] | None, should_cancel: Callable[[], bool] | None) -> None:
+        self.total = total
+        self.done = 0
+        self._progress = progress
+        self._should_cancel = should_cancel
+
+    def check(self) -> None:
+        if self._should_cancel is not None and self._should_cancel():
+            raise GenerationCancelled()
+
+    def advance(self, count: int = 1) -> None:
+        self.done += count
+        if self._progress is not None:
+            self._progress(self.done, max(self.total, self.done))
+
+# output.xlsx -> output_<suffix>.xlsx
+def split_output_path(output_file_path: str, suffix: str) -> str:
+    root, ext = os.path.splitext(str(output_file_path))
+    return f"{root}_{suffix}{ext or '.xlsx'}"
+
+# Generate timesheets across a pool of worker processes. Rows are streamed in
+# this process and handed out as contiguous shards of the row range.
+# With split_output None every shard is merged, in order, into output_file_path;
+# "shard" writes one workbook per split_size employees (by default the row
+# range spread evenly over the workers) and "location" one per location, or
+# one per split_size employees of each location. Split workbooks are written
+# concurrently as each fills up, and an index workbook listing them is
+# written last. Returns the paths of the workbooks written, index last.
+# progress, should_cancel, profile and compression work as for
+# create_timesheets, though only this process's phases are timed; a cancelled
+# run leaves no workbooks behind.
+def create_timesheets_parallel(
+        source_file_path: str,
+        source_sheet_name: str,
+        template_file_path: str,
+        output_file_path: str,
+        start_date: str,
+        row_range: tuple[int, int] = (2, math.inf),
+        workers: int = os.cpu_count() or 1,
+        split_output: str | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        should_cancel: Callable[[], bool] | None = None,
+        overtime_rules: OvertimeRules | None = None,
+        split_size: int | None = None,
+        profile: GenerationProfile = NO_PROFILE,
+        compression: str | int | None = None
+    ) -> list[str]:
+
+    if split_output is not None and split_output not in SPLIT_MODES:
+        raise ValueError(f"Unknown split_output {split_output!r}, expected one of {SPLIT_MODES}")
+    if split_size is not None and split_size < 1:
+        raise ValueError("split_size must be at least 1")
+
+    workers = max(1, int(workers))
+    template_file_path = str(template_file_path)
+    employees = profile.timed("read", source_employees(source_file_path, source_sheet_name, row_range, overtime_rules))
+    with profile.phase("count"):
+        tracker = _Progress(employee_count(source_file_path, source_sheet_name, row_range) if progress else 0, progress, should_cancel)
+
+    with process_pool(workers) as pool:
+        try:
+            if split_output == "location":
+                jobs = _location_jobs(employees, split_size, tracker)
+            elif split_output == "shard":
+                shard_size = split_size or _shard_size(source_file_path, source_sheet_name, row_range, workers)
+                jobs = ((f"Part {idx}", f"shard{idx}", shard) for idx, shard in enumerate(batched(employees, shard_size), 1))
+            else:
+                _merge_shards(pool, workers, employees, template_file_path, output_file_path, start_date, tracker, profile, compression)
+                return [output_file_path]
+            return _write_workbooks(pool, workers, jobs, template_file_path, output_file_path, start_date, tracker, profile, compression)
+        except GenerationCancelled:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+
+# Spread the row range evenly over the workers
+def _shard_size(source_file_path: str, source_sheet_name: str, row_range: tuple[int, int], workers: int) -> int:
+    max_row = row_range[1] if row_range[1] != math.inf else source_max_row(source_file_path, source_sheet_name)
+    if not max_row:
+        return SHARD_SIZE
+    return max(1, math.ceil((int(max_row) - int(row_range[0]) + 1) / workers))
+
+# (index label, file suffix, employees) per workbook of a location split. With
+# a split_size, a location's parts are numbered and each is handed out as soon
+# as it fills up; otherwise a location is complete only once every row is read.
+# Suffixes are allocated like sheet titles, case-insensitively and with the
+# index's kept back, so no two workbooks share a name on any file system.
+def _location_jobs(employees: Iterable[Employee], split_size: int | None, tracker: _Progress) -> Iterator[tuple[str, str, list[Employee]]]:
+    by_location: dict[str, list[Employee]] = {}
+    parts: dict[str, int] = {}
+    labels: dict[str, str] = {}
+    suffixes: dict[str, str] = {}
+    names = SheetNames()
+    names.allocate(INDEX_SUFFIX)
+
+    def part(location: str) -> tuple[str, str, list[Employee]]:
+        if split_size is None:
+            return labels[location], suffixes[location], by_location.pop(location)
+        parts[location] = parts.get(location, 0) + 1
+        return f"{labels[location]} ({parts[location]})", f"{suffixes[location]}_{parts[location]}", by_location.pop(location)
+
+    for employee in employees:
+        tracker.check()
+        location = clean_sheet_name(str(employee.location or "")) or "NoLocation"
+        if location not in labels:
+            labels[location] = str(employee.location or "No location")
+            suffixes[location] = names.allocate(location)
+        group = by_location.setdefault(location, [])
+        group.append(employee)
+        if split_size is not None and len(group) >= split_size:
+            yield part(location)
+    for location in list(by_location):
+        yield part(location)
+
+# Write one workbook per job as jobs come in, then the index. If the run is
+# cancelled or a job fails, queued jobs are dropped and every workbook written
+# so far is removed again.
+def _write_workbooks(pool: ProcessPoolExecutor, workers: int, jobs: Iterable[tuple[str, str, list[Employee]]], template_file_path: str, output_file_path: str, start_date: str, tracker: _Progress, profile: GenerationProfile, compression: str | int | None = None) -> list[str]:
+    futures: dict[Future, int] = {}
+    pending: set[Future] = set()
+    entries: list[IndexEntry] = []
+    waiting = profile.phase("wait")
+
+    def collect(timeout: float | None) -> None:
+        nonlocal pending
+        with waiting:
+            finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in finished:
+            profile.add_output(future.result())
+            tracker.advance(futures.pop(future))
+        tracker.check()
+
+    try:
+        for label, suffix, employees in jobs:
+            path = split_output_path(output_file_path, suffix)
+            entries.append(IndexEntry.summarize(path, label, employees))
+            future = pool.submit(_write_shard, template_file_path, employees, start_date, path, compression)
+            futures[future] = len(employees)
+            pending.add(future)
+            collect(0)
+            # Bound the workbooks in flight, as _merge_shards does its shards
+            while len(pending) > workers * 2:
+                collect(None)
+        while pending:
+            collect(0.1)
+        index_path = split_output_path(output_file_path, INDEX_SUFFIX)
+        with profile.phase("index"):
+            write_index(index_path, entries)
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        for entry in entries:
+            if os.path.exists(entry.path):
+                os.remove(entry.path)
+        raise
+    return [entry.path for entry in entries] + [index_path]
+
+def _merge_shards(pool: ProcessPoolExecutor, workers: int, employees: Iterable[Employee], template_file_path: str, output_file_path: str, start_date: str, tracker: _Progress, profile: GenerationProfile, compression: str | int | None = None) -> None:
+    with profile.phase("template"):
+        template = TimesheetTemplate(template_file_path)
+    # Bound the shards in flight so memory stays flat on large rosters
+    pending: deque[Future] = deque()
+    waiting, write = profile.phase("wait"), profile.phase("write")
+
+    writer = TimesheetWriter(output_file_path, template, compression)
+    def merge_next() -> None:
+        with waiting:
+            sheets, derived_styles = pending.popleft().result()
+        mapping = template.style_map(derived_styles)
+        for title, sheet_xml in sheets:
+            tracker.check()
+            with write:
+                writer.add_sheet_xml(title, template.remap_styles(sheet_xml, mapping))
+            tracker.advance()
+
+    try:
+        for shard in batched(employees, SHARD_SIZE):
+            tracker.check()
+            pending.append(pool.submit(_render_shard, template_file_path, shard, start_date))
+            if len(pending) > workers * 2:
+                merge_next()
+        while pending:
+            merge_next()
+    except BaseException:
+        writer.abort()
+        raise
+    with profile.phase("save"):
+        writer.close()
+    profile.add_output(writer.stats())
@@ -0,0 +1,639 @@
+from collections import deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import math
+import os
+import re
+import zlib
+import openpyxl
+from openpyxl.styles.numbers import is_date_format
+from openpyxl.utils.datetime import from_excel, to_excel
+from generation_profile import NO_PROFILE, GenerationProfile
+from hours_validation import OvertimeRules
+from roster import Employee
+from template_plan import FillPlan
+from timesheet_creator import DateColumn, GenerationCancelled, employee_count, render_timesheet, source_employees
+from timesheet_manifest import employee_hash, load_manifest, manifest_header, save_manifest
+from worker_common import batched, load_template, process_pool
+
+
+# Native PDF export. Each employee's timesheet is drawn as one page from the
+# same values that go into the workbook, laid out like the template sheet:
+# column widths, row heights, merged cells, borders, fills, fonts, alignment,
+# number formats and the page setup. It is plain Python with no Excel, so it
+# runs anywhere. Text is set in the PDF's built-in Helvetica faces, which need
+# no embedding.
+
+# Rows handed to a worker process at a time
+PAGE_BATCH = 100
+
+_PAPER_SIZES = {1: (612.0, 792.0), 5: (612.0, 1008.0), 9: (595.28, 841.89)}
+_BORDER_WIDTHS = {
+    "hair": 0.25, "thin": 0.5, "dotted": 0.5, "dashed": 0.5, "dashDot": 0.5, "dashDotDot": 0.5,
+    "medium": 1.0, "mediumDashed": 1.0, "mediumDashDot": 1.0, "mediumDashDotDot": 1.0, "slantDashDot": 1.0,
+    "thick": 1.5, "double": 1.5,
+}
+# Padding Excel leaves between cell text and the gridlines
+_CELL_PADDING = 2.0
+_LINE_SPACING = 1.2
+
+# Advance widths of the printable ASCII characters, in 1/1000 em
+_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+# (resource name, base font, widths) by (bold, italic)
+_FONTS = {
+    (False, False): ("F1", "Helvetica", _HELVETICA),
+    (True, False): ("F2", "Helvetica-Bold", _HELVETICA_BOLD),
+    (False, True): ("F3", "Helvetica-Oblique", _HELVETICA),
+    (True, True): ("F4", "Helvetica-BoldOblique", _HELVETICA_BOLD),
+}
+
+_DATE_TOKEN = re.compile(r'yyyy|yy|mmmmm|mmmm|mmm|mm|m|dddd|ddd|dd|d|hh|h|ss|s|am/pm|a/p|"[^"]*"|\\.|\[[^\]]*\]|_.|\*.|.', re.I)
+
+
+def _text_width(text: str, widths: list[int], size: float) -> float:
+    total = 0
+    for char in text:
+        code = ord(char)
+        total += widths[code - 32] if 32 <= code < 127 else 556
+    return total * size / 1000
+
+# Split text into lines no wider than width, breaking between words
+def _wrap(text: str, width: float, widths: list[int], size: float) -> list[str]:
+    lines: list[str] = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if line and _text_width(candidate, widths, size) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+def _pdf_string(text: str) -> bytes:
+    raw = text.encode("cp1252", "replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def _rgb(color) -> tuple[float, float, float] | None:
+    rgb = getattr(color, "rgb", None) if color is not None else None
+    if getattr(color, "type", "rgb") != "rgb" or not isinstance(rgb, str) or len(rgb) < 6:
+        return None
+    return tuple(int(rgb[i:i + 2], 16) / 255 for i in (-6, -4, -2))
+
+def _format_datetime(value: datetime | date | time, number_format: str) -> str:
+    if isinstance(value, time):
+        value = datetime.combine(date(1899, 12, 30), value)
+    elif not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+
+    tokens = _DATE_TOKEN.findall(number_format)
+    twelve_hour = any(token.lower() in ("am/pm", "a/p") for token in tokens)
+    parts: list[str] = []
+    last_time_token = ""
+    for idx, token in enumerate(tokens):
+        lower = token.lower()
+        if lower in ("m", "mm"):
+            # m is minutes right after an hour or right before seconds
+            following = next((t.lower() for t in tokens[idx + 1:] if t.lower()[0] in "ydhs"), "")
+            if last_time_token.startswith("h") or following.startswith("s"):
+                parts.append(f"{value.minute:02d}" if lower == "mm" else str(value.minute))
+                continue
+            parts.append(f"{value.month:02d}" if lower == "mm" else str(value.month))
+        elif lower == "mmm":
+            parts.append(value.strftime("%b"))
+        elif lower == "mmmm":
+            parts.append(value.strftime("%B"))
+        elif lower == "mmmmm":
+            parts.append(value.strftime("%B")[0])
+        elif lower == "yyyy":
+            parts.append(f"{value.year:04d}")
+        elif lower == "yy":
+            parts.append(f"{value.year % 100:02d}")
+        elif lower == "d":
+            parts.append(str(value.day))
+        elif lower == "dd":
+            parts.append(f"{value.day:02d}")
+        elif lower == "ddd":
+            parts.append(value.strftime("%a"))
+        elif lower == "dddd":
+            parts.append(value.strftime("%A"))
+        elif lower in ("h", "hh"):
+            hour = (value.hour % 12 or 12) if twelve_hour else value.hour
+            parts.append(f"{hour:02d}" if lower == "hh" else str(hour))
+        elif lower in ("s", "ss"):
+            parts.append(f"{value.second:02d}" if lower == "ss" else str(value.second))
+        elif lower == "am/pm":
+            parts.append("AM" if value.hour < 12 else "PM")
+        elif lower == "a/p":
+            parts.append("A" if value.hour < 12 else "P")
+        elif token.startswith('"'):
+            parts.append(token[1:-1])
+        elif token.startswith("\\"):
+            parts.append(token[1])
+        elif token.startswith("_"):
+            parts.append(" ")
+        elif token.startswith(("[", "*")) or token == "@":
+            pass
+        else:
+            parts.append(token)
+        if lower[0] in "hs":
+            last_time_token = lower
+        elif lower[0] in "yd":
+            last_time_token = ""
+    return "".join(parts)
+
+def _format_number(value: float, number_format: str) -> str:
+    number_format = re.sub(r'\[[^\]]*\]|"|\\|_.|\*.', "", number_format)
+    if number_format.lower() in ("", "general", "@"):
+        if float(value).is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return f"{value:.10g}"
+
+    if "%" in number_format:
+        value *= 100
+    first = min((number_format.find(c) for c in "0#?" if c in number_format), default=len(number_format))
+    last = max(number_format.rfind(c) for c in "0#?") if first < len(number_format) else first
+    body = number_format[first:last + 1]
+    decimals = len(body.split(".", 1)[1]) if "." in body else 0
+    grouping = "," if "," in body.split(".", 1)[0] else ""
+    return f"{number_format[:first]}{value:{grouping}.{decimals}f}{number_format[last + 1:]}"
+
+# Text Excel would show for a value in a cell with this number format
+def format_value(value, number_format: str = "General") -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    section = number_format.split(";", 1)[0]
+    if isinstance(value, (datetime, date, time, timedelta)):
+        if is_date_format(number_format) and not isinstance(value, timedelta):
+            return _format_datetime(value, section)
+        value = to_excel(value)
+    if isinstance(value, (int, float, Decimal)):
+        if is_date_format(number_format):
+            return _format_datetime(from_excel(value), section)
+        return _format_number(float(value), section)
+    return str(value)
+
+
+# Everything the renderer needs to know about one template cell
+class CellStyle:
+    __slots__ = ("font", "size", "color", "horizontal", "vertical", "wrap", "fill", "borders", "number_format")
+
+    def __init__(self, cell) -> None:
+        font = cell.font
+        self.font = _FONTS[(bool(font.b), bool(font.i))]
+        self.size: float = float(font.sz or 11)
+        self.color = _rgb(font.color)
+        self.horizontal: str | None = cell.alignment.horizontal
+        self.vertical: str = cell.alignment.vertical or "bottom"
+        self.wrap: bool = bool(cell.alignment.wrap_text)
+        self.fill = _rgb(cell.fill.fgColor) if cell.fill.fill_type == "solid" else None
+        border = cell.border
+        # left, right, top, bottom line widths
+        self.borders = tuple(_BORDER_WIDTHS.get(side.style, 0.0) if side is not None else 0.0
+                             for side in (border.left, border.right, border.top, border.bottom))
+        self.number_format: str = cell.number_format
+
+
+# The template sheet's layout, parsed once and reused for every page
+class PdfLayout:
+    def __init__(self, template_file_path: str, sheet_name: str = "Template") -> None:
+        wb = openpyxl.load_workbook(template_file_path)
+        ws = wb[sheet_name]
+
+        self.values: dict[tuple[int, int], object] = {key: cell.value for key, cell in ws._cells.items()}
+        self.plan = FillPlan.for_template(template_file_path, ws)
+        self.styles: dict[tuple[int, int], CellStyle] = {key: CellStyle(cell) for key, cell in ws._cells.items()}
+        self._default_style = CellStyle(ws.cell(ws.max_row + 1, ws.max_column + 1))
+
+        # Excel widths are in characters of the default font; 7px each plus 5px padding at 96dpi
+        default_width = ws.sheet_format.defaultColWidth or (ws.sheet_format.baseColWidth or 8) + 0.71
+        self._default_col_width = (default_width * 7 + 5) * 0.75
+        self.col_widths: dict[int, float] = {}
+        for dim in ws.column_dimensions.values():
+            if dim.width and dim.min and dim.max:
+                for col in range(dim.min, dim.max + 1):
+                    self.col_widths[col] = (dim.width * 7 + 5) * 0.75
+        self._default_row_height = float(ws.sheet_format.defaultRowHeight or 15)
+        self.row_heights: dict[int, float] = {row: dim.ht for row, dim in ws.row_dimensions.items() if dim.ht}
+
+        # anchor -> (last row, last col) of each merged range, and the cells it covers
+        self.merged: dict[tuple[int, int], tuple[int, int]] = {}
+        self.covered: set[tuple[int, int]] = set()
+        for merged in ws.merged_cells.ranges:
+            self.merged[(merged.min_row, merged.min_col)] = (merged.max_row, merged.max_col)
+            for row in range(merged.min_row, merged.max_row + 1):
+                for col in range(merged.min_col, merged.max_col + 1):
+                    if (row, col) != (merged.min_row, merged.min_col):
+                        self.covered.add((row, col))
+
+        setup = ws.page_setup
+        width, height = _PAPER_SIZES.get(int(setup.paperSize or 1), _PAPER_SIZES[1])
+        if setup.orientation == "landscape":
+            width, height = height, width
+        self.page_size = (width, height)
+        margins = ws.page_margins
+        self.margins = tuple(m * 72 for m in (margins.left, margins.right, margins.top, margins.bottom))
+        self.fit_to_page = bool(ws.sheet_properties.pageSetUpPr and ws.sheet_properties.pageSetUpPr.fitToPage)
+        self.fit_to_height = setup.fitToHeight != 0
+        self.scale = (setup.scale or 100) / 100
+
+    def is_date_cell(self, row: int, col: int) -> bool:
+        style = self.styles.get((row, col))
+        return style is not None and is_date_format(style.number_format)
+
+    def style(self, key: tuple[int, int]) -> CellStyle:
+        return self.styles.get(key, self._default_style)
+
+    # Content stream drawing one page with the given (row, col) values applied
+    def page_stream(self, values: dict[tuple[int, int], object]) -> bytes:
+        cells = dict(self.values)
+        cells.update(values)
+        keys = cells.keys() | self.styles.keys()
+        max_row = max(row for row, _ in keys)
+        max_col = max(col for _, col in keys)
+
+        xs = [0.0]
+        for col in range(1, max_col + 1):
+            xs.append(xs[-1] + self.col_widths.get(col, self._default_col_width))
+        ys = [0.0]
+        for row in range(1, max_row + 1):
+            ys.append(ys[-1] + self.row_heights.get(row, self._default_row_height))
+
+        page_width, page_height = self.page_size
+        left, right, top, bottom = self.margins
+        scale = self.scale
+        if self.fit_to_page:
+            scale = min(1.0, (page_width - left - right) / xs[-1])
+            if self.fit_to_height:
+                scale = min(scale, (page_height - top - bottom) / ys[-1])
+
+        # Sheet coordinates to page coordinates; sheet y grows downwards
+        def px(x: float) -> float:
+            return left + x * scale
+        def py(y: float) -> float:
+            return page_height - top - y * scale
+
+        fills: list[str] = []
+        text: list[str] = []
+        borders: dict[float, list[str]] = {}
+
+        for key in sorted(keys):
+            if key in self.covered:
+                continue
+            row, col = key
+            style = self.style(key)
+            last_row, last_col = self.merged.get(key, key)
+            x0, x1 = xs[col - 1], xs[last_col]
+            y0, y1 = ys[row - 1], ys[last_row]
+
+            if style.fill is not None:
+                fills.append(f"{style.fill[0]:.3f} {style.fill[1]:.3f} {style.fill[2]:.3f} rg "
+                             f"{px(x0):.2f} {py(y1):.2f} {(x1 - x0) * scale:.2f} {(y1 - y0) * scale:.2f} re f")
+
+            for width, (ax, ay, bx, by) in zip(style.borders, ((x0, y0, x0, y1), (x1, y0, x1, y1), (x0, y0, x1, y0), (x0, y1, x1, y1))):
+                if width:
+                    borders.setdefault(width, []).append(f"{px(ax):.2f} {py(ay):.2f} m {px(bx):.2f} {py(by):.2f} l")
+
+            value = cells.get(key)
+            if value is None or value == "":
+                continue
+            content = format_value(value, style.number_format)
+            if not content:
+                continue
+            text.append(self._text_ops(content, style, value, x0, x1, y0, y1, px, py, scale))
+
+        ops = fills + text
+        for width, lines in sorted(borders.items()):
+            ops.append(f"{width * scale:.2f} w")
+            ops.extend(lines)
+            ops.append("S")
+        return "\n".join(ops).encode("latin-1")
+
+    def _text_ops(self, content: str, style: CellStyle, value, x0, x1, y0, y1, px, py, scale) -> str:
+        name, _, widths = style.font
+        size = style.size
+        inner = x1 - x0 - 2 * _CELL_PADDING
+        lines = _wrap(content, inner, widths, size) if style.wrap else content.split("\n")
+
+        line_height = size * _LINE_SPACING
+        block = line_height * len(lines)
+        if style.vertical == "top":
+            first_top = y0 + _CELL_PADDING / 2
+        elif style.vertical == "center":
+            first_top = y0 + (y1 - y0 - block) / 2
+        else:
+            first_top = y1 - block - _CELL_PADDING / 2
+
+        horizontal = style.horizontal
+        if horizontal in (None, "general"):
+            horizontal = "left" if isinstance(value, str) else "right"
+
+        color = style.color or (0.0, 0.0, 0.0)
+        parts = [f"BT /{name} {size * scale:.2f} Tf {color[0]:.3f} {color[1]:.3f} {color[2]:.3f} rg"]
+        for idx, line in enumerate(lines):
+            line_width = _text_width(line, widths, size)
+            if horizontal == "center":
+                x = x0 + (x1 - x0 - line_width) / 2
+            elif horizontal == "right":
+                x = x1 - _CELL_PADDING - line_width
+            else:
+                x = x0 + _CELL_PADDING
+            # Baseline sits at the font's ascent below the top of the line box
+            baseline = first_top + idx * line_height + size * 0.93
+            parts.append(f"1 0 0 1 {px(x):.2f} {py(baseline):.2f} Tm {_pdf_string(line).decode('latin-1')} Tj")
+        parts.append("ET")
+        return "\n".join(parts)
+
+
+# Writes pages to a PDF file as they are produced, then the page tree and xref
+class PdfWriter:
+    # update is (next object id, xref offset) of a PDF this class wrote before;
+    # the new page tree is then appended to it as an incremental update, so
+    # earlier pages can be kept by object id without being rewritten
+    def __init__(self, output_pdf_path: str, page_size: tuple[float, float], update: tuple[int, int] | None = None) -> None:
+        self.output_pdf_path = output_pdf_path
+        self.page_size = page_size
+        self._update = update
+        self._offsets: dict[int, int] = {}
+        self._pages: list[int] = []
+        self.xref_offset: int | None = None
+        if update is None:
+            self._file = open(output_pdf_path, "wb")
+            # 1 catalog, 2 page tree, 3 font resources; pages follow
+            self._next_id = 4
+            self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        else:
+            self._original_stat = os.stat(output_pdf_path)
+            self._file = open(output_pdf_path, "r+b")
+            self._file.seek(0, os.SEEK_END)
+            self._next_id = update[0]
+
+    def __enter__(self) -> "PdfWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _write_object(self, object_id: int, body: bytes) -> None:
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % object_id + body + b"\nendobj\n")
+
+    # Add a page from its already compressed content stream
+    def add_page(self, compressed_stream: bytes) -> None:
+        content_id, page_id = self._next_id, self._next_id + 1
+        self._next_id += 2
+        self._write_object(content_id, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(compressed_stream)
+                           + compressed_stream + b"\nendstream")
+        width, height = self.page_size
+        self._write_object(page_id, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+                                     f"/Resources 3 0 R /Contents {content_id} 0 R >>").encode("latin-1"))
+        self._pages.append(page_id)
+
+    # Reuse a page already in the PDF being updated
+    def add_existing_page(self, page_id: int) -> None:
+        self._pages.append(page_id)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    @property
+    def page_ids(self) -> list[int]:
+        return list(self._pages)
+
+    @property
+    def next_id(self) -> int:
+        return self._next_id
+
+    def close(self) -> None:
+        if not self._pages:
+            self.abort()
+            raise ValueError("The PDF must contain at least one timesheet")
+
+        if self._update is None:
+            fonts = " ".join(f"/{name} << /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>"
+                             for name, base, _ in _FONTS.values())
+            self._write_object(3, f"<< /Font << {fonts} >> >>".encode("latin-1"))
+        kids = " ".join(f"{page} 0 R" for page in self._pages)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>".encode("latin-1"))
+        if self._update is None:
+            self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        # An update's xref only lists the objects it wrote, in runs of consecutive ids
+        entries = {object_id: b"%010d 00000 n \n" % offset for object_id, offset in self._offsets.items()}
+        if self._update is None:
+            entries[0] = b"0000000000 65535 f \n"
+        ids = sorted(entries)
+        self.xref_offset = self._file.tell()
+        self._file.write(b"xref\n")
+        start = 0
+        for end in range(1, len(ids) + 1):
+            if end == len(ids) or ids[end] != ids[end - 1] + 1:
+                self._file.write(b"%d %d\n" % (ids[start], end - start) + b"".join(entries[i] for i in ids[start:end]))
+                start = end
+        previous = b" /Prev %d" % self._update[1] if self._update is not None else b""
+        self._file.write(b"trailer\n<< /Size %d /Root 1 0 R%s >>\nstartxref\n%d\n%%%%EOF\n"
+                         % (self._next_id, previous, self.xref_offset))
+        self._file.close()
+
+    # Discard the partial file, or the partial update to an existing one
+    def abort(self) -> None:
+        if self._update is not None:
+            self._file.truncate(self._original_stat.st_size)
+            self._file.close()
+            # Untouched as far as the manifest can tell, so it still applies
+            os.utime(self.output_pdf_path, ns=(self._original_stat.st_atime_ns, self._original_stat.st_mtime_ns))
+            return
+        self._file.close()
+        if os.path.exists(self.output_pdf_path):
+            os.remove(self.output_pdf_path)
+
+
+# Compressed content stream of every employee's page
+def render_pages(template_file_path: str, employees: Iterable[Employee], start_date: str) -> list[bytes]:
+    layout = load_template(PdfLayout, template_file_path)
+    dates = DateColumn.for_template(start_date, layout)
+    pages = []
+    for employee in employees:
+        pages.append(zlib.compress(layout.page_stream(render_timesheet(employee, dates, layout.plan))))
+    return pages
+
+# Render one PDF page per employee. workers > 1 renders pages across that many
+# processes; they are written in roster order either way. progress, should_cancel,
+# incremental, overtime_rules and profile work as for create_timesheets, with
+# the phases named "pdf ...". Returns output_pdf_path.
+def create_timesheet_pdf(
+        source_file_path: str,
+        source_sheet_name: str,
+        template_file_path: str,
+        output_pdf_path: str,
+        start_date: str,
+        row_range: tuple[int, int] = (2, math.inf),
+        workers: int = 1,
+        progress: Callable[[int, int], None] | None = None,
+        should_cancel: Callable[[], bool] | None = None,
+        incremental: bool = False,
+        overtime_rules: OvertimeRules | None = None,
+        profile: GenerationProfile | None = None
+    ) -> str:
+
+    profile = profile or NO_PROFILE
+    template_file_path = str(template_file_path)
+    if incremental:
+        return _update_pdf(
+            source_file_path, source_sheet_name, template_file_path, output_pdf_path,
+            start_date, row_range, progress, should_cancel, overtime_rules, profile
+        )
+    with profile.phase("pdf count"):
+        total = employee_count(source_file_path, source_sheet_name, row_range) if progress else 0
+    with profile.phase("pdf layout"):
+        layout = load_template(PdfLayout, template_file_path)
+    employees = profile.timed("pdf read", source_employees(source_file_path, source_sheet_name, row_range, overtime_rules))
+    render, waiting, write = profile.phase("pdf render"), profile.phase("pdf wait"), profile.phase("pdf write")
+
+    def write_batch(writer: PdfWriter, pages: list[bytes]) -> None:
+        for page in pages:
+            if should_cancel is not None and should_cancel():
+                raise GenerationCancelled()
+            with write:
+                writer.add_page(page)
+            if progress is not None:
+                progress(writer.page_count, max(total, writer.page_count))
+
+    writer = PdfWriter(output_pdf_path, layout.page_size)
+    try:
+        if workers <= 1:
+            for batch in batched(employees, 1):
+                with render:
+                    pages = render_pages(template_file_path, batch, start_date)
+                write_batch(writer, pages)
+        else:
+            with process_pool(workers) as pool:
+                # Bound the batches in flight so memory stays flat on large rosters
+                pending: deque[Future] = deque()
+                try:
+                    for batch in batched(employees, PAGE_BATCH):
+                        if should_cancel is not None and should_cancel():
+                            raise GenerationCancelled()
+                        pending.append(pool.submit(render_pages, template_file_path, batch, start_date))
+                        if len(pending) > workers * 2:
+                            with waiting:
+                                pages = pending.popleft().result()
+                            write_batch(writer, pages)
+                    while pending:
+                        with waiting:
+                            pages = pending.popleft().result()
+                        write_batch(writer, pages)
+                except GenerationCancelled:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+    except BaseException:
+        writer.abort()
+        raise
+    with profile.phase("pdf save"):
+        writer.close()
+    return output_pdf_path
+
+# Patch the PDF in place with an incremental update: pages whose employee hash is in
+# the previous run's manifest are kept by reference, only changed and added
+# employees get new pages, and a new page tree drops the removed ones. Dropped
+# pages stay in the file unreferenced; once they outnumber the live pages the
+# PDF is rewritten from scratch instead. Either way a cancelled or failed run
+# leaves the previous PDF and manifest as they were.
+def _update_pdf(
+        source_file_path: str,
+        source_sheet_name: str,
+        template_file_path: str,
+        output_pdf_path: str,
+        start_date: str,
+        row_range: tuple[int, int],
+        progress: Callable[[int, int], None] | None,
+        should_cancel: Callable[[], bool] | None,
+        overtime_rules: OvertimeRules | None = None,
+        profile: GenerationProfile = NO_PROFILE
+    ) -> str:
+
+    with profile.phase("pdf count"):
+        total = employee_count(source_file_path, source_sheet_name, row_range) if progress else 0
+    with profile.phase("pdf manifest"):
+        header = manifest_header(template_file_path, start_date)
+        manifest = load_manifest(output_pdf_path, header)
+    if manifest is not None and manifest["dead_pages"] > len(manifest["pages"]):
+        manifest = None
+
+    with profile.phase("pdf layout"):
+        layout = load_template(PdfLayout, template_file_path)
+        dates = DateColumn.for_template(start_date, layout)
+    # employee hash -> ids of the pages showing it, in page order
+    previous_pages: dict[str, deque[int]] = {}
+    if manifest is not None:
+        for digest, page_id in manifest["pages"]:
+            previous_pages.setdefault(digest, deque()).append(page_id)
+        writer = PdfWriter(output_pdf_path, layout.page_size, update=(manifest["next_id"], manifest["xref_offset"]))
+    else:
+        writer = PdfWriter(f"{output_pdf_path}.partial", layout.page_size)
+
+    digests: list[str] = []
+    hashing, render, write = profile.phase("pdf hash"), profile.phase("pdf render"), profile.phase("pdf write")
+    try:
+        employees = source_employees(source_file_path, source_sheet_name, row_range, overtime_rules)
+        for employee in profile.timed("pdf read", employees):
+            if should_cancel is not None and should_cancel():
+                raise GenerationCancelled()
+            with hashing:
+                digest = employee_hash(employee)
+            if previous_pages.get(digest):
+                writer.add_existing_page(previous_pages[digest].popleft())
+            else:
+                with render:
+                    page = zlib.compress(layout.page_stream(render_timesheet(employee, dates, layout.plan)))
+                with write:
+                    writer.add_page(page)
+            digests.append(digest)
+            if progress is not None:
+                progress(writer.page_count, max(total, writer.page_count))
+    except BaseException:
+        writer.abort()
+        raise
+    with profile.phase("pdf save"):
+        writer.close()
+
+    dead_pages = 0
+    if manifest is not None:
+        dead_pages = manifest["dead_pages"] + sum(len(page_ids) for page_ids in previous_pages.values())
+    else:
+        os.replace(writer.output_pdf_path, output_pdf_path)
+    save_manifest(
+        output_pdf_path, header,
+        pages=list(zip(digests, writer.page_ids)),
+        next_id=writer.next_id,
+        xref_offset=writer.xref_offset,
+        dead_pages=dead_pages
+    )
+    return output_pdf_path
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+import math
+import threading
+from hours_validation import OvertimeRules
+from roster import Employee
+from timesheet_creator import DateColumn, GenerationCancelled, employee_count, render_timesheet, source_employees
+from timesheet_writer import TimesheetTemplate
+
+
+# Pages of generated timesheets for the wizard's preview. Employees are read a
+# page at a time as they are asked for and rendered with the template's fill
+# plan, just as create_timesheets renders them, so only the pages in view are
+# ever held. Pages further down continue the streaming pass already open, so
+# rows are never parsed twice on the way down, and the first pass, which starts
+# at the top, primes the roster caches as it goes; once it has reached the end,
+# any page is a single seek. Only a page above the open pass starts a new one.
+
+PAGE_SIZE = 50
+# Rendered pages kept for paging back and forth
+CACHED_PAGES = 8
+
+
+# One page of employees and their rendered (row, col) -> value fills
+class PreviewPage:
+    __slots__ = ("number", "first_row", "employees", "fills")
+
+    def __init__(self, number: int, first_row: int, employees: list[Employee], fills: list[dict[tuple[int, int], object]]) -> None:
+        self.number = number
+        # Source row of the first employee
+        self.first_row = first_row
+        self.employees = employees
+        self.fills = fills
+
+
+class TimesheetPreview:
+    def __init__(
+            self,
+            source_file_path: str,
+            source_sheet_name: str,
+            template_file_path: str,
+            start_date: str,
+            row_range: tuple[int, int] = (2, math.inf),
+            overtime_rules: OvertimeRules | None = None,
+            page_size: int = PAGE_SIZE
+        ) -> None:
+        self.source_file_path = source_file_path
+        self.source_sheet_name = source_sheet_name
+        self.row_range = row_range
+        self.overtime_rules = overtime_rules
+        self.page_size = page_size
+
+        self.template = TimesheetTemplate(template_file_path)
+        self.dates = DateColumn.for_template(start_date, self.template)
+        self.count = employee_count(source_file_path, source_sheet_name, row_range)
+
+        # Template cells with a value, which every rendered sheet starts from
+        self.template_values: dict[tuple[int, int], object] = {
+            position: value for position, (_, value) in self.template.cells.items() if value is not None
+        }
+        self._pages: OrderedDict[int, PreviewPage] = OrderedDict()
+        # The streaming pass still open, and the source row it yields next
+        self._stream: Iterator[Employee] | None = None
+        self._stream_row = 0
+        self._lock = threading.Lock()
+
+    @property
+    def page_count(self) -> int:
+        return -(-self.count // self.page_size)
+
+    # The page, read and rendered if it is not cached; raises GenerationCancelled
+    # when should_cancel() returns True part way through
+    def page(self, number: int, should_cancel: Callable[[], bool] | None = None) -> PreviewPage:
+        if not 0 <= number < self.page_count:
+            raise IndexError(f"Page {number} is out of range")
+        with self._lock:
+            page = self._pages.get(number)
+            if page is not None:
+                self._pages.move_to_end(number)
+                return page
+
+            first_row = int(self.row_range[0]) + number * self.page_size
+            wanted = min(self.page_size, self.count - number * self.page_size)
+            stream = self._stream_from(first_row)
+            employees: list[Employee] = []
+            for employee in stream:
+                # Rows above the page are passed over on the way to it
+                if self._stream_row >= first_row:
+                    employees.append(employee)
+                self._stream_row += 1
+                if len(employees) == wanted:
+                    break
+                if should_cancel is not None and should_cancel():
+                    raise GenerationCancelled()
+
+            plan = self.template.plan
+            page = PreviewPage(number, first_row, employees, [render_timesheet(employee, self.dates, plan) for employee in employees])
+            self._pages[number] = page
+            while len(self._pages) > CACHED_PAGES:
+                self._pages.popitem(last=False)
+            return page
+
+    # The open pass if it has not gone past this row, else a new one starting there
+    def _stream_from(self, row: int) -> Iterator[Employee]:
+        if self._stream is None or self._stream_row > row:
+            self._close_stream()
+            self._stream = source_employees(
+                self.source_file_path, self.source_sheet_name, (row, self.row_range[1]), self.overtime_rules
+            )
+            self._stream_row = row
+        return self._stream
+
+    def _close_stream(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    # The whole sheet for one rendered fill: the template's own cells, then the fill
+    def sheet_values(self, fill: dict[tuple[int, int], object]) -> dict[tuple[int, int], object]:
+        return {**self.template_values, **fill}
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_stream()
+            self._pages.clear()
+
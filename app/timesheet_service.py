@@ -0,0 +1,727 @@
+# HTTP job service: one machine generates timesheets for everyone, so big
+# exports are parsed once on a fast box instead of on every clerk's laptop.
+#   python -m timesheet_service [--host 127.0.0.1] [--port 8765] [--workers 2] [--data-dir DIR]
+#
+# Runs on asyncio and the standard library alone; nothing outside the machine
+# is needed. Endpoints answer in JSON except downloads:
+#   POST   /jobs?filename=march.xlsx&start_date=11/09/2025    body: the export itself
+#          optional: sheet, start_row, end_row, pdf=1, recompute_hours=1,
+#          weekly_overtime, daily_overtime, compression (fast|small|0-9)
+#          202 with the new job, or 200 with a finished one when the same export
+#          was already generated with the same settings
+#   GET    /jobs                      every job since the service started
+#   GET    /jobs/<id>                 status, stage, progress and files of a job
+#   GET    /jobs/<id>/files/<name>    download a file of a finished job
+#   DELETE /jobs/<id>                 cancel a queued or running job
+#   GET    /health                    queue and worker counts
+#
+# Uploads are stored under a hash of their contents, so the same export sent
+# again reuses the stored file, and with --cache-rosters the roster parsed from
+# it too (see roster_store).
+# Results are stored under a hash of the export, the template and every setting:
+# a repeated request is answered from them at once, and one that comes in while
+# the same job is still running joins it. Both are evicted least recently used
+# first once the data directory passes --cache-size.
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import hashlib
+import hmac
+from http import HTTPStatus
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+import uuid
+from hours_validation import OvertimeRules
+from resources import resource_path
+from roster_store import DEFAULT_MAX_BYTES, default_cache_dir, roster_store
+from source_formats import format_for, source_extensions
+from timesheet_creator import GenerationCancelled, create_timesheets
+from timesheet_manifest import manifest_header
+from timesheet_writer import TimesheetTemplate, compression_level
+from worker_common import load_template, template_signature
+
+
+DEFAULT_PORT = 8765
+# Jobs kept in the job list once they have finished
+JOB_HISTORY = 1000
+# Progress and cancellation are passed between processes at most this often
+PROGRESS_INTERVAL = 0.25
+_CHUNK_SIZE = 1 << 16
+_MAX_HEAD_BYTES = 64 * 1024
+_RESULT_FILE = "result.json"
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+# A worker's line back to the service: stage and progress go out on the event
+# queue, and the cancelled flags are read back, both no more often than
+# PROGRESS_INTERVAL since each is a round trip to the manager process
+class _JobLink:
+    def __init__(self, job_id: str, events, cancelled) -> None:
+        self.job_id = job_id
+        self._events = events
+        self._cancelled = cancelled
+        self._last_progress = 0.0
+        self._last_check = 0.0
+
+    def stage(self, name: str) -> None:
+        self._last_progress = 0.0
+        self._events.put(("stage", self.job_id, name))
+
+    def progress(self, done: int, total: int) -> None:
+        now = time.monotonic()
+        if done >= total or now - self._last_progress >= PROGRESS_INTERVAL:
+            self._last_progress = now
+            self._events.put(("progress", self.job_id, done, total))
+
+    def should_cancel(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_check < PROGRESS_INTERVAL:
+            return False
+        self._last_check = now
+        return self.job_id in self._cancelled
+
+# Worker: keep parsed rosters in the service's own directory, or none at all
+def _init_worker(rosters_dir: str, roster_bytes: int) -> None:
+    roster_store.directory = rosters_dir
+    roster_store.max_bytes = roster_bytes
+
+# Worker: generate one job's files into output_dir, returning their names
+def _generate(job_id: str, request: dict, template_file_path: str, output_dir: str, events, cancelled) -> list[str]:
+    link = _JobLink(job_id, events, cancelled)
+    row_range = (request["start_row"], math.inf if request["end_row"] is None else request["end_row"])
+    overtime_rules = None
+    if request["recompute_hours"]:
+        overtime_rules = OvertimeRules(weekly_hours=request["weekly_overtime"] or None, daily_hours=request["daily_overtime"] or None)
+
+    link.stage("timesheets")
+    outputs = create_timesheets(
+        source_file_path=request["source"],
+        source_sheet_name=request["sheet"],
+        template_file_path=template_file_path,
+        output_file_path=os.path.join(output_dir, "timesheets.xlsx"),
+        start_date=request["start_date"],
+        row_range=row_range,
+        progress=link.progress,
+        should_cancel=link.should_cancel,
+        template=load_template(TimesheetTemplate, template_file_path),
+        overtime_rules=overtime_rules,
+        compression=request["compression"]
+    )
+    if request["pdf"]:
+        from timesheet_pdf import create_timesheet_pdf
+        link.stage("pdf")
+        outputs.append(create_timesheet_pdf(
+            source_file_path=request["source"],
+            source_sheet_name=request["sheet"],
+            template_file_path=template_file_path,
+            output_pdf_path=os.path.join(output_dir, "timesheets.pdf"),
+            start_date=request["start_date"],
+            row_range=row_range,
+            progress=link.progress,
+            should_cancel=link.should_cancel,
+            overtime_rules=overtime_rules
+        ))
+    return [os.path.basename(path) for path in outputs]
+
+
+# One request for timesheets and where it has got to
+class ServiceJob:
+    def __init__(self, job_id: str, filename: str, request: dict, result_key: str) -> None:
+        self.id = job_id
+        self.filename = filename
+        self.request = request
+        self.result_key = result_key
+        # "queued", "running", "done", "failed" or "cancelled"
+        self.status = "queued"
+        # "timesheets", then "pdf" when one was asked for
+        self.stage: str | None = None
+        self.done = 0
+        self.total = 0
+        self.error: str | None = None
+        self.files: list[str] = []
+        # Answered from an earlier job's results
+        self.cached = False
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    # Name a file of the job is downloaded as, after the uploaded export
+    def download_name(self, name: str) -> str:
+        return f"{os.path.splitext(self.filename)[0]}_{name}"
+
+    def describe(self) -> dict:
+        def stamp(seconds: float | None) -> str | None:
+            return None if seconds is None else datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec="seconds")
+
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "sheet": self.request["sheet"],
+            "start_date": self.request["start_date"],
+            "status": self.status,
+            "stage": self.stage,
+            "progress": {"done": self.done, "total": self.total},
+            "error": self.error,
+            "cached": self.cached,
+            "files": [{"name": name, "url": f"/jobs/{self.id}/files/{name}"} for name in self.files],
+            "created": stamp(self.created),
+            "started": stamp(self.started),
+            "finished": stamp(self.finished),
+        }
+
+
+# One generation under way and the jobs waiting on its results: the job that
+# asked for it first and any that repeated it while it was queued or running.
+# A job cancelled leaves the run to the others; the run itself is only
+# stopped once no job is left waiting on it.
+class _Run:
+    def __init__(self, job: ServiceJob) -> None:
+        # Key of the run's progress events and cancelled flag in the worker
+        self.id = job.id
+        self.result_key = job.result_key
+        self.filename = job.filename
+        self.request = job.request
+        # The active jobs waiting on the run, first come first
+        self.jobs: list[ServiceJob] = [job]
+
+
+# The jobs, the process pool running them and the uploads and results on disk.
+# Everything but the pool and the cache eviction runs on the event loop.
+class JobService:
+    def __init__(
+            self,
+            data_dir: str,
+            template_file_path: str,
+            workers: int = 2,
+            max_upload_bytes: int = 512 * 1024 * 1024,
+            cache_bytes: int = 4096 * 1024 * 1024,
+            cache_rosters: bool = False
+        ) -> None:
+        self.data_dir = data_dir
+        self.template_file_path = str(template_file_path)
+        self.workers = max(1, int(workers))
+        self.max_upload_bytes = max_upload_bytes
+        # Total size uploads and results may take up before the oldest are evicted
+        self.cache_bytes = cache_bytes
+        self.uploads_dir = os.path.join(data_dir, "uploads")
+        self.results_dir = os.path.join(data_dir, "results")
+        # Parsed uploads kept by the workers, when cache_rosters is set
+        self.rosters_dir = os.path.join(data_dir, "rosters")
+        self.cache_rosters = cache_rosters
+
+        self.jobs: dict[str, ServiceJob] = {}
+        # result key -> the queued or running run producing it
+        self._producing: dict[str, _Run] = {}
+        # run id -> the same runs, for their workers' events
+        self._runs: dict[str, _Run] = {}
+        # (template_signature, hash) of the template the last result key saw
+        self._template: tuple[tuple, str] | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pool: ProcessPoolExecutor | None = None
+        self._manager = None
+        self._events = None
+        self._cancelled = None
+        self._drain_thread: threading.Thread | None = None
+        self._evicting = threading.Lock()
+
+    async def start(self) -> None:
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.workers)
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._events = self._manager.Queue()
+        self._cancelled = self._manager.dict()
+        roster_bytes = DEFAULT_MAX_BYTES if self.cache_rosters else 0
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                         initializer=_init_worker, initargs=(self.rosters_dir, roster_bytes))
+        self._drain_thread = threading.Thread(target=self._drain_events, name="job-events", daemon=True)
+        self._drain_thread.start()
+
+    # Stop every job, waiting for the running ones to notice
+    async def close(self) -> None:
+        for job in self.jobs.values():
+            if job.active:
+                self.cancel(job.id)
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown, wait=True, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._events.put(None)
+            await asyncio.to_thread(self._drain_thread.join)
+            self._manager.shutdown()
+            self._manager = None
+
+    def _drain_events(self) -> None:
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            self._loop.call_soon_threadsafe(self._apply_event, event)
+
+    def _apply_event(self, event: tuple) -> None:
+        run = self._runs.get(event[1])
+        if run is None:
+            return
+        for job in run.jobs:
+            if job.status != "running":
+                continue
+            if event[0] == "stage":
+                job.stage, job.done, job.total = event[2], 0, 0
+            else:
+                job.done, job.total = event[2], event[3]
+
+    def counts(self) -> dict:
+        statuses = [job.status for job in self.jobs.values()]
+        return {"workers": self.workers, **{status: statuses.count(status) for status in ("queued", "running", "done", "failed", "cancelled")}}
+
+    # Store an upload of length bytes read from reader, then queue its job, or
+    # answer it from the results or the running job it repeats
+    async def submit(self, params: dict[str, str], reader: asyncio.StreamReader, length: int) -> tuple[ServiceJob, bool]:
+        filename, request = self._parse_params(params)
+        if length > self.max_upload_bytes:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"uploads are limited to {self.max_upload_bytes // (1024 * 1024)} MB")
+        source, content_hash = await self._store_upload(reader, length, os.path.splitext(filename)[1].lower())
+        request["source"] = source
+
+        if not request["sheet"]:
+            request["sheet"] = await asyncio.to_thread(format_for(source).default_sheet, source)
+            if not request["sheet"]:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "sheet is required for this export")
+        result_key = self._result_key(content_hash, request)
+
+        job = ServiceJob(uuid.uuid4().hex[:12], filename, request, result_key)
+        self._add(job)
+        run = self._producing.get(result_key)
+        if run is not None:
+            # The same job is already on its way; this one finishes with it
+            current = run.jobs[0]
+            job.status, job.started, job.stage, job.done, job.total = current.status, current.started, current.stage, current.done, current.total
+            job.cached = True
+            run.jobs.append(job)
+            return job, True
+        files = self._cached_files(result_key)
+        if files is not None:
+            job.status, job.cached, job.files = "done", True, files
+            job.started = job.finished = time.time()
+            return job, False
+        run = self._producing[result_key] = self._runs[job.id] = _Run(job)
+        asyncio.create_task(self._run(run))
+        return job, True
+
+    def _parse_params(self, params: dict[str, str]) -> tuple[str, dict]:
+        def number(name: str, default, convert=int):
+            value = params.get(name)
+            if value in (None, ""):
+                return default
+            try:
+                return convert(value)
+            except ValueError:
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"invalid {name} {value!r}") from None
+
+        def flag(name: str) -> bool:
+            return params.get(name, "").lower() in ("1", "true", "yes", "on")
+
+        filename = os.path.basename(params.get("filename", "").replace("\\", "/"))
+        if not filename:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "filename is required")
+        if os.path.splitext(filename)[1].lower() not in source_extensions():
+            raise HttpError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, f"expected one of {', '.join(source_extensions())}")
+        start_date = params.get("start_date", "")
+        try:
+            datetime.strptime(start_date, "%m/%d/%Y")
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "start_date is required, as mm/dd/yyyy") from None
+        start_row, end_row = number("start_row", 2), number("end_row", None)
+        if start_row < 2 or (end_row is not None and end_row < start_row):
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"invalid row range {start_row}-{end_row}")
+        compression = params.get("compression") or None
+        try:
+            compression_level(compression)
+        except ValueError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(e)) from None
+
+        return filename, {
+            "sheet": params.get("sheet") or None,
+            "start_date": start_date,
+            "start_row": start_row,
+            "end_row": end_row,
+            "pdf": flag("pdf"),
+            "recompute_hours": flag("recompute_hours"),
+            "weekly_overtime": number("weekly_overtime", 40.0, float),
+            "daily_overtime": number("daily_overtime", 0.0, float),
+            "compression": compression,
+        }
+
+    # Stream the body to disk while hashing it; returns (stored path, content hash)
+    async def _store_upload(self, reader: asyncio.StreamReader, length: int, extension: str) -> tuple[str, str]:
+        incoming = os.path.join(self.uploads_dir, f".incoming-{uuid.uuid4().hex}")
+        digest = hashlib.blake2b()
+        try:
+            with open(incoming, "wb") as file:
+                remaining = length
+                while remaining:
+                    chunk = await reader.read(min(_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise HttpError(HTTPStatus.BAD_REQUEST, "the upload ended early")
+                    digest.update(chunk)
+                    file.write(chunk)
+                    remaining -= len(chunk)
+            content_hash = digest.hexdigest()[:32]
+            path = os.path.join(self.uploads_dir, f"{content_hash}{extension}")
+            if os.path.exists(path):
+                # Seen before; keep the stored copy, whose parsed roster may be cached
+                os.utime(path)
+            else:
+                os.replace(incoming, path)
+            return path, content_hash
+        finally:
+            if os.path.exists(incoming):
+                os.remove(incoming)
+
+    # Hash of everything that shapes a job's files
+    def _result_key(self, content_hash: str, request: dict) -> str:
+        settings = {key: value for key, value in request.items() if key != "source"}
+        if not settings["recompute_hours"]:
+            settings.pop("weekly_overtime")
+            settings.pop("daily_overtime")
+        key = json.dumps([content_hash, self._template_hash(), settings], sort_keys=True)
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+    # Hash of the template and its field mapping, worked out again once either changes
+    def _template_hash(self) -> str:
+        signature = template_signature(self.template_file_path)
+        if self._template is None or self._template[0] != signature:
+            self._template = (signature, manifest_header(self.template_file_path, "")["template"])
+        return self._template[1]
+
+    def _result_dir(self, result_key: str) -> str:
+        return os.path.join(self.results_dir, result_key)
+
+    # Names of the stored files for this key, or None when there are none
+    def _cached_files(self, result_key: str) -> list[str] | None:
+        result_dir = self._result_dir(result_key)
+        try:
+            with open(os.path.join(result_dir, _RESULT_FILE), encoding="utf-8") as file:
+                files = json.load(file)["files"]
+        except (OSError, ValueError, KeyError):
+            return None
+        if not all(os.path.exists(os.path.join(result_dir, name)) for name in files):
+            return None
+        # Using a result makes it the most recently used
+        os.utime(result_dir)
+        return files
+
+    def file_path(self, job: ServiceJob, name: str) -> str | None:
+        if name not in job.files:
+            return None
+        return os.path.join(self._result_dir(job.result_key), name)
+
+    def _add(self, job: ServiceJob) -> None:
+        self.jobs[job.id] = job
+        finished = [job_id for job_id, other in self.jobs.items() if not other.active]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    async def _run(self, run: _Run) -> None:
+        partial_dir = f"{self._result_dir(run.result_key)}.{run.id}.partial"
+        try:
+            async with self._slots:
+                # Every job waiting on it was cancelled while it was queued
+                if not run.jobs:
+                    return
+                started = time.time()
+                for job in run.jobs:
+                    job.status, job.started = "running", started
+                os.makedirs(partial_dir, exist_ok=True)
+                try:
+                    files = await self._loop.run_in_executor(
+                        self._pool, _generate, run.id, run.request, self.template_file_path,
+                        partial_dir, self._events, self._cancelled
+                    )
+                except GenerationCancelled:
+                    # Only once no job was left waiting; each was marked as it went
+                    return
+                except Exception as e:
+                    self._finish(run, "failed", error=f"{type(e).__name__}: {e}")
+                    return
+                self._publish(run, partial_dir, files)
+                self._finish(run, "done", files=files)
+        finally:
+            if self._producing.get(run.result_key) is run:
+                del self._producing[run.result_key]
+            self._runs.pop(run.id, None)
+            self._cancelled.pop(run.id, None)
+            shutil.rmtree(partial_dir, ignore_errors=True)
+            await asyncio.to_thread(self._evict, self._busy_paths())
+
+    def _finish(self, run: _Run, status: str, error: str | None = None, files: list[str] | None = None) -> None:
+        finished = time.time()
+        for job in run.jobs:
+            job.status, job.error, job.files, job.finished = status, error, files or [], finished
+
+    def _publish(self, run: _Run, partial_dir: str, files: list[str]) -> None:
+        with open(os.path.join(partial_dir, _RESULT_FILE), "w", encoding="utf-8") as file:
+            json.dump({"files": files, "filename": run.filename, "request": run.request}, file)
+        result_dir = self._result_dir(run.result_key)
+        shutil.rmtree(result_dir, ignore_errors=True)
+        os.replace(partial_dir, result_dir)
+
+    # Cancel the job. Its run carries on for any other job waiting on it, and
+    # is stopped once none is left; the worker notices at its next employee.
+    def cancel(self, job_id: str) -> ServiceJob | None:
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return job
+        job.status, job.finished = "cancelled", time.time()
+        run = self._producing.get(job.result_key)
+        if run is not None and job in run.jobs:
+            run.jobs.remove(job)
+            if not run.jobs:
+                # A repeat from now on starts a run of its own
+                del self._producing[run.result_key]
+                self._cancelled[run.id] = True
+        return job
+
+    # Uploads and result directories of the active jobs; taken on the event
+    # loop, since the jobs change there
+    def _busy_paths(self) -> set[str]:
+        active = [job for job in self.jobs.values() if job.active]
+        return {job.request["source"] for job in active} | {self._result_dir(job.result_key) for job in active}
+
+    # Remove the least recently used uploads and results past cache_bytes,
+    # sparing the busy ones
+    def _evict(self, busy: set[str]) -> None:
+        # One eviction at a time; a job finishing meanwhile is caught by the next
+        if not self._evicting.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            for directory in (self.uploads_dir, self.results_dir):
+                with os.scandir(directory) as scan:
+                    for entry in scan:
+                        if entry.name.startswith(".") or entry.name.endswith(".partial"):
+                            continue
+                        entries.append((entry.stat().st_mtime_ns, _size(entry.path), entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.cache_bytes:
+                    break
+                if path in busy:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+                total -= size
+        except OSError:
+            pass
+        finally:
+            self._evicting.release()
+
+
+def _size(path: str) -> int:
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+# One HTTP/1.1 exchange per connection: read the request head, route it, answer
+# and close
+class ServiceHandler:
+    def __init__(self, service: JobService, token: str | None = None) -> None:
+        self.service = service
+        self.token = token
+
+    async def __call__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, path, params, headers = await self._read_head(reader)
+                if not self._authorized(headers):
+                    raise HttpError(HTTPStatus.UNAUTHORIZED, "a valid bearer token is required")
+                await self._route(method, path, params, headers, reader, writer)
+            except HttpError as e:
+                await _send_json(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # Whether the request carries the bearer token, compared in constant time
+    def _authorized(self, headers: dict[str, str]) -> bool:
+        if not self.token:
+            return True
+        # The head was decoded as latin-1, so this gives back the bytes sent
+        sent = headers.get("authorization", "").encode("latin-1")
+        return hmac.compare_digest(sent, f"Bearer {self.token}".encode("utf-8"))
+
+    async def _read_head(self, reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], dict[str, str]]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "request head too large") from None
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "malformed request line") from None
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+        return method.upper(), unquote(url.path), params, headers
+
+    async def _route(self, method: str, path: str, params: dict[str, str], headers: dict[str, str], reader, writer) -> None:
+        service = self.service
+        parts = [part for part in path.split("/") if part]
+        if parts == ["health"] and method == "GET":
+            await _send_json(writer, HTTPStatus.OK, {"status": "ok", **service.counts()})
+            return
+        if not parts or parts[0] != "jobs" or len(parts) > 4:
+            raise HttpError(HTTPStatus.NOT_FOUND, "no such endpoint")
+
+        if len(parts) == 1:
+            if method == "GET":
+                await _send_json(writer, HTTPStatus.OK, {"jobs": [job.describe() for job in service.jobs.values()]})
+                return
+            if method != "POST":
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "use GET or POST")
+            if "chunked" in headers.get("transfer-encoding", "").lower() or "content-length" not in headers:
+                raise HttpError(HTTPStatus.LENGTH_REQUIRED, "send the export with a Content-Length")
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                length = -1
+            if length < 0:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+            if headers.get("expect", "").lower() == "100-continue":
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                await writer.drain()
+            job, created = await service.submit(params, reader, length)
+            await _send_json(writer, HTTPStatus.ACCEPTED if created else HTTPStatus.OK, job.describe(),
+                             {"Location": f"/jobs/{job.id}"})
+            return
+
+        job = service.jobs.get(parts[1])
+        if job is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, "no such job")
+        if len(parts) == 2 and method == "GET":
+            await _send_json(writer, HTTPStatus.OK, job.describe())
+        elif len(parts) == 2 and method == "DELETE":
+            await _send_json(writer, HTTPStatus.OK, service.cancel(job.id).describe())
+        elif len(parts) == 4 and parts[2] == "files" and method == "GET":
+            file_path = service.file_path(job, parts[3])
+            if file_path is None or not os.path.exists(file_path):
+                raise HttpError(HTTPStatus.NOT_FOUND, "no such file")
+            await _send_file(writer, file_path, job.download_name(parts[3]))
+        else:
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "unsupported method")
+
+
+def _response_head(status: HTTPStatus, headers: dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}", *(f"{name}: {value}" for name, value in headers.items()), "Connection: close"]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+async def _send_json(writer: asyncio.StreamWriter, status: HTTPStatus, body: dict, headers: dict[str, str] | None = None) -> None:
+    data = json.dumps(body, indent=2).encode("utf-8")
+    writer.write(_response_head(status, {"Content-Type": "application/json", "Content-Length": str(len(data)), **(headers or {})}))
+    writer.write(data)
+    await writer.drain()
+
+async def _send_file(writer: asyncio.StreamWriter, path: str, download_name: str) -> None:
+    content_type = "application/pdf" if path.endswith(".pdf") else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    writer.write(_response_head(HTTPStatus.OK, {
+        "Content-Type": content_type,
+        "Content-Length": str(os.path.getsize(path)),
+        "Content-Disposition": f'attachment; filename="{download_name.replace(chr(34), "")}"',
+    }))
+    with open(path, "rb") as file:
+        while chunk := file.read(_CHUNK_SIZE):
+            writer.write(chunk)
+            await writer.drain()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    service = JobService(
+        args.data_dir, args.template, workers=args.workers,
+        max_upload_bytes=args.max_upload * 1024 * 1024, cache_bytes=args.cache_size * 1024 * 1024,
+        cache_rosters=args.cache_rosters
+    )
+    await service.start()
+    server = await asyncio.start_server(ServiceHandler(service, args.token), args.host, args.port, limit=_MAX_HEAD_BYTES)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stopping.set)
+        except NotImplementedError:
+            # Windows; Ctrl+C still ends asyncio.run with KeyboardInterrupt
+            pass
+
+    address = ", ".join(f"http://{host}:{port}" for host, port, *_ in (sock.getsockname() for sock in server.sockets))
+    print(f"Serving timesheet jobs on {address} with {service.workers} worker(s); Ctrl+C to stop", file=sys.stderr, flush=True)
+    try:
+        await stopping.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.close()
+
+def _megabytes(value: str) -> int:
+    megabytes = int(value)
+    if megabytes < 1:
+        raise argparse.ArgumentTypeError(f"expected a size of at least 1, got {value!r}")
+    return megabytes
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="timesheet_service",
+        description="Serve timesheet generation over HTTP, so one machine does the work for everyone."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on; 0.0.0.0 to serve the network (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="jobs run at once, each in its own process (default: 2)")
+    parser.add_argument("--data-dir", default=os.path.join(default_cache_dir(), "service"), help="where uploads and results are kept")
+    parser.add_argument("--cache-size", type=_megabytes, default=4096, metavar="MB",
+                        help="size uploads and results may take up before the least recently used go (default: %(default)s)")
+    parser.add_argument("--cache-rosters", action="store_true",
+                        help="keep parsed uploads in the data directory, so an export sent again isn't read again (default: off)")
+    parser.add_argument("--max-upload", type=_megabytes, default=512, metavar="MB", help="largest export accepted (default: %(default)s)")
+    parser.add_argument("--template", default=str(resource_path("assets", "timesheet_template.xlsx")), help="timesheet template workbook")
+    parser.add_argument("--token", default=os.environ.get("TIMESHEET_SERVICE_TOKEN"),
+                        help="require 'Authorization: Bearer TOKEN' on every request (default: $TIMESHEET_SERVICE_TOKEN)")
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,438 @@
+# Watch-folder entry point: generate timesheets for every export the time clock
+# drops into a folder, as it arrives or changes, until stopped.
+#   python -m timesheet_watch INBOX --output-dir DIR [--sheet NAME] [--start-date MM/DD/YYYY] [--workers 2]
+#
+# Changes are picked up from the OS's file events (inotify, ReadDirectoryChangesW,
+# kqueue) through Qt's QFileSystemWatcher, so only QtCore is needed and no
+# display. An export is generated once it has gone --settle seconds without
+# changing, so files still being copied in are never read half-written. Settled
+# exports queue up for a pool of --workers processes; an export that changes
+# again while queued is only generated once, and one that changes while it is
+# being generated is generated again afterwards.
+#
+# Each export's sheet and start date come from, later ones winning: --sheet and
+# --start-date, the folder's timesheet_watch.json, the export's name matched
+# against --pattern, and a sidecar <export name>.json next to the export. The
+# config files hold the keys of a batch manifest job (see timesheet_batch):
+#   {"sheet": "EXAMPLE SHEET", "start_date": "11/09/2025", "start_row": 2, "end_row": null, "pdf": true}
+# Outputs are written to --output-dir as <export file name>_timesheets.xlsx
+# (march.csv_timesheets.xlsx), so exports differing only in type never share
+# one. On start, exports whose output is newer than them and their config are
+# left alone.
+import argparse
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+import json
+import multiprocessing
+import os
+import re
+import signal
+import socket
+import sys
+import time
+import zipfile
+from PySide6.QtCore import QCoreApplication, QFileSystemWatcher, QObject, QSocketNotifier, QTimer, Signal, Slot
+from resources import resource_path
+from source_cache import file_signature
+from source_formats import WorkbookFormat, format_for, source_extensions
+from timesheet_batch import BatchJob, run_job
+from timesheet_cli import output_path_for
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+CONFIG_NAME = "timesheet_watch.json"
+# Matches a yyyy-mm-dd date anywhere in an export's name
+DEFAULT_PATTERN = r"(?P<start_date>\d{4}-\d{2}-\d{2})"
+DEFAULT_DATE_FORMAT = "%Y-%m-%d"
+# Seconds an export must go unchanged before it is generated
+DEFAULT_SETTLE = 2.0
+
+
+# Whether a file in the folder is an export to generate; office lock files,
+# hidden files and the partial files of copies in progress are not
+def is_export(name: str) -> bool:
+    if name.startswith(("~$", ".")):
+        return False
+    return os.path.splitext(name)[1].lower() in source_extensions()
+
+def sidecar_path(export_path: str) -> str:
+    return f"{os.path.splitext(export_path)[0]}.json"
+
+def _read_config(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as file:
+            config = json.load(file)
+    except FileNotFoundError:
+        return {}
+    if not isinstance(config, dict):
+        raise ValueError(f"{os.path.basename(path)}: expected a JSON object")
+    return config
+
+
+# How an export in the watched folder becomes a batch job
+class WatchRules:
+    def __init__(
+            self,
+            watch_dir: str,
+            output_dir: str,
+            defaults: dict | None = None,
+            pattern: str = DEFAULT_PATTERN,
+            date_format: str = DEFAULT_DATE_FORMAT
+        ) -> None:
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.defaults = defaults or {}
+        self.pattern = re.compile(pattern)
+        self.date_format = date_format
+
+    def output_path(self, export_path: str) -> str:
+        return output_path_for(export_path, None, self.output_dir, keep_extension=True)
+
+    # The files whose contents decide an export's job: the export and its configs
+    def inputs(self, export_path: str) -> tuple[str, ...]:
+        return export_path, os.path.join(self.watch_dir, CONFIG_NAME), sidecar_path(export_path)
+
+    # The job for an export; a ValueError says what is missing or wrong
+    def job(self, export_path: str) -> BatchJob:
+        entry = {**self.defaults, **_read_config(os.path.join(self.watch_dir, CONFIG_NAME))}
+        match = self.pattern.search(os.path.basename(export_path))
+        if match is not None:
+            for key, value in match.groupdict().items():
+                if value and key == "start_date":
+                    entry[key] = datetime.strptime(value, self.date_format).strftime("%m/%d/%Y")
+                elif value:
+                    entry[key] = value
+        entry.update(_read_config(sidecar_path(export_path)))
+
+        entry["source"] = export_path
+        entry["output"] = self.output_path(export_path)
+        if not entry.get("sheet"):
+            entry["sheet"] = format_for(export_path).default_sheet(export_path)
+        if not entry.get("start_date"):
+            raise ValueError(f"no start date; name the export after it or give it in {os.path.basename(sidecar_path(export_path))}")
+        return BatchJob.from_entry(entry, self.watch_dir)
+
+
+# Identity of an export and its configs; a change to any of them is a change to the export
+def _signature(paths: tuple[str, ...]) -> tuple:
+    signature = []
+    for path in paths:
+        try:
+            signature.append(file_signature(path))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+# A workbook is only complete once its zip directory has been written
+def _complete(export_path: str) -> bool:
+    if isinstance(format_for(export_path), WorkbookFormat):
+        return zipfile.is_zipfile(export_path)
+    return True
+
+
+# Watches one folder and generates each export once it settles. Lives on the
+# thread running the Qt event loop; start() begins watching.
+class FolderWatcher(QObject):
+    # result of each finished job, as timesheet_batch.run_job reports it
+    finished = Signal(dict)
+    # every export in the folder has been generated, for now
+    idle = Signal()
+    # a job's future completed; emitted from the pool's thread
+    _job_done = Signal(str, object)
+
+    def __init__(
+            self,
+            rules: WatchRules,
+            template_file_path: str,
+            workers: int = 2,
+            settle: float = DEFAULT_SETTLE
+        ) -> None:
+        super().__init__()
+        self.rules = rules
+        self.template_file_path = str(template_file_path)
+        self.workers = max(1, int(workers))
+        self.settle_ms = int(settle * 1000)
+
+        # export -> signature it was last generated (or failed) at
+        self._done: dict[str, tuple] = {}
+        # export -> (signature, timer) while it waits to settle
+        self._settling: dict[str, tuple[tuple, QTimer]] = {}
+        # exports that settled, in arrival order
+        self._queue: OrderedDict[str, None] = OrderedDict()
+        # export -> signature of the job running for it
+        self._running: dict[str, tuple] = {}
+        # export -> the running job's future
+        self._futures: dict[str, Future] = {}
+        self._pool: ProcessPoolExecutor | None = None
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._schedule_scan)
+        self._watcher.fileChanged.connect(self._file_changed)
+        # A burst of events becomes one rescan of the folder
+        self._scan_timer = QTimer(self)
+        self._scan_timer.setSingleShot(True)
+        self._scan_timer.timeout.connect(self._scan)
+        self._job_done.connect(self._finish_job)
+
+    def start(self) -> None:
+        # Spawned rather than forked, since Qt's threads are running here
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._watcher.addPath(self.rules.watch_dir)
+        for export_path in self._exports():
+            if self._up_to_date(export_path):
+                self._done[export_path] = _signature(self.rules.inputs(export_path))
+        self._scan()
+
+    # Stop watching; jobs already running are left to finish and reported,
+    # queued ones are dropped
+    def stop(self) -> None:
+        self._scan_timer.stop()
+        for _, timer in self._settling.values():
+            timer.stop()
+        self._settling.clear()
+        self._queue.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        # Their _job_done signals would only arrive once the loop runs again
+        for export_path, future in list(self._futures.items()):
+            self._finish_job(export_path, future, resume=False)
+
+    def _exports(self) -> list[str]:
+        with os.scandir(self.rules.watch_dir) as entries:
+            return [entry.path for entry in entries if entry.is_file() and is_export(entry.name)]
+
+    def _up_to_date(self, export_path: str) -> bool:
+        try:
+            generated = os.path.getmtime(self.rules.output_path(export_path))
+        except OSError:
+            return False
+        return all(
+            not os.path.exists(path) or os.path.getmtime(path) <= generated
+            for path in self.rules.inputs(export_path)
+        )
+
+    @Slot(str)
+    def _schedule_scan(self, _path: str = "") -> None:
+        if not self._scan_timer.isActive():
+            self._scan_timer.start(0)
+
+    # Settle every export that differs from when it was last generated
+    @Slot()
+    def _scan(self) -> None:
+        exports = self._exports()
+        self._watch_files(exports)
+        for export_path in exports:
+            signature = _signature(self.rules.inputs(export_path))
+            if export_path in self._queue or signature in (self._done.get(export_path), self._running.get(export_path)):
+                continue
+            self._settle(export_path, signature)
+        self._check_idle()
+
+    # A file written to in place raises no event on its folder, only on itself,
+    # so every export and config in the folder is watched as well
+    def _watch_files(self, exports: list[str]) -> None:
+        paths = {path for export_path in exports for path in self.rules.inputs(export_path) if os.path.exists(path)}
+        paths.difference_update(self._watcher.files())
+        if paths:
+            self._watcher.addPaths(sorted(paths))
+
+    @Slot(str)
+    def _file_changed(self, path: str) -> None:
+        if not os.path.exists(path):
+            self._watcher.removePath(path)
+            self._drop(path)
+        elif is_export(os.path.basename(path)):
+            self._settle(path, _signature(self.rules.inputs(path)))
+        else:
+            # A config, which may change any export's job
+            self._schedule_scan()
+
+    # (Re)start the export's settle timer unless it is already settling at this signature
+    def _settle(self, export_path: str, signature: tuple) -> None:
+        settling = self._settling.get(export_path)
+        if settling is not None:
+            if settling[0] == signature:
+                return
+            timer = settling[1]
+        else:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda export_path=export_path: self._settled(export_path))
+        self._settling[export_path] = (signature, timer)
+        timer.start(self.settle_ms)
+
+    def _drop(self, export_path: str) -> None:
+        self._unsettle(export_path)
+        self._check_idle()
+
+    def _unsettle(self, export_path: str) -> None:
+        settling = self._settling.pop(export_path, None)
+        if settling is not None:
+            settling[1].stop()
+            settling[1].deleteLater()
+
+    def _settled(self, export_path: str) -> None:
+        signature, _ = self._settling[export_path]
+        if not os.path.exists(export_path):
+            self._drop(export_path)
+            return
+        if _signature(self.rules.inputs(export_path)) != signature:
+            self._settle(export_path, _signature(self.rules.inputs(export_path)))
+            return
+        # Not idle yet: the export is queued before anyone is told the folder is done
+        self._unsettle(export_path)
+        # Unchanged yet incomplete: the copy stalled, so wait for its next write
+        if not _complete(export_path):
+            self._check_idle()
+            return
+        if export_path in self._running:
+            # Picked up again by _finish_job once the running job is done
+            return
+        self._queue[export_path] = None
+        self._submit()
+
+    # Hand queued exports to the pool, never more than it has workers for, so
+    # exports that change again while queued are still only generated once
+    def _submit(self) -> None:
+        while self._queue and len(self._running) < self.workers and self._pool is not None:
+            export_path, _ = self._queue.popitem(last=False)
+            signature = _signature(self.rules.inputs(export_path))
+            try:
+                job = self.rules.job(export_path)
+            except (OSError, ValueError) as e:
+                self._done[export_path] = signature
+                self.finished.emit({"source": export_path, "status": "failed", "error": f"{type(e).__name__}: {e}", "outputs": [], "wall_s": None})
+                continue
+            self._running[export_path] = signature
+            future = self._futures[export_path] = self._pool.submit(run_job, job, self.template_file_path)
+            future.add_done_callback(lambda future, export_path=export_path: self._job_done.emit(export_path, future))
+        self._check_idle()
+
+    # Report a finished job and, when resume is set, settle its export again if
+    # it changed meanwhile and start the next queued one
+    @Slot(str, object)
+    def _finish_job(self, export_path: str, future: Future, resume: bool = True) -> None:
+        if self._futures.get(export_path) is not future:
+            # Already reported by stop()
+            return
+        del self._futures[export_path]
+        signature = self._running.pop(export_path)
+        self._done[export_path] = signature
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            # The worker process itself died
+            result = {"source": export_path, "status": "failed", "error": f"{type(e).__name__}: {e}", "outputs": [], "wall_s": None}
+        self.finished.emit(result)
+        if not resume:
+            return
+        # Changed while it was being generated
+        if os.path.exists(export_path) and _signature(self.rules.inputs(export_path)) != signature:
+            self._settle(export_path, _signature(self.rules.inputs(export_path)))
+        self._submit()
+
+    def _check_idle(self) -> None:
+        if not (self._settling or self._queue or self._running or self._scan_timer.isActive()):
+            self.idle.emit()
+
+
+# Quit the event loop on Ctrl+C or SIGTERM. Qt's loop does not return to Python
+# while it waits, so the signal wakes it through a socket instead of a timer.
+def _quit_on_signals(app: QCoreApplication) -> tuple:
+    receiver, sender = socket.socketpair()
+    receiver.setblocking(False)
+    sender.setblocking(False)
+    signal.set_wakeup_fd(sender.fileno())
+    notifier = QSocketNotifier(receiver.fileno(), QSocketNotifier.Read, app)
+    notifier.activated.connect(lambda: receiver.recv(64))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: app.quit())
+    # Kept alive for as long as the loop runs
+    return receiver, sender, notifier
+
+def format_result(result: dict) -> str:
+    wall = f"{result['wall_s']:8.2f}s" if result.get("wall_s") is not None else "       -"
+    detail = result["error"] if result["error"] else ", ".join(result["outputs"])
+    return f"{result['status']:<6} {wall}  {result['source']}: {detail}"
+
+def _start_date(value: str) -> str:
+    try:
+        datetime.strptime(value, "%m/%d/%Y")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid start date {value!r}, expected mm/dd/yyyy")
+    return value
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="timesheet_watch",
+        description="Watch a folder and generate timesheets for every export dropped into it."
+    )
+    parser.add_argument("folder", help="folder the time clock exports to")
+    parser.add_argument("--output-dir", required=True, help="directory for the generated workbooks; must not be the watched folder")
+    parser.add_argument("-s", "--sheet", help="source sheet, unless a config or the export's name gives one")
+    parser.add_argument("-d", "--start-date", type=_start_date, help="first day of the period, mm/dd/yyyy, unless a config or the export's name gives one")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN,
+                        help="regex matched against export names; its start_date and sheet groups are used (default: a yyyy-mm-dd date)")
+    parser.add_argument("--date-format", default=DEFAULT_DATE_FORMAT, help="strptime format of the pattern's start_date group (default: %(default)s)")
+    parser.add_argument("--pdf", action="store_true", help="also render each export to a PDF")
+    parser.add_argument("--template", default=str(resource_path("assets", "timesheet_template.xlsx")), help="timesheet template workbook")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="exports generated at once, each in its own process (default: 2)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help="seconds an export must go unchanged before it is generated (default: %(default)s)")
+    parser.add_argument("--report", help="append each job's result to this file as a JSON line")
+    parser.add_argument("--once", action="store_true", help="generate what is in the folder now, then exit")
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"{args.folder} is not a folder")
+    os.makedirs(args.output_dir, exist_ok=True)
+    if os.path.samefile(args.folder, args.output_dir):
+        parser.error("--output-dir must not be the watched folder")
+    try:
+        re.compile(args.pattern)
+    except re.error as e:
+        parser.error(f"invalid --pattern: {e}")
+
+    defaults = {"sheet": args.sheet, "start_date": args.start_date, "pdf": args.pdf}
+    rules = WatchRules(args.folder, args.output_dir, {key: value for key, value in defaults.items() if value}, args.pattern, args.date_format)
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    watcher = FolderWatcher(rules, args.template, workers=args.workers, settle=args.settle)
+    failed = 0
+
+    def report(result: dict) -> None:
+        nonlocal failed
+        failed += result["status"] != "ok"
+        print(format_result(result), file=sys.stderr, flush=True)
+        if args.report:
+            with open(args.report, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"time": time.time(), **result}) + "\n")
+
+    watcher.finished.connect(report)
+    if args.once:
+        watcher.idle.connect(app.quit)
+    keep_alive = _quit_on_signals(app)
+    # Started from the loop, so a --once run with nothing to do can quit it
+    QTimer.singleShot(0, watcher.start)
+    if not args.once:
+        print(f"Watching {rules.watch_dir}, writing to {rules.output_dir}; Ctrl+C to stop", file=sys.stderr, flush=True)
+    try:
+        app.exec()
+    finally:
+        watcher.stop()
+        signal.set_wakeup_fd(-1)
+        del keep_alive
+    return EXIT_FAILED if args.once and failed else EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,503 @@
+from copy import copy
+from datetime import date, datetime, timezone
+from io import BytesIO
+import os
+import re
+from xml.sax.saxutils import escape, quoteattr
+from zipfile import ZipFile, ZIP_DEFLATED
+import openpyxl
+from openpyxl.cell.cell import Cell
+from openpyxl.compat import safe_string
+from openpyxl.packaging.extended import ExtendedProperties
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import is_date_format
+from openpyxl.styles.stylesheet import write_stylesheet
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, to_excel
+from openpyxl.worksheet._writer import WorksheetWriter
+from openpyxl.writer.theme import theme_xml
+from openpyxl.xml.functions import tostring
+from template_plan import FillPlan
+
+
+_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument"
+_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# Quotes are escaped in text too, so ' s="n"' only ever appears as a style attribute
+_QUOTE = {'"': "&quot;"}
+_STYLE_ATTR = re.compile(r' s="(\d+)"')
+# Likewise ' t="inlineStr"' and ' t="s"' only ever appear as cell types
+_INLINE_STRING = re.compile(r' t="inlineStr"><is>(<t[^>]*>[^<]*</t>)</is>')
+_SHARED_STRING = re.compile(r' t="s"><v>(\d+)</v>')
+_SHARED_STRING_ITEM = re.compile(r"<si>(.*?)</si>", re.DOTALL)
+
+# zlib levels behind the compression knob: "fast" spends the least time
+# deflating, "small" writes the smallest file. None keeps zlib's default (6).
+COMPRESSION_LEVELS = {"fast": 1, "small": 9}
+
+
+# The zlib level for a compression setting: a COMPRESSION_LEVELS name, a level
+# from 0 to 9 or None
+def compression_level(compression: str | int | None) -> int | None:
+    if compression is None:
+        return None
+    if isinstance(compression, str) and not compression.isdigit():
+        if compression not in COMPRESSION_LEVELS:
+            raise ValueError(f"Unknown compression {compression!r}, expected one of {tuple(COMPRESSION_LEVELS)} or a level from 0 to 9")
+        return COMPRESSION_LEVELS[compression]
+    level = int(compression)
+    if not 0 <= level <= 9:
+        raise ValueError(f"Compression level {level} is out of range, expected 0 to 9")
+    return level
+
+
+# The template workbook, parsed once into everything a generated sheet shares:
+# the stylesheet and theme, the sheet XML around <sheetData>, row attributes and
+# the styled template cells. Style ids index straight into the template stylesheet.
+class TimesheetTemplate:
+    def __init__(self, template_file_path: str, sheet_name: str = "Template") -> None:
+        self.workbook = openpyxl.load_workbook(template_file_path)
+        base_sheet = self.workbook[sheet_name]
+
+        # (row, col) -> (style id, value) for every cell the template defines
+        self.cells: dict[tuple[int, int], tuple[int, object]] = {
+            (row, col): (cell.style_id, cell._value)
+            for (row, col), cell in base_sheet._cells.items()
+        }
+        self.row_attrs: dict[int, str] = {
+            row: "".join(f" {key}={quoteattr(value)}" for key, value in dim)
+            for row, dim in base_sheet.row_dimensions.items()
+        }
+        # Where employee values go, worked out once from the template's layout
+        self.plan = FillPlan.for_template(template_file_path, base_sheet)
+
+        # The sheet's rows in order, each as its opening tag and its cells'
+        # (col, style id), so sheet_xml need not sort the cells of every sheet
+        rows: dict[int, list[tuple[int, int]]] = {row: [] for row in self.row_attrs}
+        for (row, col), (style_id, _) in sorted(self.cells.items()):
+            rows.setdefault(row, []).append((col, style_id))
+        self._rows = [(row, f'<row r="{row}"{self.row_attrs.get(row, "")}>', rows[row]) for row in sorted(rows)]
+        # Template cells no value was given for serialise the same on every sheet
+        self._static_xml: dict[tuple[int, int], str] = {}
+
+        # Styles past this point were derived while binding dates into cells
+        # whose template style has no date number format
+        self.base_style_count: int = len(self.workbook._cell_styles)
+
+        # Scratch cell used to bind values exactly the way openpyxl would
+        self._cell = Cell(base_sheet)
+        # Date cells repeat on every sheet, so each is serialised only once
+        self._date_xml: dict[tuple[int, int, int, date], str] = {}
+
+        self.head, self.tail = self._split_sheet_xml(base_sheet)
+        self.workbook.remove(base_sheet)
+        max_row = max(rows, default=1)
+        max_col = max((col for _, col in self.cells), default=1)
+        self._head = self.head.replace("{dimension}", f"A1:{get_column_letter(max_col)}{max_row}")
+
+    # Serialise an empty copy of the template sheet (the same attributes
+    # copy_worksheet carries over) and split it around <sheetData>.
+    def _split_sheet_xml(self, base_sheet) -> tuple[str, str]:
+        sheet = self.workbook.copy_worksheet(base_sheet)
+        sheet._cells = {}
+        sheet.row_dimensions.clear()
+        sheet.calculate_dimension = lambda: "{dimension}"
+
+        writer = WorksheetWriter(sheet, out=BytesIO())
+        writer.write()
+        xml: str = writer.read().decode("utf-8")
+        self.workbook.remove(sheet)
+
+        head, tail = xml.split("<sheetData></sheetData>", 1)
+        return head, tail
+
+    # Whether the template formats this cell as a date, so a native date fits it
+    def is_date_cell(self, row: int, col: int) -> bool:
+        if (row, col) not in self.cells:
+            return False
+        self._cell._style = copy(self.workbook._cell_styles[self.cells[(row, col)][0]])
+        return is_date_format(self._cell.number_format)
+
+    # Bind a value to a template style, returning (style id, data type, value)
+    def bind(self, style_id: int, value) -> tuple[int, str, object]:
+        cell = self._cell
+        cell._style = copy(self.workbook._cell_styles[style_id])
+        cell.value = value
+        if cell.data_type == "d":
+            # openpyxl swaps in a date number format when the style lacks one
+            style_id = cell.style_id
+        return style_id, cell.data_type, cell._value
+
+    # Serialise one sheet: the template cells with the given (row, col) values applied
+    def sheet_xml(self, values: dict[tuple[int, int], object]) -> str:
+        if not values.keys() <= self.cells.keys():
+            return self._extended_sheet_xml(values)
+
+        static = self._static_xml
+        parts = [self._head, "<sheetData>"]
+        for row, row_open, cols in self._rows:
+            parts.append(row_open)
+            for col, style_id in cols:
+                key = (row, col)
+                if key in values:
+                    parts.append(self._cell_xml(row, col, style_id, values[key]))
+                else:
+                    if key not in static:
+                        static[key] = self._cell_xml(row, col, style_id, self.cells[key][1])
+                    parts.append(static[key])
+            parts.append("</row>")
+        parts.append("</sheetData>")
+        parts.append(self.tail)
+        return "".join(parts)
+
+    # sheet_xml for values that reach past the template's cells (a period
+    # longer than the template has rows for, say)
+    def _extended_sheet_xml(self, values: dict[tuple[int, int], object]) -> str:
+        cells = dict(self.cells)
+        for key, value in values.items():
+            style_id = cells[key][0] if key in cells else 0
+            cells[key] = (style_id, value)
+
+        rows: dict[int, list[str]] = {row: [] for row in self.row_attrs}
+        for (row, col), (style_id, value) in sorted(cells.items()):
+            rows.setdefault(row, []).append(self._cell_xml(row, col, style_id, value))
+
+        max_row = max(rows)
+        max_col = max(col for _, col in cells)
+        parts = [self.head.replace("{dimension}", f"A1:{get_column_letter(max_col)}{max_row}"), "<sheetData>"]
+        for row in sorted(rows):
+            parts.append(f'<row r="{row}"{self.row_attrs.get(row, "")}>')
+            parts.extend(rows[row])
+            parts.append("</row>")
+        parts.append("</sheetData>")
+        parts.append(self.tail)
+        return "".join(parts)
+
+    def _cell_xml(self, row: int, col: int, style_id: int, value) -> str:
+        if isinstance(value, date):
+            key = (row, col, style_id, value)
+            if key not in self._date_xml:
+                self._date_xml[key] = self._value_xml(row, col, style_id, value)
+            return self._date_xml[key]
+        return self._value_xml(row, col, style_id, value)
+
+    def _value_xml(self, row: int, col: int, style_id: int, value) -> str:
+        data_type = "n"
+        if value is not None:
+            style_id, data_type, value = self.bind(style_id, value)
+
+        attrs = f'r="{get_column_letter(col)}{row}"'
+        if style_id:
+            attrs += f' s="{style_id}"'
+
+        if data_type == "d":
+            data_type = "n"
+            value = to_excel(value, self.workbook.epoch)
+
+        if data_type == "f":
+            return f"<c {attrs}><f>{escape(value[1:], _QUOTE)}</f><v></v></c>"
+        if data_type == "s":
+            attrs += ' t="inlineStr"'
+        else:
+            attrs += f' t="{data_type}"'
+
+        if value is None or value == "":
+            return f"<c {attrs}/>"
+        if data_type == "s":
+            space = ' xml:space="preserve"' if value.strip() and value != value.strip() else ""
+            return f"<c {attrs}><is><t{space}>{escape(value, _QUOTE)}</t></is></c>"
+        return f"<c {attrs}><v>{escape(safe_string(value))}</v></c>"
+
+    # Derived styles as (style, number format) pairs, portable to another
+    # process's template where the ids may have been allocated differently
+    def derived_styles(self) -> list[tuple[StyleArray, str]]:
+        cell = self._cell
+        derived = []
+        for style in self.workbook._cell_styles[self.base_style_count:]:
+            cell._style = copy(style)
+            derived.append((style, cell.number_format))
+        return derived
+
+    # Register another process's derived styles here, returning the ids that moved
+    def style_map(self, derived_styles: list[tuple[StyleArray, str]]) -> dict[int, int]:
+        cell = self._cell
+        mapping: dict[int, int] = {}
+        for style_id, (style, number_format) in enumerate(derived_styles, self.base_style_count):
+            cell._style = copy(style)
+            cell.number_format = number_format
+            if cell.style_id != style_id:
+                mapping[style_id] = cell.style_id
+        return mapping
+
+    def remap_styles(self, sheet_xml: str, mapping: dict[int, int]) -> str:
+        if not mapping:
+            return sheet_xml
+        return _STYLE_ATTR.sub(lambda m: f' s="{mapping.get(int(m.group(1)), m.group(1))}"', sheet_xml)
+
+    def stylesheet(self) -> bytes:
+        return tostring(write_stylesheet(self.workbook))
+
+    def theme(self) -> bytes:
+        return self.workbook.loaded_theme or theme_xml.encode("utf-8")
+
+
+# Hands out unique, Excel-legal sheet titles in constant time. Excel compares
+# titles case-insensitively and caps them at 31 characters, so a title that is
+# already taken gets " (2)", " (3)", ... in the order it comes up, with the
+# base shortened to fit. Each base remembers its next suffix, so a roster full
+# of namesakes does not rescan the ones before.
+class SheetNames:
+    MAX_LENGTH = 31
+    _ILLEGAL = re.compile(r"[\\/*?:\[\]]")
+
+    def __init__(self) -> None:
+        # casefolded titles in use
+        self._taken: set[str] = set()
+        # casefolded base title -> next suffix to try
+        self._next: dict[str, int] = {}
+
+    def __contains__(self, title: str) -> bool:
+        return title.casefold() in self._taken
+
+    def __len__(self) -> int:
+        return len(self._taken)
+
+    # A title for a new sheet, as close to the one asked for as is free
+    def allocate(self, title: str) -> str:
+        stem = self._ILLEGAL.sub("", title)[:self.MAX_LENGTH].strip("'") or "Sheet"
+        # Excel keeps this name for itself
+        if stem.casefold() == "history":
+            stem = "History_"
+        base = stem.casefold()
+        title = stem
+        if base in self._taken:
+            number = self._next.get(base, 2)
+            while True:
+                suffix = f" ({number})"
+                title = stem[:self.MAX_LENGTH - len(suffix)] + suffix
+                number += 1
+                if title.casefold() not in self._taken:
+                    break
+            self._next[base] = number
+        self._taken.add(title.casefold())
+        return title
+
+
+# The workbook's shared string table. Sheets are serialised with inline strings,
+# so they come out the same in any process and can be copied between runs;
+# share() then swaps each string for its index in the table as the sheet is
+# written, so the labels every timesheet repeats are stored once per workbook.
+class SharedStrings:
+    def __init__(self) -> None:
+        # <t> element -> index, in index order
+        self._index: dict[str, int] = {}
+        # Cells referencing the table
+        self.references = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def share(self, sheet_xml: str) -> str:
+        index = self._index
+
+        def shared(match: re.Match) -> str:
+            text = match.group(1)
+            number = index.get(text)
+            if number is None:
+                number = index[text] = len(index)
+            return f' t="s"><v>{number}</v>'
+
+        sheet_xml, count = _INLINE_STRING.subn(shared, sheet_xml)
+        self.references += count
+        return sheet_xml
+
+    def xml(self) -> str:
+        return (
+            _XML_HEADER
+            + '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+            + f' count="{self.references}" uniqueCount="{len(self._index)}">'
+            + "".join(f"<si>{text}</si>" for text in self._index)
+            + "</sst>"
+        )
+
+
+# The shared strings of a workbook this module wrote, as their <t> elements
+def read_shared_strings(archive: ZipFile) -> list[str]:
+    try:
+        xml = archive.read("xl/sharedStrings.xml").decode("utf-8")
+    except KeyError:
+        return []
+    return _SHARED_STRING_ITEM.findall(xml)
+
+# A sheet copied out of such a workbook, with its strings inlined again
+def inline_strings(sheet_xml: str, strings: list[str]) -> str:
+    if not strings:
+        return sheet_xml
+    return _SHARED_STRING.sub(lambda m: f' t="inlineStr"><is>{strings[int(m.group(1))]}</is>', sheet_xml)
+
+
+# Streams one worksheet per employee straight into the output zip, then writes
+# the workbook parts that reference them on close. compression is a
+# compression_level setting; shared_strings=False keeps strings inline.
+class TimesheetWriter:
+    def __init__(
+            self,
+            output_file_path: str,
+            template: TimesheetTemplate,
+            compression: str | int | None = None,
+            shared_strings: bool = True
+        ) -> None:
+        self.output_file_path = output_file_path
+        self.template = template
+        self.epoch = template.workbook.epoch
+        self.compression = compression_level(compression)
+
+        self._archive = ZipFile(output_file_path, "w", ZIP_DEFLATED, allowZip64=True, compresslevel=self.compression)
+        self._part_count = 0
+        # title -> part name, in workbook order
+        self._sheets: dict[str, str] = {}
+        self._names = SheetNames()
+        self._strings = SharedStrings() if shared_strings else None
+        # Bytes of XML written and of the finished file, set on close
+        self._xml_bytes = 0
+        self._file_bytes = 0
+
+    def __enter__(self) -> "TimesheetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # Add a sheet built from the template with the given (row, col) values applied.
+    # Returns the title it was given, which is made unique; no sheet is ever replaced.
+    def add_sheet(self, title: str, values: dict[tuple[int, int], object]) -> str:
+        return self.add_sheet_xml(title, self.template.sheet_xml(values))
+
+    # Add a sheet already serialised with TimesheetTemplate.sheet_xml
+    def add_sheet_xml(self, title: str, sheet_xml: str) -> str:
+        title = self._names.allocate(title)
+        if self._strings is not None:
+            sheet_xml = self._strings.share(sheet_xml)
+        self._part_count += 1
+        part_name = f"xl/worksheets/sheet{self._part_count}.xml"
+        self._archive.writestr(part_name, sheet_xml)
+        self._sheets[title] = part_name
+        return title
+
+    @property
+    def sheetnames(self) -> list[str]:
+        return list(self._sheets)
+
+    # Zip part the sheet with this title was written to
+    def part_name(self, title: str) -> str:
+        return self._sheets[title]
+
+    def close(self) -> None:
+        if not self._sheets:
+            self.abort()
+            raise ValueError("The workbook must contain at least one timesheet")
+
+        archive = self._archive
+        archive.writestr("[Content_Types].xml", self._content_types_xml())
+        archive.writestr("_rels/.rels", self._root_rels_xml())
+        archive.writestr("docProps/app.xml", tostring(ExtendedProperties().to_tree()))
+        archive.writestr("docProps/core.xml", self._core_xml())
+        archive.writestr("xl/workbook.xml", self._workbook_xml())
+        archive.writestr("xl/_rels/workbook.xml.rels", self._workbook_rels_xml())
+        archive.writestr("xl/styles.xml", self.template.stylesheet())
+        archive.writestr("xl/theme/theme1.xml", self.template.theme())
+        if self._strings is not None:
+            archive.writestr("xl/sharedStrings.xml", self._strings.xml())
+        self._xml_bytes = sum(info.file_size for info in archive.infolist())
+        archive.close()
+        self._file_bytes = os.path.getsize(self.output_file_path)
+
+    # Size of the closed workbook and what went into it, for timing reports
+    def stats(self) -> dict:
+        return {
+            "path": self.output_file_path,
+            "sheets": len(self._sheets),
+            "compression_level": self.compression,
+            "xml_bytes": self._xml_bytes,
+            "file_bytes": self._file_bytes,
+            "string_cells": self._strings.references if self._strings is not None else None,
+            "shared_strings": len(self._strings) if self._strings is not None else None,
+        }
+
+    # Close and delete a partially written output file
+    def abort(self) -> None:
+        self._archive.close()
+        if os.path.exists(self.output_file_path):
+            os.remove(self.output_file_path)
+
+    def _content_types_xml(self) -> str:
+        overrides = [
+            ("/xl/workbook.xml", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"),
+            ("/xl/styles.xml", f"{_CONTENT_TYPE}.spreadsheetml.styles+xml"),
+            ("/xl/theme/theme1.xml", f"{_CONTENT_TYPE}.theme+xml"),
+            ("/docProps/core.xml", "application/vnd.openxmlformats-package.core-properties+xml"),
+            ("/docProps/app.xml", f"{_CONTENT_TYPE}.extended-properties+xml"),
+        ]
+        if self._strings is not None:
+            overrides.append(("/xl/sharedStrings.xml", f"{_CONTENT_TYPE}.spreadsheetml.sharedStrings+xml"))
+        overrides += [(f"/{part}", f"{_CONTENT_TYPE}.spreadsheetml.worksheet+xml") for part in self._sheets.values()]
+        return (
+            _XML_HEADER
+            + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            + '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            + '<Default Extension="xml" ContentType="application/xml"/>'
+            + "".join(f'<Override PartName="{part}" ContentType="{kind}"/>' for part, kind in overrides)
+            + "</Types>"
+        )
+
+    def _root_rels_xml(self) -> str:
+        return (
+            _XML_HEADER
+            + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + f'<Relationship Id="rId1" Type="{_REL_TYPE}/officeDocument" Target="xl/workbook.xml"/>'
+            + '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" Target="docProps/core.xml"/>'
+            + f'<Relationship Id="rId3" Type="{_REL_TYPE}/extended-properties" Target="docProps/app.xml"/>'
+            + "</Relationships>"
+        )
+
+    def _core_xml(self) -> bytes:
+        properties = copy(self.template.workbook.properties)
+        properties.modified = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+        return tostring(properties.to_tree())
+
+    def _workbook_xml(self) -> str:
+        date1904 = ' date1904="1"' if self.epoch == CALENDAR_MAC_1904 else ""
+        sheets = "".join(
+            f'<sheet name={quoteattr(title)} sheetId="{idx}" r:id="rId{idx}"/>'
+            for idx, title in enumerate(self._sheets, 1)
+        )
+        return (
+            _XML_HEADER
+            + '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+            + f' xmlns:r="{_REL_TYPE}">'
+            + f'<workbookPr{date1904}/>'
+            + '<bookViews><workbookView activeTab="0"/></bookViews>'
+            + f"<sheets>{sheets}</sheets>"
+            + '<calcPr calcId="124519" fullCalcOnLoad="1"/>'
+            + "</workbook>"
+        )
+
+    def _workbook_rels_xml(self) -> str:
+        rels = [
+            f'<Relationship Id="rId{idx}" Type="{_REL_TYPE}/worksheet" Target="/{part}"/>'
+            for idx, part in enumerate(self._sheets.values(), 1)
+        ]
+        count = len(rels)
+        rels.append(f'<Relationship Id="rId{count + 1}" Type="{_REL_TYPE}/styles" Target="styles.xml"/>')
+        rels.append(f'<Relationship Id="rId{count + 2}" Type="{_REL_TYPE}/theme" Target="theme/theme1.xml"/>')
+        if self._strings is not None:
+            rels.append(f'<Relationship Id="rId{count + 3}" Type="{_REL_TYPE}/sharedStrings" Target="sharedStrings.xml"/>')
+        return (
+            _XML_HEADER
+            + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(rels)
+            + "</Relationships>"
+        )
@@ -0,0 +1,54 @@
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import TypeVar
+from source_cache import file_signature
+from template_plan import mapping_path
+
+
+# Helpers shared by the code that fans generation out over processes: the
+# parallel and PDF renderers, the batch runner and the job service.
+
+T = TypeVar("T")
+
+# (loader, template path) -> (template_signature, what the loader parsed)
+_loaded: dict[tuple[Callable, str], tuple[tuple, object]] = {}
+
+
+# Identity of a template as it is now: the workbook's and its .fields.json's
+# mtime and size, None for a file that is not there
+def template_signature(template_file_path: str) -> tuple:
+    signatures = []
+    for path in (str(template_file_path), mapping_path(str(template_file_path))):
+        try:
+            signatures.append(file_signature(path))
+        except FileNotFoundError:
+            signatures.append(None)
+    return tuple(signatures)
+
+# Parse a template with loader (TimesheetTemplate, PdfLayout, ...) once per
+# process and reuse it for every shard or job the process runs, until the
+# template or its field mapping is changed on disk
+def load_template(loader: Callable[[str], T], template_file_path: str) -> T:
+    key = (loader, str(template_file_path))
+    signature = template_signature(key[1])
+    cached = _loaded.get(key)
+    if cached is None or cached[0] != signature:
+        cached = _loaded[key] = (signature, loader(key[1]))
+    return cached[1]
+
+# A pool of worker processes started fresh rather than forked: the wizard
+# generates from a QThread, and forking a multithreaded Qt process is unsafe
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+# Lists of up to size items, in order
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    batch: list[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,173 @@
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.insert(0, APP_DIR)
+
+from generation_profile import GenerationProfile
+from roster_generator import SHEET_NAME, START_DATE, ensure_roster
+
+
+# End-to-end benchmark of timesheet generation over synthetic rosters.
+# Every case runs create_timesheets in a fresh process so its peak RSS is its
+# own, and reports wall time and output size for each phase:
+#   load   - parsing the template and streaming rows out of the source
+#   render - building each employee's values and sheet XML
+#   save   - writing the sheets and closing the output workbook
+# Results are written as JSON; pass an earlier file to --compare to see how
+# the current tree differs from it, or to weigh one --compression setting
+# against another.
+
+EMPLOYEES = [10, 1_000, 10_000, 100_000]
+DAYS = [7, 14, 31]
+# Benchmark phase -> the create_timesheets profile phases it is made of
+PHASES = {
+    "load": ("count", "template", "read"),
+    "render": ("render",),
+    "save": ("write", "save"),
+}
+TEMPLATE_FILE_PATH = os.path.join(APP_DIR, "assets", "timesheet_template.xlsx")
+
+
+# Generate timesheets for one roster with create_timesheets, folding the phases
+# its profile records into load, render and save
+def run_case(source_file_path: str, output_file_path: str, start_date: str = START_DATE, compression: str | None = None) -> dict:
+    from roster_store import roster_store
+    from source_cache import source_cache
+    from timesheet_creator import create_timesheets
+
+    # Parse the source as a first run would; the case has its own process,
+    # so turning the caches off here touches nothing else
+    source_cache.max_rows = 0
+    roster_store.max_bytes = 0
+    profile = GenerationProfile()
+    create_timesheets(
+        source_file_path=source_file_path,
+        source_sheet_name=SHEET_NAME,
+        template_file_path=TEMPLATE_FILE_PATH,
+        output_file_path=output_file_path,
+        start_date=start_date,
+        profile=profile,
+        compression=compression
+    )
+    report = profile.report()
+    output = report["outputs"][0]
+
+    phases = {
+        phase: {"wall_s": sum(report["phases"][name]["wall_s"] for name in names if name in report["phases"])}
+        for phase, names in PHASES.items()
+    }
+    phases["load"]["output_bytes"] = os.path.getsize(source_file_path)
+    phases["render"]["output_bytes"] = output["xml_bytes"]
+    phases["save"]["output_bytes"] = output["file_bytes"]
+    return {
+        "sheets": output["sheets"],
+        "wall_s": report["wall_s"],
+        "peak_rss_bytes": report["peak_rss_bytes"],
+        "output_bytes": output["file_bytes"],
+        "phases": phases,
+    }
+
+# Run one case in a fresh interpreter and return its result
+def run_case_isolated(source_file_path: str, output_file_path: str, compression: str | None = None) -> dict:
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", source_file_path, output_file_path]
+        + (["--compression", compression] if compression is not None else []),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout)
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+def run_benchmarks(employees: list[int], days: list[int], roster_dir: str, output_dir: str, repeat: int = 1, compression: str | None = None) -> dict:
+    os.makedirs(output_dir, exist_ok=True)
+    cases = []
+    for employee_count in employees:
+        for day_count in days:
+            source = ensure_roster(roster_dir, employee_count, day_count)
+            output = os.path.join(output_dir, f"timesheets_{employee_count}x{day_count}.xlsx")
+            # Keep the fastest of the repeats, the one least disturbed by the machine
+            runs = [run_case_isolated(source, output, compression) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run["wall_s"])
+            os.remove(output)
+            cases.append({
+                "employees": employee_count,
+                "days": day_count,
+                "source_bytes": os.path.getsize(source),
+                **best,
+            })
+            print(f"{employee_count:>7} employees x {day_count:>2} days: {best['wall_s']:8.2f}s", file=sys.stderr)
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "compression": compression,
+        "cases": cases,
+    }
+
+# Table of per-phase wall time and output size against an earlier results file
+def format_comparison(baseline: dict, current: dict) -> str:
+    baseline_cases = {(case["employees"], case["days"]): case for case in baseline["cases"]}
+    lines = [f"{'case':>14}  {'phase':<7} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for case in current["cases"]:
+        key = (case["employees"], case["days"])
+        if key not in baseline_cases:
+            continue
+        for phase in (*PHASES, None):
+            before = baseline_cases[key]["phases"][phase]["wall_s"] if phase else baseline_cases[key]["wall_s"]
+            after = case["phases"][phase]["wall_s"] if phase else case["wall_s"]
+            change = f"{(after - before) / before:+.1%}" if before else "n/a"
+            lines.append(f"{key[0]:>7}x{key[1]:<6}  {phase or 'total':<7} {before:>9.3f}s {after:>9.3f}s {change:>8}")
+        before, after = baseline_cases[key]["output_bytes"], case["output_bytes"]
+        change = f"{(after - before) / before:+.1%}" if before else "n/a"
+        lines.append(f"{key[0]:>7}x{key[1]:<6}  {'size':<7} {before / 1e6:>8.2f}MB {after / 1e6:>8.2f}MB {change:>8}")
+    return "\n".join(lines)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark timesheet generation on synthetic rosters.")
+    parser.add_argument("-n", "--employees", type=int, nargs="+", default=EMPLOYEES, help="roster sizes to run")
+    parser.add_argument("-d", "--days", type=int, nargs="+", default=DAYS, help="period lengths to run")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    parser.add_argument("-o", "--output", help="JSON results file (default: results/<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier JSON results to compare against")
+    parser.add_argument("-c", "--compression", help="output compression: fast, small or a zlib level 0-9 (default: zlib's default)")
+    parser.add_argument("--roster-dir", default=os.path.join(BENCH_DIR, ".rosters"), help="where synthetic rosters are cached")
+    parser.add_argument("--run-case", nargs=2, metavar=("SOURCE", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        json.dump(run_case(*args.run_case, compression=args.compression), sys.stdout)
+        return 0
+
+    results = run_benchmarks(args.employees, args.days, args.roster_dir, os.path.join(args.roster_dir, "output"), max(1, args.repeat), args.compression)
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{results['commit'] or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print(format_comparison(json.load(file), results))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
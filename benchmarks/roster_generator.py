@@ -0,0 +1,94 @@
+import argparse
+from datetime import datetime, timedelta
+import os
+import random
+import sys
+import openpyxl
+
+
+# Synthetic source workbooks in the layout of app/assets/source_sheet_example.xlsx:
+# Name, Position, Location, then Clock In / Clock Out / Total Hours for every
+# day of the period, then Total REG, Total OT and Total Hours.
+
+SHEET_NAME = "EXAMPLE SHEET"
+START_DATE = "11/09/2025"
+# Regular hours in a period before overtime starts
+REGULAR_HOURS = 80
+
+_FIRST_NAMES = ["Alexandra", "Brandon", "Carmen", "Dmitri", "Elena", "Farid", "Grace", "Hiro", "Imani", "Jonah", "Keiko", "Luis"]
+_LAST_NAMES = ["Torres", "Kim", "Okafor", "Novak", "Silva", "Haddad", "Lindqvist", "Tanaka", "Mensah", "Reyes", "Walsh", "Zhou"]
+_POSITIONS = ["Software Engineer", "Game Designer", "Technical Artist", "QA Analyst", "Producer", None]
+_LOCATIONS = ["Northpoint Studios", "Ironclad Works", "Southern Detention Facility", "Harbor Office"]
+
+
+def roster_path(directory: str, employees: int, days: int, seed: int = 0) -> str:
+    return os.path.join(directory, f"roster_{employees}x{days}_seed{seed}.xlsx")
+
+# Write a roster of employees over a period of days and return its path.
+# The same arguments always produce the same workbook.
+def generate_roster(output_file_path: str, employees: int, days: int, seed: int = 0, start_date: str = START_DATE) -> str:
+    rng = random.Random(seed)
+    start = datetime.strptime(start_date, "%m/%d/%Y")
+    period = [start + timedelta(days=day) for day in range(days)]
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(SHEET_NAME)
+
+    header = ["Name", "Position", "Location"]
+    for day in period:
+        label = day.strftime("%m/%d")
+        header += [f"{label} Clock In", f"{label} Clock Out", f"{label} Total Hours"]
+    header += ["Total REG", "Total OT", "Total Hours"]
+    ws.append(header)
+
+    for employee in range(employees):
+        name = f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)} {employee}"
+        row = [name, rng.choice(_POSITIONS), rng.choice(_LOCATIONS)]
+
+        total = 0.0
+        for day in period:
+            # Roughly one day off a week
+            if rng.random() < 1 / 7:
+                row += [None, None, 0]
+                continue
+            clock_in = day + timedelta(hours=rng.choice([6, 7, 8, 19]))
+            hours = rng.choice([8, 10, 12, 12, 13])
+            row += [clock_in, clock_in + timedelta(hours=hours), hours]
+            total += hours
+
+        regular = min(total, REGULAR_HOURS)
+        row += [regular, total - regular, total]
+        ws.append(row)
+
+    wb.save(output_file_path)
+    return output_file_path
+
+# Path of a cached roster, generating it on first use. The roster is written
+# beside its path and moved in once complete, so an interrupted run leaves
+# nothing that passes for it.
+def ensure_roster(directory: str, employees: int, days: int, seed: int = 0) -> str:
+    path = roster_path(directory, employees, days, seed)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        partial_path = f"{path}.{os.getpid()}.partial"
+        try:
+            generate_roster(partial_path, employees, days, seed)
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+    return path
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic timesheet source workbook.")
+    parser.add_argument("output", help="path of the .xlsx file to write")
+    parser.add_argument("-n", "--employees", type=int, default=1000)
+    parser.add_argument("-d", "--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generate_roster(args.output, args.employees, args.days, args.seed)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())